@@ -1,6 +1,13 @@
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Type, TypeVar
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import async_session
+from app.services.ai.ollama_tracker import OllamaServiceWithTracking, ollama_tracker
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -12,4 +19,38 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+def get_ollama() -> OllamaServiceWithTracking:
+    """Shared Ollama service (pooled HTTP client, closed on app shutdown)"""
+    return ollama_tracker
+
+
+def json_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """
+    Request body dependency validated with model.model_validate_json: pydantic-core
+    parses and validates the raw bytes in one pass, instead of FastAPI's json.loads
+    followed by validating the resulting dict. Pair with json_body_openapi(model)
+    so the docs still show the body.
+    """
+    async def parse(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            # Same 422 shape as FastAPI's own body validation
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            )
+    
+    return parse
+
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """openapi_extra documenting a json_body(model) request body"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
\ No newline at end of file
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
 
-from app.services.ai.ollama_tracker import ollama_tracker
-from app.api.deps import get_db
+from app.services.ai.ollama_tracker import OllamaServiceWithTracking
+from app.services.cache.semantic_cache import get_semantic_cache
+from app.api.deps import get_ollama
 
 router = APIRouter()
 
@@ -14,12 +17,14 @@ class GenerateRequest(BaseModel):
     system_prompt: Optional[str] = None
     temperature: float = 0.7
     user_id: int = 1
+    stream: bool = False
 
 
 class ChatRequest(BaseModel):
     messages: List[Dict[str, str]]
     temperature: float = 0.7
     user_id: int = 1
+    stream: bool = False
 
 
 class AnswerQuestionRequest(BaseModel):
@@ -38,18 +43,42 @@ class CoverLetterRequest(BaseModel):
     job_id: Optional[int] = None
 
 
+async def _sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Format streamed text chunks as Server-Sent Events"""
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'response': chunk})}\n\n"
+        yield "data: [DONE]\n\n"
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+
 @router.post("/generate")
 async def generate_text(
     request: GenerateRequest,
-    db: AsyncSession = Depends(get_db)
+    ollama: OllamaServiceWithTracking = Depends(get_ollama)
 ):
     """
     Generate text using Ollama with token tracking
+    Set stream=true to receive the text as Server-Sent Events while it is generated
     """
+    if request.stream:
+        return StreamingResponse(
+            _sse_events(ollama.generate_stream_with_tracking(
+                prompt=request.prompt,
+                user_id=request.user_id,
+                operation_type="text_generation",
+                system_prompt=request.system_prompt,
+                temperature=request.temperature,
+                endpoint="/ai/generate"
+            )),
+            media_type="text/event-stream"
+        )
+    
     try:
-        response = await ollama_tracker.generate_with_tracking(
+        response = await ollama.generate_with_tracking(
             prompt=request.prompt,
-            db=db,
             user_id=request.user_id,
             operation_type="text_generation",
             system_prompt=request.system_prompt,
@@ -69,15 +98,27 @@ async def generate_text(
 @router.post("/chat")
 async def chat(
     request: ChatRequest,
-    db: AsyncSession = Depends(get_db)
+    ollama: OllamaServiceWithTracking = Depends(get_ollama)
 ):
     """
     Chat with Ollama with token tracking
+    Set stream=true to receive the reply as Server-Sent Events while it is generated
     """
+    if request.stream:
+        return StreamingResponse(
+            _sse_events(ollama.chat_stream_with_tracking(
+                messages=request.messages,
+                user_id=request.user_id,
+                operation_type="chat",
+                temperature=request.temperature,
+                endpoint="/ai/chat"
+            )),
+            media_type="text/event-stream"
+        )
+    
     try:
-        response = await ollama_tracker.chat_with_tracking(
+        response = await ollama.chat_with_tracking(
             messages=request.messages,
-            db=db,
             user_id=request.user_id,
             operation_type="chat",
             temperature=request.temperature,
@@ -96,25 +137,39 @@ async def chat(
 @router.post("/answer-question")
 async def answer_job_question(
     request: AnswerQuestionRequest,
-    db: AsyncSession = Depends(get_db)
+    ollama: OllamaServiceWithTracking = Depends(get_ollama)
 ):
     """
     Answer a job application question using AI with token tracking
     """
     try:
-        answer = await ollama_tracker.answer_job_question_with_tracking(
-            question=request.question,
-            user_profile=request.user_profile,
-            job_details=request.job_details,
-            db=db,
-            user_id=request.user_id,
-            job_id=request.job_id
+        # Reuse a previous answer to a similar question for the same profile/job
+        cache = await asyncio.to_thread(get_semantic_cache)
+        cache_key = cache.make_key(
+            request.user_id,
+            request.user_profile,
+            request.job_details.get('title'),
+            request.job_details.get('company')
         )
         
+        answer = await asyncio.to_thread(cache.get, "question_answer", request.question, cache_key)
+        cached = answer is not None
+        
+        if not cached:
+            answer = await ollama.answer_job_question_with_tracking(
+                question=request.question,
+                user_profile=request.user_profile,
+                job_details=request.job_details,
+                user_id=request.user_id,
+                job_id=request.job_id
+            )
+            await asyncio.to_thread(cache.put, "question_answer", request.question, cache_key, answer)
+        
         return {
             "success": True,
             "question": request.question,
-            "answer": answer
+            "answer": answer,
+            "cached": cached
         }
         
     except Exception as e:
@@ -124,24 +179,40 @@ async def answer_job_question(
 @router.post("/generate-cover-letter")
 async def generate_cover_letter(
     request: CoverLetterRequest,
-    db: AsyncSession = Depends(get_db)
+    ollama: OllamaServiceWithTracking = Depends(get_ollama)
 ):
     """
     Generate a cover letter using AI with token tracking
     """
     try:
-        cover_letter = await ollama_tracker.generate_cover_letter_with_tracking(
-            user_profile=request.user_profile,
-            job_details=request.job_details,
-            db=db,
-            user_id=request.user_id,
-            job_id=request.job_id,
-            template=request.template
+        # Reuse a cover letter generated for a similar posting with the same profile
+        cache = await asyncio.to_thread(get_semantic_cache)
+        cache_key = cache.make_key(
+            request.user_id,
+            request.user_profile,
+            request.job_details.get('title'),
+            request.job_details.get('company'),
+            request.template
         )
+        cache_text = request.job_details.get('description') or request.job_details.get('title') or ""
+        
+        cover_letter = await asyncio.to_thread(cache.get, "cover_letter", cache_text, cache_key)
+        cached = cover_letter is not None
+        
+        if not cached:
+            cover_letter = await ollama.generate_cover_letter_with_tracking(
+                user_profile=request.user_profile,
+                job_details=request.job_details,
+                user_id=request.user_id,
+                job_id=request.job_id,
+                template=request.template
+            )
+            await asyncio.to_thread(cache.put, "cover_letter", cache_text, cache_key, cover_letter)
         
         return {
             "success": True,
-            "cover_letter": cover_letter
+            "cover_letter": cover_letter,
+            "cached": cached
         }
         
     except Exception as e:
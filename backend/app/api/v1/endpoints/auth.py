@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app.services.browser.linkedin_auth import LinkedInAuth
+from app.services.browser.playwright_service import browser_pool
 
 router = APIRouter()
 
@@ -38,10 +39,10 @@ async def check_login_status():
     """
     Check if LinkedIn session is still valid
     """
-    auth = LinkedInAuth()
-    
     try:
-        is_logged_in = await auth.is_logged_in()
+        # Checks the session the shared browser's services actually use
+        async with browser_pool.acquire(LinkedInAuth) as auth:
+            is_logged_in = await auth.is_logged_in()
         
         return {
             "logged_in": is_logged_in,
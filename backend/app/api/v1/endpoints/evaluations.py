@@ -3,6 +3,7 @@ Response Evaluation API Endpoints
 """
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
@@ -13,7 +14,8 @@ from app.schemas.evaluation import (
     AutoEvaluationRequest
 )
 from app.services.evaluator.response_evaluator import ResponseEvaluator
-from app.models.token_usage import TokenUsage
+from app.models.token_usage import TokenUsage, TokenUsageText
+from app.models.response_evaluation import ResponseEvaluation
 from sqlalchemy import select
 
 router = APIRouter()
@@ -47,26 +49,16 @@ async def auto_evaluate_keyword(
     Checks if the response contains expected keywords.
     """
     try:
-        # Get the token usage record
-        result = await db.execute(
-            select(TokenUsage).where(TokenUsage.id == request.token_usage_id)
-        )
-        token_usage = result.scalar_one_or_none()
-        
-        if not token_usage:
-            raise HTTPException(status_code=404, detail="Token usage record not found")
-        
-        # Get the response text from completion_text field
-        response_text = token_usage.completion_text if token_usage.completion_text else ""
-        
+        # Reads the token usage record and inserts the evaluation in one statement
         evaluation = await ResponseEvaluator.auto_evaluate_keyword_match(
             db=db,
             token_usage_id=request.token_usage_id,
-            user_id=token_usage.user_id,
-            expected_keywords=request.expected_keywords or [],
-            response_text=response_text
+            expected_keywords=request.expected_keywords or []
         )
         
+        if not evaluation:
+            raise HTTPException(status_code=404, detail="Token usage record not found")
+        
         return evaluation
         
     except Exception as e:
@@ -85,17 +77,25 @@ async def auto_evaluate_llm(
     This costs tokens but provides detailed evaluation.
     """
     try:
-        # Get the token usage record
+        # Get the token usage record with its prompt/completion text
         result = await db.execute(
-            select(TokenUsage).where(TokenUsage.id == request.token_usage_id)
+            select(TokenUsage.user_id, TokenUsageText.prompt_text, TokenUsageText.completion_text)
+            .select_from(TokenUsage)
+            .outerjoin(TokenUsageText)
+            .where(TokenUsage.id == request.token_usage_id)
         )
-        token_usage = result.scalar_one_or_none()
+        token_usage = result.first()
         
         if not token_usage:
             raise HTTPException(status_code=404, detail="Token usage record not found")
         
-        # Extract question from prompt_text (simplified - might need better parsing)
-        question = token_usage.prompt_text.split("Question:")[-1].split("\n")[0] if token_usage.prompt_text and "Question:" in token_usage.prompt_text else (token_usage.prompt_text[:200] if token_usage.prompt_text else "Unknown question")
+        # Extract question from prompt_text (text after the last "Question:", up to end of line)
+        prompt_text = token_usage.prompt_text or ""
+        _, marker, after_marker = prompt_text.rpartition("Question:")
+        if marker:
+            question = after_marker.partition("\n")[0]
+        else:
+            question = prompt_text[:200] or "Unknown question"
         response_text = token_usage.completion_text if token_usage.completion_text else ""
         
         evaluation = await ResponseEvaluator.auto_evaluate_with_llm(
@@ -126,12 +126,17 @@ async def get_evaluation_statistics(
     """
     try:
         stats = await ResponseEvaluator.get_evaluation_stats(db, user_id, operation_type)
-        return stats
+        # Already a validated EvaluationStats; serialize it once, skipping response_model
+        return Response(stats.model_dump_json(), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{token_usage_id}", response_model=list[ResponseEvaluationResponse])
+@router.get(
+    "/{token_usage_id}",
+    response_model=list[ResponseEvaluationResponse],
+    response_model_exclude_none=True
+)
 async def get_evaluations_for_response(
     token_usage_id: int,
     db: AsyncSession = Depends(get_db)
@@ -142,8 +147,6 @@ async def get_evaluations_for_response(
     A response can have multiple evaluations (manual + auto).
     """
     try:
-        from app.models.response_evaluation import ResponseEvaluation
-        
         result = await db.execute(
             select(ResponseEvaluation).where(ResponseEvaluation.token_usage_id == token_usage_id)
         )
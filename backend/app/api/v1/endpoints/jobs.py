@@ -1,18 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import load_only
 from typing import List
 
-from app.api.deps import get_db
+from app.api.deps import get_db, json_body, json_body_openapi
 from app.models.job import Job
-from app.schemas.job import JobCreate, JobUpdate, JobResponse
+from app.models.application import Application
+from app.schemas.job import JobCreate, JobUpdate, JobResponse, JobSummaryResponse
 
 router = APIRouter()
 
 
-@router.post("/", response_model=JobResponse, status_code=201)
+@router.post("/", response_model=JobResponse, status_code=201, openapi_extra=json_body_openapi(JobCreate))
 async def create_job(
-    job: JobCreate,
+    job: JobCreate = Depends(json_body(JobCreate)),
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new job listing"""
@@ -27,15 +29,21 @@ async def create_job(
     return db_job
 
 
-@router.get("/", response_model=List[JobResponse])
+@router.get("/", response_model=List[JobSummaryResponse], response_model_exclude_none=True)
 async def list_jobs(
     skip: int = 0,
     limit: int = 100,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all jobs"""
+    """List all jobs (summary columns only; use GET /{job_id} for the full record)"""
     result = await db.execute(
-        select(Job).offset(skip).limit(limit)
+        select(Job)
+        .options(load_only(
+            Job.id, Job.url, Job.title, Job.company, Job.location,
+            Job.workplace_type, Job.status, Job.created_at
+        ))
+        .offset(skip)
+        .limit(limit)
     )
     jobs = result.scalars().all()
     return jobs
@@ -63,19 +71,22 @@ async def update_job(
     db: AsyncSession = Depends(get_db)
 ):
     """Update a job"""
-    result = await db.execute(
-        select(Job).where(Job.id == job_id)
-    )
+    update_data = job_update.model_dump(exclude_unset=True)
+    
+    # Single UPDATE ... RETURNING instead of SELECT + UPDATE + refresh
+    if update_data:
+        result = await db.execute(
+            update(Job).where(Job.id == job_id).values(**update_data).returning(Job)
+        )
+    else:
+        result = await db.execute(
+            select(Job).where(Job.id == job_id)
+        )
     job = result.scalar_one_or_none()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    update_data = job_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(job, field, value)
-    
     await db.commit()
-    await db.refresh(job)
     return job
 
 
@@ -85,13 +96,16 @@ async def delete_job(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a job"""
+    # Bulk DELETEs without loading rows; applications go first (ORM cascade is bypassed)
+    await db.execute(
+        delete(Application).where(Application.job_id == job_id)
+    )
     result = await db.execute(
-        select(Job).where(Job.id == job_id)
+        delete(Job).where(Job.id == job_id)
     )
-    job = result.scalar_one_or_none()
-    if not job:
+    if result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Job not found")
     
-    await db.delete(job)
     await db.commit()
     return None
\ No newline at end of file
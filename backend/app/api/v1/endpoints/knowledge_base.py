@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
+from sqlalchemy import select, update, delete, func, cast, literal
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from typing import Any, Dict, Optional
+from datetime import timezone
+from email.utils import format_datetime
+from loguru import logger
+import asyncio
+import hashlib
 import json
 
-from app.api.deps import get_db
+from app.api.deps import get_db, get_ollama, json_body, json_body_openapi
+from app.db.session import async_session
 from app.models.knowledge_base import KnowledgeBase
+from app.models.resume_cache import ResumeCache
 from app.schemas.knowledge_base import (
     KnowledgeBaseCreate,
     KnowledgeBaseUpdate,
@@ -13,16 +21,105 @@ from app.schemas.knowledge_base import (
 )
 from app.services.parsers.resume_parser import ResumeParser, parse_resume_with_ai
 from app.services.ai.ollama_service import OllamaService
+from app.services.cache.kb_cache import kb_cache
+from app.services.rag.rag_service import get_rag_service
 
 router = APIRouter()
 
+# Read uploads in bounded chunks instead of one full read
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def get_kb_snapshot(
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Knowledge base of the current user, served from the short-lived cache when fresh.
+    Mutating endpoints invalidate the cache after commit.
+    """
+    kb = await kb_cache.fetch(db, 1)
+    
+    if not kb:
+        raise HTTPException(status_code=404, detail="Knowledge base not found. Please upload a resume or create manually.")
+    
+    return kb
+
+
+def _kb_validators(kb: Dict[str, Any]) -> Dict[str, str]:
+    """ETag / Last-Modified headers for a knowledge base snapshot"""
+    modified_at = kb["updated_at"] or kb["created_at"]
+    headers = {"ETag": f'W/"{kb["id"]}-{int(modified_at.timestamp() * 1_000_000)}"'}
+    if modified_at.tzinfo is not None:
+        headers["Last-Modified"] = format_datetime(modified_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already covers the current ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+def _kb_index_data(kb: KnowledgeBase) -> Dict[str, Any]:
+    """Sections of a knowledge base that are indexed into Qdrant"""
+    return {
+        "work_experience": kb.work_experience or [],
+        "projects": kb.projects or [],
+        "skills": kb.skills or [],
+        "qa_pairs": kb.qa_pairs or {}
+    }
+
+
+async def _index_knowledge_base_task(kb_id: int, user_id: int, kb_data: Dict[str, Any]):
+    """
+    Index knowledge base into Qdrant after the response is sent. embedding_id is
+    only moved to a new version once indexing succeeded, so a failed index never
+    passes for a current one.
+    """
+    rag_service = get_rag_service()
+    try:
+        # Embedding and Qdrant I/O are blocking; keep them off the event loop.
+        # Raises if any collection failed to upsert or delete.
+        changes = await asyncio.to_thread(
+            rag_service.index_knowledge_base,
+            kb_id=kb_id,
+            knowledge_base=kb_data
+        )
+    except Exception as e:
+        logger.error(f"Indexing knowledge base {kb_id} failed, keeping its previous version: {e}")
+        return
+    
+    if not changes:
+        logger.error(f"Indexing knowledge base {kb_id} returned no result, keeping its previous version")
+        return
+    logger.info(f"Indexed knowledge base {kb_id}: {changes}")
+    
+    # Only a changed index invalidates answers cached against the old version
+    query = update(KnowledgeBase).where(KnowledgeBase.id == kb_id)
+    if not (changes["embedded"] or changes["deleted"]):
+        query = query.where(KnowledgeBase.embedding_id.is_(None))
+    
+    try:
+        async with async_session() as db:
+            await db.execute(query.values(embedding_id=rag_service.new_embedding_version(kb_id)))
+            await db.commit()
+        kb_cache.invalidate(user_id)
+    except Exception as e:
+        logger.error(f"Recording the index version of knowledge base {kb_id} failed: {e}")
+
 
 @router.post("/upload-resume", response_model=dict)
 async def upload_resume(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     use_ai_parsing: bool = True,
     auto_index: bool = True,  # NEW PARAMETER
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    ollama: OllamaService = Depends(get_ollama)
 ):
     """
     Upload resume PDF and create/update knowledge base
@@ -37,21 +134,35 @@ async def upload_resume(
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
-        # Read PDF
-        pdf_bytes = await file.read()
+        # Hash the PDF chunk by chunk; the content stays in the spooled upload file
+        hasher = hashlib.sha256()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+        await file.seek(0)
         
-        # Parse PDF
         parser = ResumeParser()
-        resume_text = parser.extract_text_from_pdf(pdf_bytes)
         
-        if use_ai_parsing:
+        # Same PDF already parsed by AI? Reuse it and skip extraction + LLM call
+        digest = hasher.digest()
+        cached_parse = await db.get(ResumeCache, digest) if use_ai_parsing else None
+        
+        # End the read transaction so the pooled connection isn't held during parsing
+        await db.commit()
+        
+        new_parse = False
+        if cached_parse is not None:
+            logger.info("Resume parse cache hit, skipping AI parsing")
+            parsed_data = dict(cached_parse.parsed_data)
+        elif use_ai_parsing:
+            # Parse PDF (CPU-bound, keep it off the event loop)
+            resume_text = await asyncio.to_thread(parser.extract_text_from_pdf, file.file)
+            
             # Use AI for accurate parsing
-            ollama = OllamaService()
-            try:
-                parsed_data = await parse_resume_with_ai(resume_text, ollama)
-            finally:
-                await ollama.close()
+            parsed_data = await parse_resume_with_ai(resume_text, ollama)
+            new_parse = True
         else:
+            resume_text = await asyncio.to_thread(parser.extract_text_from_pdf, file.file)
+            
             # Use regex parsing (faster but less accurate)
             parsed_data = {
                 "full_name": parser.extract_name(resume_text),
@@ -67,20 +178,37 @@ async def upload_resume(
             urls = parser.extract_urls(resume_text)
             parsed_data.update(urls)
         
-        # Check if knowledge base exists
-        result = await db.execute(
-            select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-        )
+        if new_parse:
+            # Remember the parse (committed together with the knowledge base write)
+            await db.execute(
+                pg_insert(ResumeCache)
+                .values(hash=digest, parsed_data=parsed_data)
+                .on_conflict_do_nothing(index_elements=[ResumeCache.hash])
+            )
+        
+        # Update existing knowledge base with a single UPDATE ... RETURNING
+        kb_columns = KnowledgeBase.__table__.columns.keys()
+        update_values = {
+            field: value for field, value in parsed_data.items()
+            if value is not None and field in kb_columns
+        }
+        
+        if update_values:
+            result = await db.execute(
+                update(KnowledgeBase)
+                .where(KnowledgeBase.user_id == 1)
+                .values(**update_values)
+                .returning(KnowledgeBase)
+            )
+        else:
+            result = await db.execute(
+                select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
+            )
         kb = result.scalar_one_or_none()
         
         if kb:
-            # Update existing
-            for field, value in parsed_data.items():
-                if value is not None:
-                    setattr(kb, field, value)
-            
             await db.commit()
-            await db.refresh(kb)
+            kb_cache.invalidate(1)
             message = "Knowledge base updated from resume"
         else:
             # Create new
@@ -91,46 +219,26 @@ async def upload_resume(
             db.add(kb)
             await db.commit()
             await db.refresh(kb)
+            kb_cache.invalidate(1)
             message = "Knowledge base created from resume"
         
-        # ✨ NEW: Auto-index into Qdrant
+        # ✨ NEW: Auto-index into Qdrant (in background, after the response)
         index_result = None
         if auto_index:
-            try:
-                from app.services.rag.rag_service import get_rag_service
-                
-                # Prepare data for indexing
-                kb_data = {
-                    "work_experience": kb.work_experience or [],
-                    "projects": kb.projects or [],
-                    "skills": kb.skills or [],
-                    "qa_pairs": kb.qa_pairs or {}
-                }
-                
-                # Index into Qdrant
-                rag_service = get_rag_service()
-                rag_service.index_knowledge_base(kb_id=kb.id, knowledge_base=kb_data)
-                
-                # Update embedding_id
-                kb.embedding_id = f"indexed_{kb.id}"
-                await db.commit()
-                
-                index_result = {
-                    "indexed": True,
-                    "experiences": len(kb_data['work_experience']),
-                    "projects": len(kb_data['projects']),
-                    "skills": len(kb_data['skills']),
-                    "qa_pairs": len(kb_data['qa_pairs'])
-                }
-                
-                message += " and indexed for RAG"
-                
-            except Exception as e:
-                logger.error(f"Auto-indexing failed: {e}")
-                index_result = {
-                    "indexed": False,
-                    "error": str(e)
-                }
+            kb_data = _kb_index_data(kb)
+            
+            # The task moves embedding_id to a new version once indexing succeeds
+            background_tasks.add_task(_index_knowledge_base_task, kb.id, kb.user_id, kb_data)
+            
+            index_result = {
+                "scheduled": True,
+                "experiences": len(kb_data['work_experience']),
+                "projects": len(kb_data['projects']),
+                "skills": len(kb_data['skills']),
+                "qa_pairs": len(kb_data['qa_pairs'])
+            }
+            
+            message += " and scheduled for RAG indexing"
         
         return {
             "success": True,
@@ -144,9 +252,14 @@ async def upload_resume(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/", response_model=KnowledgeBaseResponse, status_code=201)
+@router.post(
+    "/",
+    response_model=KnowledgeBaseResponse,
+    status_code=201,
+    openapi_extra=json_body_openapi(KnowledgeBaseCreate)
+)
 async def create_knowledge_base(
-    kb: KnowledgeBaseCreate,
+    kb: KnowledgeBaseCreate = Depends(json_body(KnowledgeBaseCreate)),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -173,31 +286,33 @@ async def create_knowledge_base(
     db.add(db_kb)
     await db.commit()
     await db.refresh(db_kb)
+    kb_cache.invalidate(1)
     
     return db_kb
 
 
-@router.get("/", response_model=KnowledgeBaseResponse)
+@router.get("/", response_model=KnowledgeBaseResponse, response_model_exclude_none=True)
 async def get_knowledge_base(
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    kb: Dict[str, Any] = Depends(get_kb_snapshot)
 ):
     """
     Get user's knowledge base profile
+    Answers 304 Not Modified when If-None-Match matches the current ETag
     """
-    result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-    )
-    kb = result.scalar_one_or_none()
-    
-    if not kb:
-        raise HTTPException(status_code=404, detail="Knowledge base not found. Please upload a resume or create manually.")
+    validators = _kb_validators(kb)
+    if _is_not_modified(request, validators["ETag"]):
+        return Response(status_code=304, headers=validators)
     
+    response.headers.update(validators)
     return kb
 
 
-@router.patch("/", response_model=KnowledgeBaseResponse)
+@router.patch("/", response_model=KnowledgeBaseResponse, openapi_extra=json_body_openapi(KnowledgeBaseUpdate))
 async def update_knowledge_base(
-    kb_update: KnowledgeBaseUpdate,
+    background_tasks: BackgroundTasks,
+    kb_update: KnowledgeBaseUpdate = Depends(json_body(KnowledgeBaseUpdate)),
     auto_reindex: bool = True,  # NEW PARAMETER
     db: AsyncSession = Depends(get_db)
 ):
@@ -209,9 +324,20 @@ async def update_knowledge_base(
         kb_update: Fields to update
         auto_reindex: Automatically re-index into Qdrant after update
     """
-    result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-    )
+    # Update fields with a single UPDATE ... RETURNING
+    update_data = kb_update.model_dump(exclude_unset=True)
+    
+    if update_data:
+        result = await db.execute(
+            update(KnowledgeBase)
+            .where(KnowledgeBase.user_id == 1)
+            .values(**update_data)
+            .returning(KnowledgeBase)
+        )
+    else:
+        result = await db.execute(
+            select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
+        )
     kb = result.scalar_one_or_none()
     
     if not kb:
@@ -220,33 +346,12 @@ async def update_knowledge_base(
             detail="Knowledge base not found. Please upload a resume first."
         )
     
-    # Update fields
-    update_data = kb_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(kb, field, value)
-    
     await db.commit()
-    await db.refresh(kb)
+    kb_cache.invalidate(1)
     
-    # ✨ NEW: Re-index if requested
+    # ✨ NEW: Re-index if requested (in background, after the response)
     if auto_reindex and kb.embedding_id:
-        try:
-            from app.services.rag.rag_service import get_rag_service
-            
-            kb_data = {
-                "work_experience": kb.work_experience or [],
-                "projects": kb.projects or [],
-                "skills": kb.skills or [],
-                "qa_pairs": kb.qa_pairs or {}
-            }
-            
-            rag_service = get_rag_service()
-            rag_service.index_knowledge_base(kb_id=kb.id, knowledge_base=kb_data)
-            
-            logger.info(f"Re-indexed knowledge base {kb.id}")
-            
-        except Exception as e:
-            logger.error(f"Re-indexing failed: {e}")
+        background_tasks.add_task(_index_knowledge_base_task, kb.id, kb.user_id, _kb_index_data(kb))
     
     return kb
 
@@ -255,6 +360,7 @@ async def update_knowledge_base(
 async def add_qa_pair(
     question: str,
     answer: str,
+    background_tasks: BackgroundTasks,
     auto_reindex: bool = True,  # NEW PARAMETER
     db: AsyncSession = Depends(get_db)
 ):
@@ -266,43 +372,29 @@ async def add_qa_pair(
         answer: Your answer
         auto_reindex: Automatically re-index into Qdrant
     """
+    # Merge the Q&A pair server-side: qa_pairs = coalesce(qa_pairs, '{}') || {question: answer}
+    merged_qa_pairs = func.coalesce(
+        cast(KnowledgeBase.qa_pairs, JSONB),
+        literal({}, JSONB)
+    ).op("||")(literal({question: answer}, JSONB))
+    
     result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
+        update(KnowledgeBase)
+        .where(KnowledgeBase.user_id == 1)
+        .values(qa_pairs=merged_qa_pairs)
+        .returning(KnowledgeBase)
     )
     kb = result.scalar_one_or_none()
     
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    # Initialize qa_pairs if None
-    if kb.qa_pairs is None:
-        kb.qa_pairs = {}
-    
-    # Add Q&A pair
-    kb.qa_pairs[question] = answer
-    
     await db.commit()
-    await db.refresh(kb)
+    kb_cache.invalidate(1)
     
-    # ✨ NEW: Re-index if requested
+    # ✨ NEW: Re-index if requested (in background, after the response)
     if auto_reindex and kb.embedding_id:
-        try:
-            from app.services.rag.rag_service import get_rag_service
-            
-            kb_data = {
-                "work_experience": kb.work_experience or [],
-                "projects": kb.projects or [],
-                "skills": kb.skills or [],
-                "qa_pairs": kb.qa_pairs or {}
-            }
-            
-            rag_service = get_rag_service()
-            rag_service.index_knowledge_base(kb_id=kb.id, knowledge_base=kb_data)
-            
-            logger.info(f"Re-indexed knowledge base {kb.id} with new Q&A")
-            
-        except Exception as e:
-            logger.error(f"Re-indexing failed: {e}")
+        background_tasks.add_task(_index_knowledge_base_task, kb.id, kb.user_id, _kb_index_data(kb))
     
     return kb
 
@@ -315,51 +407,41 @@ async def delete_knowledge_base(
     Delete user's knowledge base
     """
     result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
+        delete(KnowledgeBase).where(KnowledgeBase.user_id == 1)
     )
-    kb = result.scalar_one_or_none()
     
-    if not kb:
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    await db.delete(kb)
     await db.commit()
+    kb_cache.invalidate(1)
     
     return None
 
 
-@router.get("/export", response_model=dict)
+@router.get("/export", response_model=dict, response_model_exclude_none=True)
 async def export_knowledge_base(
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    kb: Dict[str, Any] = Depends(get_kb_snapshot)
 ):
     """
     Export knowledge base as JSON for AI consumption
+    Answers 304 Not Modified when If-None-Match matches the current ETag
     """
-    result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-    )
-    kb = result.scalar_one_or_none()
+    validators = _kb_validators(kb)
+    if _is_not_modified(request, validators["ETag"]):
+        return Response(status_code=304, headers=validators)
     
-    if not kb:
-        raise HTTPException(status_code=404, detail="Knowledge base not found")
+    response.headers.update(validators)
     
     # Convert to dict for AI
-    kb_dict = {
-        "full_name": kb.full_name,
-        "email": kb.email,
-        "phone": kb.phone,
-        "location": kb.location,
-        "linkedin_url": kb.linkedin_url,
-        "portfolio_url": kb.portfolio_url,
-        "summary": kb.summary,
-        "work_experience": kb.work_experience,
-        "education": kb.education,
-        "skills": kb.skills,
-        "certifications": kb.certifications,
-        "projects": kb.projects,
-        "preferences": kb.preferences,
-        "qa_pairs": kb.qa_pairs,
-    }
+    export_fields = [
+        "full_name", "email", "phone", "location", "linkedin_url", "portfolio_url",
+        "summary", "work_experience", "education", "skills", "certifications",
+        "projects", "preferences", "qa_pairs",
+    ]
+    kb_dict = {field: kb[field] for field in export_fields}
     
     return {
         "success": True,
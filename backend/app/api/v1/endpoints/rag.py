@@ -1,16 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+from loguru import logger
 
 from app.api.deps import get_db
 from app.models.knowledge_base import KnowledgeBase
 from app.services.rag.rag_service import get_rag_service
 from app.services.ai.ollama_tracker import ollama_tracker
+from app.services.cache.kb_cache import kb_cache
+from app.services.cache.semantic_cache import get_semantic_cache
 
 router = APIRouter()
 
+# Minimum overlap between cached and fresh retrieval for a cached answer to be reused
+MIN_CHUNK_OVERLAP = 0.6
+
+# Characters of the RAG context echoed back in responses
+CONTEXT_PREVIEW_CHARS = 500
+
+# Search results only change when the knowledge base is re-indexed
+SEARCH_CACHE_CONTROL = "private, max-age=60"
+
 
 class IndexKnowledgeBaseRequest(BaseModel):
     kb_id: Optional[int] = None
@@ -28,6 +44,72 @@ class AnswerWithRAGRequest(BaseModel):
     job_title: Optional[str] = None
     company: Optional[str] = None
     user_id: int = 1
+    stream: bool = False
+
+
+def _embed_and_retrieve(rag_service, question: str, kb_id: int) -> Tuple[List[float], Dict]:
+    """Embed the question and search all collections (sync; run in a worker thread)"""
+    question_vector = rag_service.embedding_service.encode(question)
+    retrieved = rag_service.retrieve_relevant_context(
+        question=question,
+        kb_id=kb_id,
+        max_experiences=3,
+        max_projects=2,
+        max_skills=5,
+        query_vector=question_vector
+    )
+    return question_vector, retrieved
+
+
+def _context_preview(context_str: str) -> str:
+    """Context shortened to CONTEXT_PREVIEW_CHARS, cut at a word boundary (line breaks kept)"""
+    if len(context_str) <= CONTEXT_PREVIEW_CHARS:
+        return context_str
+    
+    preview = context_str[:CONTEXT_PREVIEW_CHARS]
+    cut = max(preview.rfind(" "), preview.rfind("\n"))
+    if cut > 0:
+        preview = preview[:cut]
+    return preview.rstrip() + "..."
+
+
+def _search_etag(request: SearchRequest, embedding_id: str) -> str:
+    """Strong ETag for a search, tied to the current index version"""
+    key = (
+        f"{request.question}|{embedding_id}|{request.max_experiences}|"
+        f"{request.max_projects}|{request.max_skills}"
+    )
+    return f'"{hashlib.sha256(key.encode("utf-8")).hexdigest()}"'
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    """Async iterator over an already complete answer"""
+    yield text
+
+
+async def _rag_answer_events(
+    context: Dict,
+    chunks: AsyncIterator[str],
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a streamed RAG answer: the retrieval metadata first,
+    then the answer text as it is generated
+    """
+    yield f"event: context\ndata: {json.dumps(context)}\n\n"
+    
+    try:
+        parts: List[str] = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield f"data: {json.dumps({'response': chunk})}\n\n"
+        
+        if on_complete:
+            await on_complete("".join(parts).strip())
+        yield "data: [DONE]\n\n"
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
 
 
 @router.post("/index")
@@ -57,11 +139,19 @@ async def index_knowledge_base(
     
     rag_service = get_rag_service()
     try:
-        rag_service.index_knowledge_base(kb_id=kb_id, knowledge_base=kb_data)
-        
-        kb.embedding_id = f"indexed_{kb_id}"
-        await db.commit()
-        
+        # Embedding and Qdrant I/O are blocking; keep them off the event loop
+        changes = await asyncio.to_thread(
+            rag_service.index_knowledge_base,
+            kb_id=kb_id,
+            knowledge_base=kb_data
+        )
+
+        # Only a changed index invalidates answers cached against the old version
+        if changes["embedded"] or changes["deleted"] or not kb.embedding_id:
+            kb.embedding_id = rag_service.new_embedding_version(kb_id)
+            await db.commit()
+            kb_cache.invalidate(kb.user_id)
+
         return {
             "success": True,
             "message": f"Successfully indexed knowledge base {kb_id}",
@@ -70,7 +160,8 @@ async def index_knowledge_base(
                 "projects": len(kb_data['projects']),
                 "skills": len(kb_data['skills']),
                 "qa_pairs": len(kb_data['qa_pairs'])
-            }
+            },
+            "changes": changes
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -79,30 +170,40 @@ async def index_knowledge_base(
 @router.post("/search")
 async def search_knowledge_base(
     request: SearchRequest,
+    http_request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Search knowledge base for relevant context
+    Results are deterministic for a (question, embedding_id, limits) tuple, so
+    repeated searches are answered with 304 Not Modified via If-None-Match.
     """
     kb_id = 1
     
-    result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.id == kb_id)
-    )
-    kb = result.scalar_one_or_none()
+    kb = await kb_cache.fetch(db, kb_id)
     
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    if not kb.embedding_id:
+    if not kb["embedding_id"]:
         raise HTTPException(
             status_code=400,
             detail="Knowledge base not indexed. Call /rag/index first."
         )
     
+    etag = _search_etag(request, kb["embedding_id"])
+    headers = {"ETag": etag, "Cache-Control": SEARCH_CACHE_CONTROL}
+    if_none_match = http_request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    
     rag_service = get_rag_service()
     try:
-        retrieved = rag_service.retrieve_relevant_context(
+        retrieved = await asyncio.to_thread(
+            rag_service.retrieve_relevant_context,
             question=request.question,
             kb_id=kb_id,
             max_experiences=request.max_experiences,
@@ -126,38 +227,109 @@ async def answer_question_with_rag(
 ):
     """
     Answer a job application question using RAG with token tracking
+    Set stream=true to receive the retrieved context as the first Server-Sent
+    Event, followed by the answer while it is generated
     """
     kb_id = request.user_id
+    rag_service = get_rag_service()
     
-    result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.user_id == kb_id)
-    )
-    kb = result.scalar_one_or_none()
+    # 1. Load the knowledge base and search for relevant context concurrently
+    #    (retrieval is skipped for questions that don't need it)
+    use_rag = rag_service.should_retrieve(request.question)
+    kb_query = kb_cache.fetch(db, kb_id)
+    
+    if use_rag:
+        try:
+            kb, (question_vector, retrieved) = await asyncio.gather(
+                kb_query,
+                asyncio.to_thread(_embed_and_retrieve, rag_service, request.question, kb_id)
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    else:
+        kb = await kb_query
+        question_vector = None
+        retrieved = {}
     
     if not kb:
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     
-    if not kb.embedding_id:
+    if not kb["embedding_id"]:
         raise HTTPException(
             status_code=400,
             detail="Knowledge base not indexed. Call /rag/index first."
         )
     
-    rag_service = get_rag_service()
+    # End the read transaction so the pooled connection isn't held during generation
+    await db.commit()
     
     try:
-        # 1. Search for relevant context
-        retrieved = rag_service.retrieve_relevant_context(
-            question=request.question,
-            kb_id=kb_id,
-            max_experiences=3,
-            max_projects=2,
-            max_skills=5
-        )
-        
         # 2. Build context string
         context_str = rag_service.build_context_string(retrieved)
         
+        retrieved_summary = {
+            "num_experiences": len(retrieved.get('experiences', [])),
+            "num_projects": len(retrieved.get('projects', [])),
+            "num_skills": len(retrieved.get('skills', [])),
+            "num_qa_pairs": len(retrieved.get('qa_pairs', []))
+        }
+        context_used = _context_preview(context_str)
+        # Short fingerprint of the full context, to correlate logs and responses
+        context_hash = hashlib.blake2b(context_str.encode("utf-8"), digest_size=8).hexdigest()
+        logger.info(f"RAG context {context_hash}: {len(context_str)} chars, rag_used={use_rag}")
+        chunk_ids = rag_service.chunk_ids(retrieved)
+        stream_context = {
+            "question": request.question,
+            "retrieved_context": retrieved_summary,
+            "context_used": context_used,
+            "context_hash": context_hash,
+            "rag_used": use_rag
+        }
+        
+        # Semantic answer cache, reused only when all gates pass:
+        #   G1 question similarity >= threshold (Qdrant score_threshold)
+        #   G2 retrieved chunks overlap the ones the cached answer was grounded on
+        #   G3 knowledge base has not been re-indexed since the answer was cached
+        # First use builds the cache (embedding model, Qdrant collection check)
+        cache = await asyncio.to_thread(get_semantic_cache)
+        cache_key = cache.make_key(
+            request.user_id,
+            kb["updated_at"] or kb["created_at"],
+            request.job_title or "",
+            request.company or ""
+        )
+        cached_entry = (
+            await asyncio.to_thread(
+                cache.lookup, "rag_answer", request.question, cache_key, query_vector=question_vector
+            )
+            if use_rag else None
+        )
+        if cached_entry:
+            metadata = cached_entry.get("metadata") or {}
+            if (
+                metadata.get("embedding_version") == kb["embedding_id"]
+                and cache.jaccard(chunk_ids, metadata.get("chunk_ids", [])) >= MIN_CHUNK_OVERLAP
+            ):
+                if request.stream:
+                    return StreamingResponse(
+                        _rag_answer_events(
+                            {**stream_context, "cached": True},
+                            _single_chunk(cached_entry["response"])
+                        ),
+                        media_type="text/event-stream"
+                    )
+                
+                return {
+                    "success": True,
+                    "question": request.question,
+                    "answer": cached_entry["response"],
+                    "retrieved_context": retrieved_summary,
+                    "context_used": context_used,
+                    "context_hash": context_hash,
+                    "rag_used": use_rag,
+                    "cached": True
+                }
+        
         # 3. Count RAG chunks
         num_chunks = (
             len(retrieved.get('experiences', [])) +
@@ -167,13 +339,11 @@ async def answer_question_with_rag(
         )
         
         # 4. Prepare user profile with RAG context
+        #    (context_str already renders the retrieved experiences, projects, skills
+        #    and Q&As; passing the raw hits too would repeat them in the prompt)
         user_profile = {
-            "full_name": kb.full_name,
-            "summary": context_str,  # Use RAG context instead of full summary
-            "work_experience": retrieved.get('experiences', []),
-            "projects": retrieved.get('projects', []),
-            "skills": retrieved.get('skills', []),
-            "qa_pairs": retrieved.get('qa_pairs', [])
+            "full_name": kb["full_name"],
+            "summary": context_str  # Use RAG context instead of full summary
         }
         
         job_details = {
@@ -181,27 +351,55 @@ async def answer_question_with_rag(
             "company": request.company or ""
         }
         
+        async def cache_answer(answer: str):
+            if use_rag:
+                await asyncio.to_thread(
+                    cache.put,
+                    "rag_answer",
+                    request.question,
+                    cache_key,
+                    answer,
+                    metadata={"chunk_ids": chunk_ids, "embedding_version": kb["embedding_id"]},
+                    query_vector=question_vector
+                )
+        
         # 5. Generate answer with tracking (RAG enabled)
+        if request.stream:
+            return StreamingResponse(
+                _rag_answer_events(
+                    {**stream_context, "cached": False},
+                    ollama_tracker.answer_job_question_stream_with_tracking(
+                        question=request.question,
+                        user_profile=user_profile,
+                        job_details=job_details,
+                        user_id=request.user_id,
+                        endpoint="/rag/answer-with-rag",
+                        rag_chunks=num_chunks
+                    ),
+                    on_complete=cache_answer
+                ),
+                media_type="text/event-stream"
+            )
+        
         answer = await ollama_tracker.answer_job_question_with_tracking(
             question=request.question,
             user_profile=user_profile,
             job_details=job_details,
-            db=db,
             user_id=request.user_id,
             rag_chunks=num_chunks  # ← IMPORTANT: Marks this as RAG operation
         )
         
+        await cache_answer(answer)
+        
         return {
             "success": True,
             "question": request.question,
             "answer": answer,
-            "retrieved_context": {
-                "num_experiences": len(retrieved.get('experiences', [])),
-                "num_projects": len(retrieved.get('projects', [])),
-                "num_skills": len(retrieved.get('skills', [])),
-                "num_qa_pairs": len(retrieved.get('qa_pairs', []))
-            },
-            "context_used": context_str[:500] + "..." if len(context_str) > 500 else context_str
+            "retrieved_context": retrieved_summary,
+            "context_used": context_used,
+            "context_hash": context_hash,
+            "rag_used": use_rag,
+            "cached": False
         }
         
     except Exception as e:
@@ -215,7 +413,7 @@ async def delete_index(kb_id: int):
     """
     rag_service = get_rag_service()
     try:
-        rag_service.delete_knowledge_base(kb_id)
+        await asyncio.to_thread(rag_service.delete_knowledge_base, kb_id)
         return {
             "success": True,
             "message": f"Deleted index for knowledge base {kb_id}"
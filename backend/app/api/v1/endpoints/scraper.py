@@ -1,20 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
-from app.models.knowledge_base import KnowledgeBase
+from pydantic import BaseModel, Field
+from typing import Dict, List
+import asyncio
 
 from app.api.deps import get_db
 from app.models.job import Job
 from app.services.browser.linkedin_scraper import LinkedInScraper
+from app.services.browser.playwright_service import browser_pool
 from app.services.ai.ollama_tracker import ollama_tracker
+from app.services.cache.kb_cache import kb_cache
+from app.services.cache.job_url_cache import job_url_cache
 
 router = APIRouter()
 
 
 class ScrapeJobRequest(BaseModel):
     job_url: str
-    save_screenshot: bool = True
+    save_screenshot: bool = False
+
+
+class ScrapeJobsRequest(BaseModel):
+    job_urls: List[str] = Field(..., min_length=1, max_length=50)
+
+
+async def _scrape_job_cached(job_url: str, save_screenshot: bool = False) -> Dict:
+    """Scrape a job, reusing details scraped within the last day (screenshots always re-scrape)"""
+    if not save_screenshot:
+        job_data = await job_url_cache.get_job_data(job_url)
+        if job_data is not None:
+            return job_data
+    
+    async with browser_pool.acquire(LinkedInScraper) as scraper:
+        job_data = await scraper.scrape_job(job_url, save_screenshot=save_screenshot)
+    await job_url_cache.set_job_data(job_url, job_data)
+    return job_data
+
+
+async def _apply_to_job(job_url: str, user_profile: Dict, job_details: Dict) -> Dict:
+    """Fill the Easy Apply form in a page of the shared logged-in browser"""
+    from app.services.browser.form_filler import LinkedInFormFiller
+    
+    async with browser_pool.acquire(LinkedInFormFiller) as form_filler:
+        return await form_filler.apply_to_job(
+            job_url=job_url,
+            user_profile=user_profile,
+            job_details=job_details
+        )
 
 
 @router.post("/scrape")
@@ -25,10 +58,8 @@ async def scrape_job_endpoint(
     """
     Scrape job details from LinkedIn URL
     """
-    scraper = LinkedInScraper()
-    
     try:
-        job_data = await scraper.scrape_job(request.job_url, save_screenshot=request.save_screenshot)
+        job_data = await _scrape_job_cached(request.job_url, save_screenshot=request.save_screenshot)
         
         db_job = Job(
             user_id=1,
@@ -44,7 +75,6 @@ async def scrape_job_endpoint(
         
         db.add(db_job)
         await db.commit()
-        await db.refresh(db_job)
         
         return {
             "success": True,
@@ -62,6 +92,64 @@ async def scrape_job_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/scrape-batch")
+async def scrape_jobs_endpoint(
+    request: ScrapeJobsRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Scrape several LinkedIn job URLs concurrently (as many pages at once as
+    the browser pool allows) and save the ones that succeed
+    """
+    job_urls = list(dict.fromkeys(request.job_urls))
+    results = await asyncio.gather(
+        *(_scrape_job_cached(job_url) for job_url in job_urls),
+        return_exceptions=True
+    )
+    
+    db_jobs = []
+    errors = []
+    for job_url, job_data in zip(job_urls, results):
+        if isinstance(job_data, Exception):
+            errors.append({"url": job_url, "error": str(job_data)})
+            continue
+        
+        db_job = Job(
+            user_id=1,
+            url=job_url,
+            title=job_data.get('title'),
+            company=job_data.get('company'),
+            location=job_data.get('location'),
+            workplace_type=job_data.get('workplace_type'),
+            job_type=job_data.get('job_type'),
+            description=job_data.get('description'),
+            status='scraped'
+        )
+        db.add(db_job)
+        db_jobs.append(db_job)
+    
+    try:
+        await db.commit()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "success": bool(db_jobs),
+        "message": f"Scraped {len(db_jobs)} of {len(job_urls)} jobs",
+        "jobs": [
+            {
+                "id": db_job.id,
+                "url": db_job.url,
+                "title": db_job.title,
+                "company": db_job.company,
+                "location": db_job.location
+            }
+            for db_job in db_jobs
+        ],
+        "errors": errors
+    }
+
+
 @router.post("/scrape-and-prepare")
 async def scrape_and_prepare(
     request: ScrapeJobRequest,
@@ -70,11 +158,9 @@ async def scrape_and_prepare(
     """
     Scrape job and generate cover letter with token tracking
     """
-    scraper = LinkedInScraper()
-    
     try:
         # 1. Scrape job
-        job_data = await scraper.scrape_job(request.job_url, save_screenshot=False)
+        job_data = await _scrape_job_cached(request.job_url)
         
         # 2. Save job to database
         db_job = Job(
@@ -91,13 +177,9 @@ async def scrape_and_prepare(
         
         db.add(db_job)
         await db.commit()
-        await db.refresh(db_job)
         
         # 3. Get user's knowledge base
-        kb_result = await db.execute(
-            select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-        )
-        kb = kb_result.scalar_one_or_none()
+        kb = await kb_cache.fetch(db, 1)
         
         if not kb:
             raise HTTPException(
@@ -105,13 +187,16 @@ async def scrape_and_prepare(
                 detail="Knowledge base not found. Please upload your resume first."
             )
         
+        # End the read transaction so the pooled connection isn't held during generation
+        await db.commit()
+        
         # 4. Prepare data for cover letter
         user_profile = {
-            "full_name": kb.full_name,
-            "summary": kb.summary,
-            "work_experience": kb.work_experience,
-            "skills": kb.skills,
-            "education": kb.education
+            "full_name": kb["full_name"],
+            "summary": kb["summary"],
+            "work_experience": kb["work_experience"],
+            "skills": kb["skills"],
+            "education": kb["education"]
         }
         
         job_details = {
@@ -125,7 +210,6 @@ async def scrape_and_prepare(
         cover_letter = await ollama_tracker.generate_cover_letter_with_tracking(
             user_profile=user_profile,
             job_details=job_details,
-            db=db,
             user_id=1,
             job_id=db_job.id,
             rag_used=False  # Set True if using RAG for cover letter
@@ -154,17 +238,15 @@ async def auto_apply_to_job(
     """
     Automatically apply to a LinkedIn job using Easy Apply with token tracking
     """
-    from app.services.browser.form_filler import LinkedInFormFiller
     from app.models.application import Application
     
-    form_filler = LinkedInFormFiller()
+    # Repeated clicks on a job already applied to skip the DB, scrape and browser
+    if await job_url_cache.is_applied(1, request.job_url):
+        raise HTTPException(status_code=409, detail="Already applied to this job")
     
     try:
         # 1. Get user's knowledge base
-        kb_result = await db.execute(
-            select(KnowledgeBase).where(KnowledgeBase.user_id == 1)
-        )
-        kb = kb_result.scalar_one_or_none()
+        kb = await kb_cache.fetch(db, 1)
         
         if not kb:
             raise HTTPException(
@@ -178,10 +260,13 @@ async def auto_apply_to_job(
         )
         job = job_result.scalar_one_or_none()
         
+        # End the read transaction so the pooled connection isn't held while
+        # the browser scrapes or the LLM generates
+        await db.commit()
+        
         if not job:
             # Scrape job details first
-            scraper = LinkedInScraper()
-            job_data = await scraper.scrape_job(request.job_url, save_screenshot=False)
+            job_data = await _scrape_job_cached(request.job_url)
             
             job = Job(
                 user_id=1,
@@ -196,23 +281,22 @@ async def auto_apply_to_job(
             )
             db.add(job)
             await db.commit()
-            await db.refresh(job)
         
         # 3. Prepare user profile
         user_profile = {
-            "full_name": kb.full_name,
-            "email": kb.email,
-            "phone": kb.phone,
-            "location": kb.location,
-            "linkedin_url": kb.linkedin_url,
-            "portfolio_url": kb.portfolio_url,
-            "summary": kb.summary,
-            "work_experience": kb.work_experience,
-            "skills": kb.skills,
-            "education": kb.education,
-            "certifications": kb.certifications,
-            "projects": kb.projects,
-            "qa_pairs": kb.qa_pairs
+            "full_name": kb["full_name"],
+            "email": kb["email"],
+            "phone": kb["phone"],
+            "location": kb["location"],
+            "linkedin_url": kb["linkedin_url"],
+            "portfolio_url": kb["portfolio_url"],
+            "summary": kb["summary"],
+            "work_experience": kb["work_experience"],
+            "skills": kb["skills"],
+            "education": kb["education"],
+            "certifications": kb["certifications"],
+            "projects": kb["projects"],
+            "qa_pairs": kb["qa_pairs"]
         }
         
         job_details = {
@@ -221,23 +305,29 @@ async def auto_apply_to_job(
             "description": job.description
         }
         
-        # 4. Generate cover letter WITH TRACKING first
-        cover_letter = await ollama_tracker.generate_cover_letter_with_tracking(
-            user_profile=user_profile,
-            job_details=job_details,
-            db=db,
-            user_id=1,
-            job_id=job.id,
-            rag_used=False
+        # 4-5. Generate cover letter WITH TRACKING while the browser fills the form
+        #      (independent work; neither task touches the db session, usage is
+        #      written by the background token usage writer)
+        cover_task = asyncio.create_task(
+            ollama_tracker.generate_cover_letter_with_tracking(
+                user_profile=user_profile,
+                job_details=job_details,
+                user_id=1,
+                job_id=job.id,
+                rag_used=False
+            )
         )
-        
-        # 5. Apply to job (form filler will use ollama_tracker internally)
-        result = await form_filler.apply_to_job(
-            job_url=request.job_url,
-            user_profile=user_profile,
-            job_details=job_details
+        apply_task = asyncio.create_task(
+            _apply_to_job(request.job_url, user_profile, job_details)
         )
         
+        try:
+            cover_letter, result = await asyncio.gather(cover_task, apply_task)
+        except Exception:
+            cover_task.cancel()
+            apply_task.cancel()
+            raise
+        
         if not result['success']:
             raise HTTPException(status_code=400, detail=result.get('error'))
         
@@ -254,7 +344,7 @@ async def auto_apply_to_job(
         job.status = 'applied'
         
         await db.commit()
-        await db.refresh(application)
+        await job_url_cache.mark_applied(1, request.job_url)
         
         return {
             "success": True,
@@ -5,6 +5,7 @@ Provides endpoints for viewing and analyzing token usage
 from typing import List, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db
@@ -16,11 +17,17 @@ from app.schemas.token_usage import (
     TokenUsageAlert
 )
 from app.services.tracker.token_tracker import TokenTracker
+from app.services.cache.usage_stats_cache import usage_stats_cache
 from app.models.token_usage import TokenUsage
-from sqlalchemy import select, and_
+from app.models.response_evaluation import ResponseEvaluation
+from app.db.partitions import drop_partitions_before
+from sqlalchemy import select, delete, func, and_, exists, literal_column, lambda_stmt, text
 
 router = APIRouter()
 
+# Day bucket of the raw /timeline query
+TIMELINE_DAY = func.date_trunc(literal_column("'day'"), TokenUsage.created_at).label('day')
+
 
 @router.get("/recent", response_model=List[TokenUsageResponse])
 async def get_recent_usage(
@@ -35,7 +42,8 @@ async def get_recent_usage(
     """
     try:
         usage_records = await TokenTracker.get_recent_usage(db, user_id, limit)
-        return usage_records
+        # Plain row dicts of TokenUsageResponse's columns; skip response_model re-validation
+        return ORJSONResponse(usage_records)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching usage: {str(e)}")
 
@@ -75,7 +83,8 @@ async def get_usage_statistics(
             rag_used=rag_used
         )
         stats = await TokenTracker.get_usage_stats(db, filters)
-        return stats
+        # Already a validated TokenUsageStats; serialize it once, skipping response_model
+        return Response(stats.model_dump_json(), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating stats: {str(e)}")
 
@@ -87,18 +96,26 @@ async def get_daily_statistics(
 ):
     """
     Get token usage statistics for today.
+    Cached briefly in Redis (dashboards poll this); recording usage invalidates it.
     """
     try:
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = today_start + timedelta(days=1)
         
+        cache_key = usage_stats_cache.daily_key(user_id, today_start)
+        stats_json = await usage_stats_cache.get_json(cache_key)
+        if stats_json is not None:
+            return Response(stats_json, media_type="application/json")
+        
         filters = TokenUsageFilter(
             user_id=user_id,
             start_date=today_start,
             end_date=today_end
         )
         stats = await TokenTracker.get_usage_stats(db, filters)
-        return stats
+        stats_json = stats.model_dump_json()
+        await usage_stats_cache.set_json(cache_key, stats_json)
+        return Response(stats_json, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating daily stats: {str(e)}")
 
@@ -110,16 +127,28 @@ async def get_monthly_statistics(
 ):
     """
     Get token usage statistics for this month.
+    Cached briefly in Redis (dashboards poll this); recording usage invalidates it.
     """
     try:
         month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        filters = TokenUsageFilter(
-            user_id=user_id,
-            start_date=month_start
-        )
-        stats = await TokenTracker.get_usage_stats(db, filters)
-        return stats
+        cache_key = usage_stats_cache.monthly_key(user_id, month_start)
+        stats_json = await usage_stats_cache.get_json(cache_key)
+        if stats_json is not None:
+            return Response(stats_json, media_type="application/json")
+        
+        if TokenTracker.daily_view_ready:
+            # Past days from the daily rollup, only today from raw records
+            stats = await TokenTracker.get_usage_stats_since(db, user_id, month_start)
+        else:
+            filters = TokenUsageFilter(
+                user_id=user_id,
+                start_date=month_start
+            )
+            stats = await TokenTracker.get_usage_stats(db, filters)
+        stats_json = stats.model_dump_json()
+        await usage_stats_cache.set_json(cache_key, stats_json)
+        return Response(stats_json, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating monthly stats: {str(e)}")
 
@@ -137,26 +166,43 @@ async def get_usage_by_operation(
     Returns a list of operation types with their token usage.
     """
     try:
-        filters = TokenUsageFilter(
-            user_id=user_id,
-            start_date=start_date,
-            end_date=end_date
-        )
-        stats = await TokenTracker.get_usage_stats(db, filters)
+        # Group, total and sort per operation type in Postgres
+        if TokenTracker.daily_view_ready and not start_date and not end_date:
+            # All-time breakdown: past days from the daily rollup, only today from raw records
+            rows = TokenTracker.daily_usage_rows(user_id)
+            total_tokens = func.sum(rows.c.total_tokens)
+            query = select(
+                rows.c.operation_type,
+                total_tokens,
+                func.sum(rows.c.operations)
+            ).group_by(rows.c.operation_type).order_by(total_tokens.desc())
+        else:
+            # lambda_stmt: built and compiled once per shape, later calls only rebind the values
+            query = lambda_stmt(lambda: select(
+                TokenUsage.operation_type,
+                func.sum(TokenUsage.total_tokens),
+                func.count()
+            ).where(TokenUsage.user_id == user_id).group_by(TokenUsage.operation_type).order_by(
+                func.sum(TokenUsage.total_tokens).desc()
+            ))
+            if start_date:
+                query += lambda s: s.where(TokenUsage.created_at >= start_date)
+            if end_date:
+                query += lambda s: s.where(TokenUsage.created_at <= end_date)
         
-        # Format as list of dicts
-        result = []
-        for op_type, token_count in stats.tokens_by_type.items():
-            result.append({
-                "operation_type": op_type,
-                "total_tokens": token_count,
-                "operations_count": stats.operations_by_type.get(op_type, 0),
-                "avg_tokens": token_count / stats.operations_by_type.get(op_type, 1)
-            })
+        rows = await db.execute(query)
         
-        # Sort by total tokens descending
-        result.sort(key=lambda x: x["total_tokens"], reverse=True)
-        return result
+        result = [
+            {
+                "operation_type": op_type,
+                "total_tokens": int(token_count),
+                "operations_count": int(operations_count),
+                "avg_tokens": float(token_count / operations_count)
+            }
+            for op_type, token_count, operations_count in rows.all()
+        ]
+        # Built from plain ints/floats already; skip response_model re-validation
+        return ORJSONResponse(result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting operation breakdown: {str(e)}")
@@ -174,41 +220,26 @@ async def get_rag_comparison(
     Shows the efficiency gains from using RAG.
     """
     try:
-        # Get stats with RAG
-        rag_filters = TokenUsageFilter(user_id=user_id, rag_used=True, operation_type=operation_type)
-        rag_stats = await TokenTracker.get_usage_stats(db, rag_filters)
-        
-        # Get stats without RAG
-        non_rag_filters = TokenUsageFilter(user_id=user_id, rag_used=False, operation_type=operation_type)
-        non_rag_stats = await TokenTracker.get_usage_stats(db, non_rag_filters)
+        # RAG and non-RAG buckets from one query
+        split = await TokenTracker.get_rag_split_stats(db, user_id, operation_type)
         
         # Calculate savings
-        rag_avg = rag_stats.avg_tokens_per_operation
-        non_rag_avg = non_rag_stats.avg_tokens_per_operation
+        rag_avg = split["rag"]["avg_tokens"]
+        non_rag_avg = split["non_rag"]["avg_tokens"]
         
         savings_percentage = 0.0
         if non_rag_avg > 0:
             savings_percentage = ((non_rag_avg - rag_avg) / non_rag_avg) * 100
         
-        return {
-            "rag_operations": {
-                "count": rag_stats.total_operations,
-                "total_tokens": rag_stats.total_tokens,
-                "avg_tokens": rag_avg,
-                "avg_response_time_ms": rag_stats.avg_response_time_ms
-            },
-            "non_rag_operations": {
-                "count": non_rag_stats.total_operations,
-                "total_tokens": non_rag_stats.total_tokens,
-                "avg_tokens": non_rag_avg,
-                "avg_response_time_ms": non_rag_stats.avg_response_time_ms
-            },
+        return ORJSONResponse({
+            "rag_operations": split["rag"],
+            "non_rag_operations": split["non_rag"],
             "comparison": {
                 "token_savings_percentage": round(savings_percentage, 2),
                 "avg_tokens_saved_per_operation": round(non_rag_avg - rag_avg, 2),
                 "recommendation": "Use RAG for better efficiency" if savings_percentage > 0 else "RAG may not be beneficial for this operation"
             }
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error comparing RAG usage: {str(e)}")
@@ -251,39 +282,45 @@ async def get_usage_timeline(
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        query = select(TokenUsage).where(
-            and_(
-                TokenUsage.user_id == user_id,
-                TokenUsage.created_at >= start_date
-            )
-        ).order_by(TokenUsage.created_at)
+        if TokenTracker.daily_view_ready:
+            # Past days from the daily rollup (whole days), only today from raw records
+            start_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+            rows = TokenTracker.daily_usage_rows(user_id, start_day)
+            query = select(
+                rows.c.day,
+                func.sum(rows.c.total_tokens),
+                func.sum(rows.c.operations),
+                func.sum(rows.c.rag_operations)
+            ).group_by(rows.c.day).order_by(rows.c.day)
+        else:
+            # Aggregate per day in Postgres so only one row per day crosses the wire
+            # ('day' rendered inline so SELECT and GROUP BY are the identical expression;
+            # lambda_stmt: built and compiled once, later calls only rebind the values)
+            query = lambda_stmt(lambda: select(
+                TIMELINE_DAY,
+                func.sum(TokenUsage.total_tokens),
+                func.count(),
+                func.count().filter(TokenUsage.rag_used)
+            ).where(
+                and_(
+                    TokenUsage.user_id == user_id,
+                    TokenUsage.created_at >= start_date
+                )
+            ).group_by(TIMELINE_DAY).order_by(TIMELINE_DAY))
         
         result = await db.execute(query)
-        records = result.scalars().all()
-        
-        # Group by day
-        daily_usage = {}
-        for record in records:
-            day = record.created_at.date().isoformat()
-            if day not in daily_usage:
-                daily_usage[day] = {
-                    "date": day,
-                    "total_tokens": 0,
-                    "operations": 0,
-                    "rag_operations": 0,
-                    "non_rag_operations": 0
-                }
-            
-            daily_usage[day]["total_tokens"] += record.total_tokens
-            daily_usage[day]["operations"] += 1
-            if record.rag_used == 'true':
-                daily_usage[day]["rag_operations"] += 1
-            else:
-                daily_usage[day]["non_rag_operations"] += 1
         
-        # Convert to sorted list
-        timeline = sorted(daily_usage.values(), key=lambda x: x["date"])
-        return timeline
+        timeline = [
+            {
+                "date": day_start.date().isoformat(),
+                "total_tokens": int(total_tokens or 0),
+                "operations": int(operations),
+                "rag_operations": int(rag_operations),
+                "non_rag_operations": int(operations - rag_operations)
+            }
+            for day_start, total_tokens, operations, rag_operations in result.all()
+        ]
+        return ORJSONResponse(timeline)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting timeline: {str(e)}")
@@ -298,29 +335,43 @@ async def clear_old_records(
     """
     Delete token usage records older than N days.
     
-    Useful for database maintenance.
+    Useful for database maintenance. For all users, whole months older than the
+    cutoff are dropped as partitions; only the rest is deleted row by row.
     """
     try:
         cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
         
-        # Build delete query
-        query = select(TokenUsage).where(TokenUsage.created_at < cutoff_date)
-        if user_id:
-            query = query.where(TokenUsage.user_id == user_id)
+        # Fully expired months go at once (instant, leaves no bloat behind)
+        dropped_partitions = []
+        if not user_id:
+            dropped_partitions = await drop_partitions_before(cutoff_date)
         
-        result = await db.execute(query)
-        records_to_delete = result.scalars().all()
+        # The row-by-row DELETEs below can outlast the pool-wide statement_timeout
+        # (lifted for this transaction only)
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
         
-        count = len(records_to_delete)
+        # Single server-side DELETE for the remainder (no rows loaded into the session)
+        query = lambda_stmt(lambda: delete(TokenUsage).where(TokenUsage.created_at < cutoff_date))
+        if user_id:
+            query += lambda s: s.where(TokenUsage.user_id == user_id)
         
-        for record in records_to_delete:
-            await db.delete(record)
+        result = await db.execute(query, execution_options={"synchronize_session": False})
+        count = result.rowcount
+        
+        # Evaluations of removed records (no FK cascade onto the partitioned table)
+        orphaned = delete(ResponseEvaluation).where(
+            ~exists().where(TokenUsage.id == ResponseEvaluation.token_usage_id)
+        )
+        if user_id:
+            orphaned = orphaned.where(ResponseEvaluation.user_id == user_id)
+        await db.execute(orphaned.execution_options(synchronize_session=False))
         
         await db.commit()
         
         return {
             "message": f"Deleted {count} records older than {days_to_keep} days",
             "deleted_count": count,
+            "dropped_partitions": dropped_partitions,
             "cutoff_date": cutoff_date.isoformat()
         }
         
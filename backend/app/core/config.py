@@ -5,6 +5,10 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Job Application Agent"
     
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False  # One JSON object per line instead of the colorized template
+    
     # Database
     POSTGRES_SERVER: str = "127.0.0.1"
     POSTGRES_USER: str = "postgres"
@@ -12,6 +16,16 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "job_agent"
     POSTGRES_PORT: int = 5432
     
+    # Connection pool (per process)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 40  # Burst headroom for concurrent dashboard polling
+    DB_POOL_TIMEOUT: int = 10  # Seconds to wait for a free connection (fail fast instead of hanging)
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_STATEMENT_CACHE_SIZE: int = 512  # Prepared statements kept per connection
+    DB_STATEMENT_TIMEOUT_MS: int = 10000  # Postgres cancels any single query running longer
+    DB_POOL_STATUS_LOG_SECONDS: int = 60  # How often pool usage is logged (DEBUG)
+    TOKEN_USAGE_DAILY_REFRESH_DELAY_SECONDS: int = 300  # How long after UTC midnight the token_usage_daily rollup is refreshed (lets the last queued writes of the day land)
+    
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -41,6 +55,7 @@ class Settings(BaseSettings):
     # Ollama
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3:latest"
+    OLLAMA_KEEP_ALIVE: str = "1h"  # How long Ollama keeps the model (and its KV cache) loaded
     
     # Browser
     BROWSER_HEADLESS: bool = False
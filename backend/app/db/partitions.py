@@ -0,0 +1,111 @@
+"""
+Token Usage Partitions
+token_usage and token_usage_text are range-partitioned by month on created_at
+(docs/token_usage_partitioning_migration.sql). Upcoming months are created ahead
+of time here, and retention drops whole months instead of deleting rows.
+"""
+from datetime import datetime
+from typing import List
+from loguru import logger
+from sqlalchemy import text
+import asyncio
+import re
+
+from app.db.session import engine
+
+
+# Partitioned tables, in drop order (token_usage_text references token_usage)
+PARTITIONED_TABLES = ("token_usage_text", "token_usage")
+
+# <table>_yYYYYmMM
+PARTITION_SUFFIX = re.compile(r"_y(\d{4})m(\d{2})$")
+
+# Months of partitions kept ready beyond the current one
+MONTHS_AHEAD = 3
+
+# Partitions are checked once a day
+CHECK_INTERVAL_SECONDS = 86400
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + years, month=month_index + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month:%Y}m{month:%m}"
+
+
+async def create_partitions(months_ahead: int = MONTHS_AHEAD):
+    """Create this month's and the next months_ahead months' partitions if missing"""
+    current = month_start(datetime.utcnow())
+    
+    async with engine.begin() as conn:
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            end = add_months(start, 1)
+            for table in reversed(PARTITIONED_TABLES):
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+
+
+async def drop_partitions_before(cutoff: datetime) -> List[str]:
+    """
+    Detach and drop every monthly partition that ends on or before cutoff
+    
+    Returns:
+        Names of the dropped partitions
+    """
+    dropped = []
+    
+    # DETACH PARTITION CONCURRENTLY can't run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        
+        # Detaching waits for in-flight queries on the table; don't let
+        # DB_STATEMENT_TIMEOUT_MS cancel it
+        await conn.execute(text("SET statement_timeout = 0"))
+        try:
+            for table in PARTITIONED_TABLES:
+                result = await conn.execute(
+                    text(
+                        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                        "WHERE i.inhparent = CAST(:parent AS regclass)"
+                    ),
+                    {"parent": table}
+                )
+                
+                for (name,) in result.all():
+                    match = PARTITION_SUFFIX.search(name)
+                    if not match:
+                        continue
+                    
+                    month_end = add_months(datetime(int(match[1]), int(match[2]), 1), 1)
+                    if month_end > cutoff:
+                        continue
+                    
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+                    await conn.execute(text(f"DROP TABLE {name}"))
+                    dropped.append(name)
+                    logger.info(f"Dropped partition {name}")
+        finally:
+            await conn.execute(text("RESET statement_timeout"))
+    
+    return dropped
+
+
+async def maintain_partitions():
+    """Keep upcoming partitions created for the app's lifetime"""
+    while True:
+        try:
+            await create_partitions()
+        except Exception as e:
+            logger.warning(f"Could not create token_usage partitions: {e}")
+        
+        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
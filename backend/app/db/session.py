@@ -1,18 +1,30 @@
 ﻿from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from app.core.config import settings
+from loguru import logger
+import asyncio
 
-# Debug: Print the URL to the console when the app starts
-# (This helps verify the password is actually present)
-print(f"CONNECTING TO: {settings.DATABASE_URL}")
+from app.core.config import settings
 
 engine = create_async_engine(
     settings.DATABASE_URL,  # Use the settings URL, NOT a hardcoded string
     echo=False,
     future=True,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    # REMOVED: connect_args={"server_settings": {"password": ""}} <- This was causing the error
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args={
+        # Reuse prepared statements (and their plans) for the repeated stats/tracker queries
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {
+            # JIT compilation costs more than it saves on these small OLTP queries
+            "jit": "off",
+            # A runaway query is cancelled instead of holding its pooled connection
+            # (bulk maintenance like /token-usage/clear-old lifts it with SET LOCAL)
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+        },
+    },
 )
 
 async_session = async_sessionmaker(
@@ -21,4 +33,11 @@ async_session = async_sessionmaker(
     expire_on_commit=False,
     autoflush=False,
     autocommit=False,
-)
\ No newline at end of file
+)
+
+
+async def log_pool_status(interval_seconds: int):
+    """Log connection pool usage every interval_seconds, to spot saturation"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        logger.debug(f"DB pool: {engine.pool.status()}")
\ No newline at end of file
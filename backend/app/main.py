@@ -1,32 +1,87 @@
 import sys
 import asyncio
+from contextlib import asynccontextmanager
 
 # Fix for Windows + Playwright
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from app.api.v1 import api_router
 from app.core.config import settings
+from app.db.session import log_pool_status
+from app.db.partitions import maintain_partitions
+from app.services.ai.ollama_service import get_ollama_client, close_ollama_client, ollama_service
+from app.services.cache.redis_client import close_redis_client
+from app.services.browser.playwright_service import browser_pool
+from app.services.tracker.token_tracker import refresh_daily_usage_view, write_usage_records, flush_usage_records
 
-# Configure logging
+# Configure logging (enqueue: a background thread writes stdout, handlers never block on it)
 logger.remove()
 logger.add(
     sys.stdout,
-    colorize=True,
+    enqueue=True,
+    level=settings.LOG_LEVEL,
+    serialize=settings.LOG_JSON,
+    colorize=not settings.LOG_JSON,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>"
 )
 
+def init_qdrant():
+    """Create Qdrant collections (blocking client calls; run off the event loop)"""
+    try:
+        from app.services.qdrant.qdrant_service import get_qdrant_service
+        qdrant = get_qdrant_service()
+        qdrant.create_collections(vector_size=384)
+        logger.info("Qdrant collections initialized")
+    except Exception as e:
+        logger.error(f"Qdrant initialization error: {e}")
+        logger.warning("RAG features will not be available")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open shared Ollama HTTP client
+    get_ollama_client()
+    
+    # Background work: nothing here delays serving the first request
+    background_tasks = [
+        # Warm the model up
+        asyncio.create_task(ollama_service.warm_up()),
+        # Idempotent Qdrant collection setup
+        asyncio.create_task(asyncio.to_thread(init_qdrant)),
+        # Keep the daily token usage rollup behind the dashboards current
+        asyncio.create_task(refresh_daily_usage_view(settings.TOKEN_USAGE_DAILY_REFRESH_DELAY_SECONDS)),
+        asyncio.create_task(log_pool_status(settings.DB_POOL_STATUS_LOG_SECONDS)),
+        # Create upcoming monthly token_usage partitions ahead of time
+        asyncio.create_task(maintain_partitions()),
+        # Batch-insert the token usage recorded by the tracked Ollama calls
+        asyncio.create_task(write_usage_records()),
+    ]
+    logger.info("Application startup complete")
+    
+    yield
+    
+    logger.info("Application shutting down")
+    for task in background_tasks:
+        task.cancel()
+    await flush_usage_records()
+    await close_ollama_client()
+    await close_redis_client()
+    await browser_pool.stop()
+
 app = FastAPI(
     title="Job Application Agent API",
     description="Automated job application system with RAG",
     version="0.1.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -49,24 +104,6 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Application startup complete")
-    
-    # Initialize Qdrant collections
-    try:
-        from app.services.qdrant.qdrant_service import get_qdrant_service
-        qdrant = get_qdrant_service()
-        qdrant.create_collections(vector_size=384)
-        logger.info("Qdrant collections initialized")
-    except Exception as e:
-        logger.error(f"Qdrant initialization error: {e}")
-        logger.warning("RAG features will not be available")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Application shutting down")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
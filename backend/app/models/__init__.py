@@ -2,7 +2,8 @@
 from app.models.job import Job
 from app.models.application import Application
 from app.models.knowledge_base import KnowledgeBase
-from app.models.token_usage import TokenUsage
+from app.models.token_usage import TokenUsage, TokenUsageText
 from app.models.response_evaluation import ResponseEvaluation
+from app.models.resume_cache import ResumeCache
 
-__all__ = ["User", "Job", "Application", "KnowledgeBase", "TokenUsage", "ResponseEvaluation"]
\ No newline at end of file
+__all__ = ["User", "Job", "Application", "KnowledgeBase", "TokenUsage", "TokenUsageText", "ResponseEvaluation", "ResumeCache"]
\ No newline at end of file
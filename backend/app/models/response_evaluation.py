@@ -14,7 +14,7 @@ class ResponseEvaluation(Base):
     __tablename__ = "response_evaluations"
 
     id = Column(Integer, primary_key=True, index=True)
-    token_usage_id = Column(Integer, ForeignKey("token_usage.id"), nullable=False, index=True)
+    token_usage_id = Column(Integer, nullable=False, index=True)  # No FK: token_usage is partitioned (PK is id + created_at)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Scores (1-5 scale)
@@ -39,7 +39,11 @@ class ResponseEvaluation(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
-    token_usage = relationship("TokenUsage", backref="evaluations")
+    token_usage = relationship(
+        "TokenUsage",
+        primaryjoin="foreign(ResponseEvaluation.token_usage_id) == TokenUsage.id",
+        backref="evaluations"
+    )
     user = relationship("User", backref="response_evaluations")
 
     def __repr__(self):
@@ -0,0 +1,21 @@
+"""
+Resume Parse Cache Model
+AI-parsed resume data keyed by the SHA-256 digest of the uploaded PDF
+"""
+from sqlalchemy import Column, LargeBinary, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class ResumeCache(Base):
+    """Exact-match cache of resume parses, so re-uploading the same PDF skips the LLM"""
+    __tablename__ = "resume_cache"
+
+    hash = Column(LargeBinary(32), primary_key=True)  # sha256(pdf_bytes).digest()
+    parsed_data = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ResumeCache(hash={self.hash.hex()[:12]})>"
\ No newline at end of file
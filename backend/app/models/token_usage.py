@@ -3,7 +3,7 @@ Token Usage Tracking Model
 Tracks token consumption for all AI interactions
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, ForeignKeyConstraint, Text, Float, Index, MetaData, Table
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -14,8 +14,8 @@ class TokenUsage(Base):
     """Track token usage for all AI operations"""
     __tablename__ = "token_usage"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Leading column of the composite indexes
     job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True, index=True)
     application_id = Column(Integer, ForeignKey("applications.id"), nullable=True, index=True)
     
@@ -29,18 +29,14 @@ class TokenUsage(Base):
     completion_tokens = Column(Integer, nullable=False, default=0)
     total_tokens = Column(Integer, nullable=False, default=0)
     
-    # Store actual text for evaluation
-    prompt_text = Column(Text, nullable=True)
-    completion_text = Column(Text, nullable=True)
-    
     # Context information
-    rag_used = Column(String, nullable=True)
+    rag_used = Column(Boolean, nullable=True, default=False, server_default="false")
     rag_chunks_retrieved = Column(Integer, nullable=True)
     context_length = Column(Integer, nullable=True)
     
     # Performance metrics
     response_time_ms = Column(Float, nullable=True)
-    success = Column(String, nullable=False, default='true')
+    success = Column(Boolean, nullable=False, default=True, server_default="true")
     error_message = Column(Text, nullable=True)
     
     # Cost tracking
@@ -49,13 +45,73 @@ class TokenUsage(Base):
     # Additional metadata
     extra_metadata = Column(JSONB, nullable=True)
     
-    # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Timestamps (monthly partition key, so part of the primary key)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
+    
+    # Every usage query filters by user and a created_at window
+    __table_args__ = (
+        Index("idx_token_usage_user_created", user_id, created_at.desc()),
+        Index("idx_token_usage_user_operation_created", user_id, operation_type, created_at),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     # Relationships
     user = relationship("User", backref="token_usage")
     job = relationship("Job", backref="token_usage")
     application = relationship("Application", backref="token_usage")
+    
+    # Prompt/completion text lives in token_usage_text, off the hot row
+    usage_text = relationship(
+        "TokenUsageText",
+        uselist=False,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise"
+    )
 
     def __repr__(self):
-        return f"<TokenUsage {self.operation_type} - {self.total_tokens} tokens>"
\ No newline at end of file
+        return f"<TokenUsage {self.operation_type} - {self.total_tokens} tokens>"
+
+
+class TokenUsageText(Base):
+    """Prompt/completion text of a token usage record, stored for evaluation"""
+    __tablename__ = "token_usage_text"
+
+    token_usage_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, primary_key=True)  # token_usage's partition key
+    prompt_text = Column(Text, nullable=True)
+    completion_text = Column(Text, nullable=True)
+    
+    # Partitioned like token_usage, so retention drops both a month at a time
+    __table_args__ = (
+        ForeignKeyConstraint(
+            [token_usage_id, created_at],
+            ["token_usage.id", "token_usage.created_at"],
+            ondelete="CASCADE"
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    def __repr__(self):
+        return f"<TokenUsageText {self.token_usage_id}>"
+
+
+# Per user, day and operation rollup of complete days (materialized view, see
+# docs/token_usage_daily_migration.sql). Kept off Base.metadata so it is never
+# created as a table.
+token_usage_daily = Table(
+    "token_usage_daily",
+    MetaData(),
+    Column("user_id", Integer),
+    Column("day", DateTime),
+    Column("operation_type", String),
+    Column("operations", Integer),
+    Column("rag_operations", Integer),
+    Column("successful_operations", Integer),
+    Column("total_tokens", Integer),
+    Column("prompt_tokens", Integer),
+    Column("completion_tokens", Integer),
+    Column("total_cost", Float),
+    Column("response_time_ms_sum", Float),
+    Column("response_time_ms_count", Integer),
+)
\ No newline at end of file
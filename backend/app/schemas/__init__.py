@@ -1,4 +1,4 @@
-from app.schemas.job import JobCreate, JobUpdate, JobResponse, JobStatus
+from app.schemas.job import JobCreate, JobUpdate, JobResponse, JobSummaryResponse, JobStatus
 from app.schemas.application import ApplicationCreate, ApplicationUpdate, ApplicationResponse, ApplicationStatus
 from app.schemas.knowledge_base import KnowledgeBaseCreate, KnowledgeBaseUpdate, KnowledgeBaseResponse
 
@@ -6,6 +6,7 @@ __all__ = [
     "JobCreate",
     "JobUpdate", 
     "JobResponse",
+    "JobSummaryResponse",
     "JobStatus",
     "ApplicationCreate",
     "ApplicationUpdate",
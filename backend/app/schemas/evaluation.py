@@ -3,7 +3,7 @@ Response Evaluation Schemas
 """
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
 
 
@@ -53,8 +53,8 @@ class ResponseEvaluationResponse(ResponseEvaluationCreate):
     id: int
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    # Keep the validated evaluation_method as its plain string
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
 
 
 class EvaluationStats(BaseModel):
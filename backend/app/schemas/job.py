@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, ConfigDict, HttpUrl
 from typing import Optional
 from datetime import datetime
 from enum import Enum
@@ -38,6 +38,21 @@ class JobUpdate(BaseModel):
     status: Optional[JobStatus] = None
 
 
+class JobSummaryResponse(BaseModel):
+    """Lightweight job row for list views (no description/requirements)"""
+    id: int
+    url: str
+    title: Optional[str] = None
+    company: Optional[str] = None
+    location: Optional[str] = None
+    workplace_type: Optional[str] = None
+    status: JobStatus
+    created_at: datetime
+
+    # Keep the validated status as its plain string: no Enum instance per row
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
+
+
 class JobResponse(JobBase):
     id: int
     user_id: int
@@ -46,5 +61,4 @@ class JobResponse(JobBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
\ No newline at end of file
@@ -1,10 +1,17 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, StringConstraints
+from typing import Annotated, Optional, Dict, Any, List
+
+
+# Cheap shape check run by pydantic-core's regex engine; profiles are re-sent on
+# every update, so full RFC validation (email-validator) isn't worth it here
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+Email = Annotated[str, StringConstraints(strip_whitespace=True, max_length=320, pattern=EMAIL_PATTERN)]
 
 
 class KnowledgeBaseBase(BaseModel):
     full_name: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     phone: Optional[str] = None
     location: Optional[str] = None
     linkedin_url: Optional[str] = None
@@ -32,6 +39,6 @@ class KnowledgeBaseUpdate(KnowledgeBaseBase):
 class KnowledgeBaseResponse(KnowledgeBaseBase):
     id: int
     user_id: int
+    email: Optional[str] = None  # Checked on the way in, served as stored
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
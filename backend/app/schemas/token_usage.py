@@ -2,9 +2,14 @@
 Token Usage Schemas
 Request/Response models for token tracking
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+
+def utc_now() -> datetime:
+    """Timezone-aware current UTC time"""
+    return datetime.now(timezone.utc)
 
 
 class TokenUsageBase(BaseModel):
@@ -49,8 +54,7 @@ class TokenUsageResponse(TokenUsageBase):
     extra_metadata: Optional[Dict[str, Any]] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TokenUsageStats(BaseModel):
@@ -98,4 +102,4 @@ class TokenUsageAlert(BaseModel):
     limit: int
     percentage: float
     message: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=utc_now)
\ No newline at end of file
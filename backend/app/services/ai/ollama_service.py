@@ -1,23 +1,116 @@
-from typing import Dict, List, Optional
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional
 from loguru import logger
 import httpx
+import orjson
 from app.core.config import settings
 
 
+# Shared HTTP client (one connection pool for the whole app)
+_client: Optional[httpx.AsyncClient] = None
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Get or create the shared Ollama HTTP client"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.OLLAMA_BASE_URL,
+            # Bodies are encoded with orjson and sent as raw content
+            headers={"Content-Type": "application/json"},
+            http2=True,  # Multiplexed streams when Ollama sits behind TLS
+            # Long reads for slow generations; fail fast when Ollama is unreachable
+            # or every pooled connection is busy
+            timeout=httpx.Timeout(300.0, connect=5.0, write=30.0, pool=10.0),
+            limits=httpx.Limits(
+                max_keepalive_connections=40,
+                max_connections=100,
+                keepalive_expiry=30
+            )
+        )
+    return _client
+
+
+async def close_ollama_client():
+    """Close the shared Ollama HTTP client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Static system prompts. Sent verbatim on every call so Ollama can reuse the
+# KV cache of this shared prefix instead of re-running prefill on it
+_ANSWER_QUESTION_SYSTEM_PROMPT = """You are a professional career advisor helping someone answer job application questions.
+            
+Guidelines:
+- Keep answers concise (2-3 sentences)
+- Be professional and confident
+- Use specific examples from the user's experience
+- Tailor responses to the job requirements
+- Be honest but positive"""
+
+_COVER_LETTER_SYSTEM_PROMPT = """You are an expert at writing professional cover letters.
+
+Guidelines:
+- Keep it under 300 words
+- Show enthusiasm for the role
+- Highlight relevant experience
+- Explain why you're a good fit
+- Be professional but personable
+- Include a strong opening and closing"""
+
+# Per-call prompt layouts, filled with str.format
+_PROFILE_AND_JOB_TEMPLATE = """User Profile:
+{context}
+
+Job Details:
+- Company: {company}
+- Position: {title}
+- Description: {description}"""
+
+_QUESTION_TEMPLATE = """Question: {question}
+
+Provide a professional answer based on the user's profile:"""
+
+_QUESTIONS_TEMPLATE = """Questions:
+{questions}
+
+Answer every question based on the user's profile. Reply with a JSON object
+{{"answers": [...]}} holding one answer string per question, in the same order:"""
+
+_COVER_LETTER_TEMPLATE = """Write a cover letter for this job:
+
+Company: {company}
+Position: {title}
+Location: {location}
+Description: {description}
+
+Applicant Profile:
+{context}
+
+{structure}
+
+Write a compelling cover letter:"""
+
+
 class OllamaService:
     """Service for interacting with Ollama LLM"""
     
     def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
-        self.client = httpx.AsyncClient(timeout=120.0)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared pooled client - never closed per request"""
+        return get_ollama_client()
     
     async def generate(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
-        max_tokens: int = 500
+        max_tokens: int = 500,
+        usage: Optional[Dict] = None
     ) -> str:
         """
         Generate text using Ollama
@@ -27,6 +120,7 @@ class OllamaService:
             system_prompt: System instructions
             temperature: Randomness (0-1, lower = more focused)
             max_tokens: Maximum response length
+            usage: Filled with Ollama's token counts once the reply is complete
             
         Returns:
             Generated text
@@ -34,11 +128,13 @@ class OllamaService:
         try:
             logger.info(f"Generating response with {self.model}...")
             
-            # Prepare request
+            # Prepare request (streamed even here: chunks are joined as they arrive,
+            # and cancelling the caller aborts the generation on Ollama's side)
             payload = {
                 "model": self.model,
                 "prompt": prompt,
-                "stream": False,
+                "stream": True,
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE,
                 "options": {
                     "temperature": temperature,
                     "num_predict": max_tokens
@@ -49,14 +145,11 @@ class OllamaService:
                 payload["system"] = system_prompt
             
             # Call Ollama API
-            response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json=payload
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            generated_text = result.get("response", "").strip()
+            chunks = [
+                chunk.get("response", "")
+                async for chunk in self._stream_chunks("/api/generate", payload, usage)
+            ]
+            generated_text = "".join(chunks).strip()
             
             logger.info(f"Generated {len(generated_text)} characters")
             return generated_text
@@ -69,7 +162,9 @@ class OllamaService:
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        max_tokens: int = 500
+        max_tokens: int = 500,
+        usage: Optional[Dict] = None,
+        response_format: Optional[str] = None
     ) -> str:
         """
         Chat with Ollama using conversation history
@@ -78,6 +173,8 @@ class OllamaService:
             messages: List of {"role": "user/assistant/system", "content": "..."}
             temperature: Randomness
             max_tokens: Max response length
+            usage: Filled with Ollama's token counts once the reply is complete
+            response_format: Ollama output format ("json" forces a JSON reply)
             
         Returns:
             Assistant's response
@@ -85,38 +182,175 @@ class OllamaService:
         try:
             logger.info(f"Chat with {len(messages)} messages...")
             
+            # Streamed like generate()
             payload = {
                 "model": self.model,
                 "messages": messages,
-                "stream": False,
+                "stream": True,
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE,
                 "options": {
                     "temperature": temperature,
                     "num_predict": max_tokens
                 }
             }
+            if response_format:
+                payload["format"] = response_format
+            
+            chunks = [
+                chunk.get("message", {}).get("content", "")
+                async for chunk in self._stream_chunks("/api/chat", payload, usage)
+            ]
+            content = "".join(chunks).strip()
+            
+            logger.info(f"Response: {content[:100]}...")
+            return content
             
+        except Exception as e:
+            logger.error(f"Ollama chat error: {e}")
+            raise
+    
+    async def warm_up(self):
+        """
+        Load the model and prefill the question-answering system prompt, so the
+        first real request reuses the cached prefix (called once on startup)
+        """
+        try:
             response = await self.client.post(
-                f"{self.base_url}/api/chat",
-                json=payload
+                "/api/chat",
+                content=orjson.dumps({
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": _ANSWER_QUESTION_SYSTEM_PROMPT},
+                        {"role": "user", "content": " "}
+                    ],
+                    "stream": False,
+                    "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                    "options": {"num_predict": 1}
+                })
             )
             response.raise_for_status()
+            logger.info(f"Warmed up {self.model}")
+        except Exception as e:
+            logger.warning(f"Ollama warm-up failed: {e}")
+    
+    async def _stream_chunks(self, path: str, payload: Dict, usage: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """
+        POST a streaming request and yield each newline-delimited JSON chunk
+        
+        The final chunk carries the token counts; they are copied into usage
+        (prompt_eval_count: prompt tokens Ollama had to evaluate, i.e. not served
+        from its prompt cache; eval_count: generated tokens)
+        """
+        async with self.client.stream("POST", path, content=orjson.dumps(payload)) as response:
+            response.raise_for_status()
             
-            result = response.json()
-            message = result.get("message", {})
-            content = message.get("content", "").strip()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                
+                chunk = orjson.loads(line)
+                yield chunk
+                
+                if chunk.get("done"):
+                    if usage is not None:
+                        usage["prompt_eval_count"] = chunk.get("prompt_eval_count")
+                        usage["eval_count"] = chunk.get("eval_count")
+                    break
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate text using Ollama, yielding pieces as they are produced
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instructions
+            temperature: Randomness (0-1, lower = more focused)
+            max_tokens: Maximum response length
+            usage: Filled with Ollama's token counts once the reply is complete
             
-            logger.info(f"Response: {content[:100]}...")
-            return content
+        Yields:
+            Generated text chunks
+        """
+        logger.info(f"Streaming response with {self.model}...")
+        
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        
+        if system_prompt:
+            payload["system"] = system_prompt
+        
+        try:
+            async for chunk in self._stream_chunks("/api/generate", payload, usage):
+                text = chunk.get("response", "")
+                if text:
+                    yield text
+        except Exception as e:
+            logger.error(f"Ollama streaming error: {e}")
+            raise
+    
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Chat with Ollama, yielding the assistant's reply as it is produced
+        
+        Args:
+            messages: List of {"role": "user/assistant/system", "content": "..."}
+            temperature: Randomness
+            max_tokens: Max response length
+            usage: Filled with Ollama's token counts once the reply is complete
             
+        Yields:
+            Response text chunks
+        """
+        logger.info(f"Streaming chat with {len(messages)} messages...")
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        
+        try:
+            async for chunk in self._stream_chunks("/api/chat", payload, usage):
+                text = chunk.get("message", {}).get("content", "")
+                if text:
+                    yield text
         except Exception as e:
-            logger.error(f"Ollama chat error: {e}")
+            logger.error(f"Ollama chat streaming error: {e}")
             raise
     
     async def answer_job_question(
         self,
         question: str,
         user_profile: Dict,
-        job_details: Dict
+        job_details: Dict,
+        context: Optional[str] = None,
+        usage: Optional[Dict] = None
     ) -> str:
         """
         Answer a job application question using user profile
@@ -125,41 +359,18 @@ class OllamaService:
             question: Application question
             user_profile: User's resume/experience data
             job_details: Job title, company, description
+            context: Profile context already built by the caller
+            usage: Filled with Ollama's token counts once the reply is complete
             
         Returns:
             AI-generated answer
         """
         try:
-            # Build context from user profile
-            context = self._build_user_context(user_profile)
-            
-            # Build prompt
-            system_prompt = """You are a professional career advisor helping someone answer job application questions.
-            
-Guidelines:
-- Keep answers concise (2-3 sentences)
-- Be professional and confident
-- Use specific examples from the user's experience
-- Tailor responses to the job requirements
-- Be honest but positive"""
-            
-            user_prompt = f"""Job Details:
-- Company: {job_details.get('company', 'Unknown')}
-- Position: {job_details.get('title', 'Unknown')}
-- Description: {job_details.get('description', 'N/A')[:500]}
-
-User Profile:
-{context}
-
-Question: {question}
-
-Provide a professional answer based on the user's profile:"""
-            
-            answer = await self.generate(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
+            answer = await self.chat(
+                messages=self._answer_question_messages(question, user_profile, job_details, context),
                 temperature=0.7,
-                max_tokens=300
+                max_tokens=300,
+                usage=usage
             )
             
             return answer
@@ -168,11 +379,96 @@ Provide a professional answer based on the user's profile:"""
             logger.error(f"Error answering question: {e}")
             raise
     
+    async def answer_job_questions(
+        self,
+        questions: List[str],
+        user_profile: Dict,
+        job_details: Dict,
+        context: Optional[str] = None
+    ) -> List[str]:
+        """
+        Answer several application questions with one chat call
+        
+        Args:
+            questions: Application questions
+            user_profile: User's resume/experience data
+            job_details: Job title, company, description
+            context: Profile context already built by the caller
+            
+        Returns:
+            One AI-generated answer per question, in order
+        """
+        if context is None:
+            context = self._build_user_context(user_profile)
+        
+        if len(questions) == 1:
+            return [await self.answer_job_question(questions[0], user_profile, job_details, context)]
+        
+        numbered = "\n".join(f"{i}. {question}" for i, question in enumerate(questions, 1))
+        messages = self._answer_question_messages(numbered, user_profile, job_details, context)
+        messages[-1]["content"] = _QUESTIONS_TEMPLATE.format(questions=numbered)
+        
+        try:
+            reply = await self.chat(
+                messages=messages,
+                temperature=0.7,
+                max_tokens=300 * len(questions),
+                response_format="json"
+            )
+            parsed = orjson.loads(reply)
+            answers = parsed.get("answers") if isinstance(parsed, dict) else parsed
+            if (
+                isinstance(answers, list)
+                and len(answers) == len(questions)
+                and all(isinstance(answer, str) for answer in answers)
+            ):
+                return [answer.strip() for answer in answers]
+            
+            logger.warning(f"Batched answers did not match the {len(questions)} questions, answering one by one")
+            
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"Could not parse batched answers ({e}), answering one by one")
+        
+        return [
+            await self.answer_job_question(question, user_profile, job_details, context)
+            for question in questions
+        ]
+    
+    def _answer_question_messages(
+        self,
+        question: str,
+        user_profile: Dict,
+        job_details: Dict,
+        context: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Chat messages for answer_job_question, ordered from most to least stable
+        (system prompt, user profile, job, question) so successive questions
+        share the longest possible cached prefix
+        """
+        if context is None:
+            context = self._build_user_context(user_profile)
+        
+        profile_and_job = _PROFILE_AND_JOB_TEMPLATE.format(
+            context=context,
+            company=job_details.get('company') or 'Unknown',
+            title=job_details.get('title') or 'Unknown',
+            description=(job_details.get('description') or 'N/A')[:500]
+        )
+        
+        return [
+            {"role": "system", "content": _ANSWER_QUESTION_SYSTEM_PROMPT},
+            {"role": "user", "content": profile_and_job},
+            {"role": "user", "content": _QUESTION_TEMPLATE.format(question=question)}
+        ]
+    
     async def generate_cover_letter(
         self,
         user_profile: Dict,
         job_details: Dict,
-        template: Optional[str] = None
+        template: Optional[str] = None,
+        context: Optional[str] = None,
+        usage: Optional[Dict] = None
     ) -> str:
         """
         Generate a tailored cover letter
@@ -181,42 +477,31 @@ Provide a professional answer based on the user's profile:"""
             user_profile: User's experience data
             job_details: Job information
             template: Optional template to follow
+            context: Profile context already built by the caller
+            usage: Filled with Ollama's token counts once the reply is complete
             
         Returns:
             Generated cover letter
         """
         try:
-            context = self._build_user_context(user_profile)
-            
-            system_prompt = """You are an expert at writing professional cover letters.
-
-Guidelines:
-- Keep it under 300 words
-- Show enthusiasm for the role
-- Highlight relevant experience
-- Explain why you're a good fit
-- Be professional but personable
-- Include a strong opening and closing"""
+            if context is None:
+                context = self._build_user_context(user_profile)
             
-            user_prompt = f"""Write a cover letter for this job:
-
-Company: {job_details.get('company')}
-Position: {job_details.get('title')}
-Location: {job_details.get('location')}
-Description: {job_details.get('description', '')[:800]}
-
-Applicant Profile:
-{context}
-
-{"Use this structure: " + template if template else ""}
-
-Write a compelling cover letter:"""
+            user_prompt = _COVER_LETTER_TEMPLATE.format(
+                company=job_details.get('company'),
+                title=job_details.get('title'),
+                location=job_details.get('location'),
+                description=(job_details.get('description') or '')[:800],
+                context=context,
+                structure=f"Use this structure: {template}" if template else ""
+            )
             
             cover_letter = await self.generate(
                 prompt=user_prompt,
-                system_prompt=system_prompt,
+                system_prompt=_COVER_LETTER_SYSTEM_PROMPT,
                 temperature=0.8,
-                max_tokens=800
+                max_tokens=800,
+                usage=usage
             )
             
             return cover_letter
@@ -226,31 +511,42 @@ Write a compelling cover letter:"""
             raise
     
     def _build_user_context(self, user_profile: Dict) -> str:
-        """Build context string from user profile"""
-        context_parts = []
+        """
+        Build context string from user profile
+        
+        Callers answering several prompts for one profile build it once and
+        pass it on as context=
+        """
+        full_name = user_profile.get('full_name')
+        summary = user_profile.get('summary')
+        work_experience = user_profile.get('work_experience')
+        skills = user_profile.get('skills')
+        education = user_profile.get('education')
         
-        if user_profile.get('full_name'):
-            context_parts.append(f"Name: {user_profile['full_name']}")
+        context_parts: List[str] = []
         
-        if user_profile.get('summary'):
-            context_parts.append(f"Summary: {user_profile['summary']}")
+        if full_name:
+            context_parts.append(f"Name: {full_name}")
         
-        if user_profile.get('work_experience'):
+        if summary:
+            context_parts.append(f"Summary: {summary}")
+        
+        if work_experience:
             context_parts.append("Work Experience:")
-            for exp in user_profile['work_experience'][:3]:  # Top 3
-                context_parts.append(f"- {exp.get('title')} at {exp.get('company')}: {exp.get('description', '')[:200]}")
+            context_parts.extend(
+                f"- {exp.get('title')} at {exp.get('company')}: {(exp.get('description') or '')[:200]}"
+                for exp in islice(work_experience, 3)  # Top 3
+            )
         
-        if user_profile.get('skills'):
-            skills_str = ", ".join(user_profile['skills'][:10])
-            context_parts.append(f"Skills: {skills_str}")
+        if skills:
+            context_parts.append("Skills: " + ", ".join(islice(skills, 10)))
         
-        if user_profile.get('education'):
+        if education:
             context_parts.append("Education:")
-            for edu in user_profile['education']:
-                context_parts.append(f"- {edu.get('degree')} from {edu.get('school')}")
+            context_parts.extend(f"- {edu.get('degree')} from {edu.get('school')}" for edu in education)
         
         return "\n".join(context_parts)
-    
-    async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
\ No newline at end of file
+
+
+# Global instance
+ollama_service = OllamaService()
\ No newline at end of file
@@ -3,9 +3,8 @@ Enhanced Ollama Service with Token Tracking
 Wraps existing OllamaService and adds automatic token tracking
 """
 import time
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.ai.ollama_service import OllamaService
 from app.services.tracker.token_tracker import TokenTracker
@@ -20,7 +19,6 @@ class OllamaServiceWithTracking(OllamaService):
     async def generate_with_tracking(
         self,
         prompt: str,
-        db: AsyncSession,
         user_id: int,
         operation_type: str,
         system_prompt: Optional[str] = None,
@@ -38,15 +36,23 @@ class OllamaServiceWithTracking(OllamaService):
         success = True
         error_message = None
         completion = ""
+        first_token_ms = None
+        usage: Dict = {}
         
         try:
-            # Call parent method
-            completion = await self.generate(
+            # Consume the stream so time to first token can be recorded
+            chunks: List[str] = []
+            async for chunk in self.generate_stream(
                 prompt=prompt,
                 system_prompt=system_prompt,
                 temperature=temperature,
-                max_tokens=max_tokens
-            )
+                max_tokens=max_tokens,
+                usage=usage
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                chunks.append(chunk)
+            completion = "".join(chunks).strip()
             
             logger.info(f"Generation successful for {operation_type}")
             
@@ -57,14 +63,13 @@ class OllamaServiceWithTracking(OllamaService):
             raise
         
         finally:
-            # Track token usage
+            # Track token usage (written by the background writer, off the request path)
             response_time_ms = (time.time() - start_time) * 1000
             
             try:
                 full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
                 
-                await TokenTracker.create_usage_record(
-                    db=db,
+                TokenTracker.queue_usage_record(
                     user_id=user_id,
                     operation_type=operation_type,
                     prompt=full_prompt,
@@ -78,7 +83,8 @@ class OllamaServiceWithTracking(OllamaService):
                     response_time_ms=response_time_ms,
                     success=success,
                     error_message=error_message,
-                    extra_metadata=extra_metadata
+                    extra_metadata=self._with_first_token(extra_metadata, first_token_ms),
+                    completion_tokens=usage.get("eval_count")
                 )
             except Exception as track_error:
                 logger.error(f"Error tracking tokens: {track_error}")
@@ -88,7 +94,6 @@ class OllamaServiceWithTracking(OllamaService):
     async def chat_with_tracking(
         self,
         messages: List[Dict[str, str]],
-        db: AsyncSession,
         user_id: int,
         operation_type: str = "chat",
         temperature: float = 0.7,
@@ -105,14 +110,22 @@ class OllamaServiceWithTracking(OllamaService):
         success = True
         error_message = None
         completion = ""
+        first_token_ms = None
+        usage: Dict = {}
         
         try:
-            # Call parent method
-            completion = await self.chat(
+            # Consume the stream so time to first token can be recorded
+            chunks: List[str] = []
+            async for chunk in self.chat_stream(
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
-            )
+                max_tokens=max_tokens,
+                usage=usage
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                chunks.append(chunk)
+            completion = "".join(chunks).strip()
             
             logger.info(f"Chat successful for {operation_type}")
             
@@ -123,15 +136,14 @@ class OllamaServiceWithTracking(OllamaService):
             raise
         
         finally:
-            # Track token usage
+            # Track token usage (written by the background writer, off the request path)
             response_time_ms = (time.time() - start_time) * 1000
             
             try:
                 # Build prompt from messages
                 full_prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
                 
-                await TokenTracker.create_usage_record(
-                    db=db,
+                TokenTracker.queue_usage_record(
                     user_id=user_id,
                     operation_type=operation_type,
                     prompt=full_prompt,
@@ -145,19 +157,154 @@ class OllamaServiceWithTracking(OllamaService):
                     response_time_ms=response_time_ms,
                     success=success,
                     error_message=error_message,
-                    extra_metadata=extra_metadata
+                    extra_metadata=self._with_first_token(extra_metadata, first_token_ms),
+                    completion_tokens=usage.get("eval_count")
                 )
             except Exception as track_error:
                 logger.error(f"Error tracking tokens: {track_error}")
         
         return completion
     
+    @staticmethod
+    def _with_first_token(extra_metadata: Optional[Dict], first_token_ms: Optional[float]) -> Optional[Dict]:
+        """extra_metadata plus the time to the first streamed token, when one arrived"""
+        if first_token_ms is None:
+            return extra_metadata
+        return {**(extra_metadata or {}), "first_token_ms": round(first_token_ms, 1)}
+    
+    async def generate_stream_with_tracking(
+        self,
+        prompt: str,
+        user_id: int,
+        operation_type: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        job_id: Optional[int] = None,
+        application_id: Optional[int] = None,
+        endpoint: Optional[str] = None,
+        rag_used: bool = False,
+        rag_chunks: Optional[int] = None,
+        extra_metadata: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream generated text; usage is tracked once the stream completes"""
+        start_time = time.time()
+        success = True
+        error_message = None
+        chunks: List[str] = []
+        first_token_ms = None
+        usage: Dict = {}
+        
+        try:
+            async for chunk in self.generate_stream(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                usage=usage
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                chunks.append(chunk)
+                yield chunk
+            
+            logger.info(f"Streaming generation successful for {operation_type}")
+            
+        except Exception as e:
+            success = False
+            error_message = str(e)
+            logger.error(f"Streaming generation error: {e}")
+            raise
+        
+        finally:
+            full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+            
+            TokenTracker.queue_usage_record(
+                user_id=user_id,
+                operation_type=operation_type,
+                prompt=full_prompt,
+                completion="".join(chunks).strip(),
+                model_name=self.model,
+                job_id=job_id,
+                application_id=application_id,
+                endpoint=endpoint,
+                rag_used=rag_used,
+                rag_chunks=rag_chunks,
+                response_time_ms=(time.time() - start_time) * 1000,
+                success=success,
+                error_message=error_message,
+                extra_metadata=self._with_first_token(extra_metadata, first_token_ms),
+                completion_tokens=usage.get("eval_count")
+            )
+    
+    async def chat_stream_with_tracking(
+        self,
+        messages: List[Dict[str, str]],
+        user_id: int,
+        operation_type: str = "chat",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        job_id: Optional[int] = None,
+        application_id: Optional[int] = None,
+        endpoint: Optional[str] = None,
+        rag_used: bool = False,
+        rag_chunks: Optional[int] = None,
+        extra_metadata: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream chat reply; usage is tracked once the stream completes"""
+        start_time = time.time()
+        success = True
+        error_message = None
+        chunks: List[str] = []
+        first_token_ms = None
+        usage: Dict = {}
+        
+        try:
+            async for chunk in self.chat_stream(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                usage=usage
+            ):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                chunks.append(chunk)
+                yield chunk
+            
+            logger.info(f"Streaming chat successful for {operation_type}")
+            
+        except Exception as e:
+            success = False
+            error_message = str(e)
+            logger.error(f"Streaming chat error: {e}")
+            raise
+        
+        finally:
+            full_prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+            
+            TokenTracker.queue_usage_record(
+                user_id=user_id,
+                operation_type=operation_type,
+                prompt=full_prompt,
+                completion="".join(chunks).strip(),
+                model_name=self.model,
+                job_id=job_id,
+                application_id=application_id,
+                endpoint=endpoint,
+                rag_used=rag_used,
+                rag_chunks=rag_chunks,
+                response_time_ms=(time.time() - start_time) * 1000,
+                success=success,
+                error_message=error_message,
+                extra_metadata=self._with_first_token(extra_metadata, first_token_ms),
+                completion_tokens=usage.get("eval_count")
+            )
+    
     async def answer_job_question_with_tracking(
         self,
         question: str,
         user_profile: Dict,
         job_details: Dict,
-        db: AsyncSession,
         user_id: int,
         job_id: Optional[int] = None,
         application_id: Optional[int] = None,
@@ -168,13 +315,19 @@ class OllamaServiceWithTracking(OllamaService):
         success = True
         error_message = None
         answer = ""
+        usage: Dict = {}
+        
+        # Built once for both the prompt and the tracked record
+        context = self._build_user_context(user_profile)
         
         try:
             # Call parent method
             answer = await self.answer_job_question(
                 question=question,
                 user_profile=user_profile,
-                job_details=job_details
+                job_details=job_details,
+                context=context,
+                usage=usage
             )
             
         except Exception as e:
@@ -187,12 +340,9 @@ class OllamaServiceWithTracking(OllamaService):
             response_time_ms = (time.time() - start_time) * 1000
             
             try:
-                # Build context for tracking
-                context = self._build_user_context(user_profile)
                 prompt = f"Question: {question}\n\nContext: {context[:500]}"
                 
-                await TokenTracker.create_usage_record(
-                    db=db,
+                TokenTracker.queue_usage_record(
                     user_id=user_id,
                     operation_type="question_answer",
                     prompt=prompt,
@@ -206,18 +356,44 @@ class OllamaServiceWithTracking(OllamaService):
                     response_time_ms=response_time_ms,
                     success=success,
                     error_message=error_message,
-                    extra_metadata={"question": question}
+                    extra_metadata={"question": question},
+                    completion_tokens=usage.get("eval_count")
                 )
             except Exception as track_error:
                 logger.error(f"Error tracking tokens: {track_error}")
         
         return answer
     
+    def answer_job_question_stream_with_tracking(
+        self,
+        question: str,
+        user_profile: Dict,
+        job_details: Dict,
+        user_id: int,
+        job_id: Optional[int] = None,
+        application_id: Optional[int] = None,
+        endpoint: str = "/ai/answer-question",
+        rag_chunks: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """Stream the answer to a job question; usage is tracked once the stream completes"""
+        return self.chat_stream_with_tracking(
+            messages=self._answer_question_messages(question, user_profile, job_details),
+            user_id=user_id,
+            operation_type="question_answer",
+            temperature=0.7,
+            max_tokens=300,
+            job_id=job_id,
+            application_id=application_id,
+            endpoint=endpoint,
+            rag_used=(rag_chunks is not None and rag_chunks > 0),
+            rag_chunks=rag_chunks,
+            extra_metadata={"question": question}
+        )
+    
     async def generate_cover_letter_with_tracking(
         self,
         user_profile: Dict,
         job_details: Dict,
-        db: AsyncSession,
         user_id: int,
         job_id: Optional[int] = None,
         template: Optional[str] = None,
@@ -229,13 +405,19 @@ class OllamaServiceWithTracking(OllamaService):
         success = True
         error_message = None
         cover_letter = ""
+        usage: Dict = {}
+        
+        # Built once for both the prompt and the tracked record
+        context = self._build_user_context(user_profile)
         
         try:
             # Call parent method
             cover_letter = await self.generate_cover_letter(
                 user_profile=user_profile,
                 job_details=job_details,
-                template=template
+                template=template,
+                context=context,
+                usage=usage
             )
             
         except Exception as e:
@@ -248,11 +430,9 @@ class OllamaServiceWithTracking(OllamaService):
             response_time_ms = (time.time() - start_time) * 1000
             
             try:
-                context = self._build_user_context(user_profile)
                 prompt = f"Job: {job_details.get('title')} at {job_details.get('company')}\n\nProfile: {context[:500]}"
                 
-                await TokenTracker.create_usage_record(
-                    db=db,
+                TokenTracker.queue_usage_record(
                     user_id=user_id,
                     operation_type="cover_letter_generation",
                     prompt=prompt,
@@ -268,7 +448,8 @@ class OllamaServiceWithTracking(OllamaService):
                     extra_metadata={
                         "job_title": job_details.get('title'),
                         "company": job_details.get('company')
-                    }
+                    },
+                    completion_tokens=usage.get("eval_count")
                 )
             except Exception as track_error:
                 logger.error(f"Error tracking tokens: {track_error}")
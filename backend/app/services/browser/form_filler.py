@@ -1,17 +1,85 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from loguru import logger
-import time
 import re
-from app.services.browser.playwright_service import PlaywrightService
-from app.services.ai.ollama_service import OllamaService
+from app.services.browser.playwright_service import BrowserPool, PlaywrightService
+from app.services.ai.ollama_service import ollama_service
+
+
+# The job page is usable once its title or apply button has rendered
+JOB_PAGE_READY = "button.jobs-apply-button, .job-details-jobs-unified-top-card__job-title, h1"
+
+# The Easy Apply modal's form
+EASY_APPLY_FORM = ".jobs-easy-apply-modal, form.jobs-easy-apply-form, [data-test-form-element]"
+
+# Buttons, each matched in a single query (comma-joined alternatives)
+EASY_APPLY_BUTTON = "button.jobs-apply-button, button:has-text('Easy Apply')"
+NEXT_BUTTON = ", ".join([
+    "button:has-text('Next')",
+    "button:has-text('Continue')",
+    "button[aria-label='Continue to next step']",
+    ".artdeco-button--primary:has-text('Next')",
+])
+SUBMIT_BUTTON = ", ".join([
+    "button:has-text('Submit application')",
+    "button:has-text('Submit')",
+    ".artdeco-button--primary:has-text('Submit')",
+])
+
+# Every fillable field of the current step with its label, read in one round trip
+DETECT_FORM_FIELDS_JS = """() => {
+    const fields = [];
+    document.querySelectorAll(
+        'input[type="text"], input[type="email"], input[type="tel"], textarea, select'
+    ).forEach((el, i) => {
+        const tag = el.tagName.toLowerCase();
+        const label = el.labels?.[0]?.textContent
+            || el.previousElementSibling?.textContent
+            || el.placeholder
+            || el.getAttribute('aria-label')
+            || '';
+        el.setAttribute('data-nocker-idx', i);
+        fields.push({
+            type: tag === 'select' || tag === 'textarea' ? tag : 'text',
+            label: label.trim(),
+            selector: `[data-nocker-idx="${i}"]`
+        });
+    });
+    return fields;
+}"""
+
+
+def _first_name(profile: Dict) -> Optional[str]:
+    name_parts = (profile.get('full_name') or '').split()
+    return name_parts[0] if name_parts else None
+
+
+def _last_name(profile: Dict) -> Optional[str]:
+    name_parts = (profile.get('full_name') or '').split()
+    return ' '.join(name_parts[1:]) if len(name_parts) > 1 else None
+
+
+# (label keywords, profile value) checked in order; the first rule whose keyword is in the label wins
+FIELD_RULES = (
+    (('first name',), _first_name),
+    (('last name',), _last_name),
+    (('full name', 'your name'), lambda profile: profile.get('full_name')),
+    (('email',), lambda profile: profile.get('email')),
+    (('phone',), lambda profile: profile.get('phone')),
+    (('location', 'city'), lambda profile: profile.get('location')),
+    (('linkedin',), lambda profile: profile.get('linkedin_url')),
+    (('website', 'portfolio'), lambda profile: profile.get('portfolio_url')),
+)
+
+# Labels of custom questions that need an AI-written answer (as do all textareas)
+AI_QUESTION_KEYWORDS = ('why', 'describe')
 
 
 class LinkedInFormFiller(PlaywrightService):
     """Fill out LinkedIn Easy Apply forms automatically"""
     
-    def __init__(self):
-        super().__init__()
-        self.ollama = OllamaService()
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        super().__init__(pool)
+        self.ollama = ollama_service  # Shared client pool, nothing to close per apply
     
     async def apply_to_job(
         self,
@@ -31,12 +99,12 @@ class LinkedInFormFiller(PlaywrightService):
             Application result with status
         """
         await self.start()
-        await self._load_cookies()
+        await self.load_cookies()
         
         try:
             # Navigate to job
             await self.goto(job_url)
-            time.sleep(3)
+            await self.smart_wait(JOB_PAGE_READY)
             
             # Check for Easy Apply button
             has_easy_apply = await self._check_easy_apply()
@@ -50,12 +118,13 @@ class LinkedInFormFiller(PlaywrightService):
             
             # Click Easy Apply
             await self._click_easy_apply()
-            time.sleep(2)
+            await self.smart_wait(EASY_APPLY_FORM)
             
             # Fill out multi-step form
             application_data = await self._fill_application_form(
                 user_profile, 
-                job_details
+                job_details,
+                self._lowercase_qa_pairs(user_profile)
             )
             
             # Submit (or save draft if testing)
@@ -76,67 +145,45 @@ class LinkedInFormFiller(PlaywrightService):
                 "error": str(e)
             }
         finally:
-            await self.ollama.close()
             await self.close()
     
-    def _check_easy_apply_sync(self) -> bool:
+    async def _check_easy_apply(self) -> bool:
         """Check if Easy Apply button exists"""
         try:
             if not self.page:
                 return False
             
-            # Multiple selectors for Easy Apply button
-            selectors = [
-                "button.jobs-apply-button",
-                "button:has-text('Easy Apply')",
-                ".jobs-apply-button--top-card button",
-            ]
-            
-            for selector in selectors:
-                button = self.page.query_selector(selector)
-                if button:
-                    return True
-            
-            return False
+            button = await self.page.query_selector(
+                f"{EASY_APPLY_BUTTON}, .jobs-apply-button--top-card button"
+            )
+            return button is not None
             
         except Exception:
             return False
     
-    async def _check_easy_apply(self) -> bool:
-        """Async wrapper for checking Easy Apply"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self._check_easy_apply_sync)
-    
-    def _click_easy_apply_sync(self):
+    async def _click_easy_apply(self):
         """Click Easy Apply button"""
         if not self.page:
             raise Exception("Page not initialized")
         
-        selectors = [
-            "button.jobs-apply-button",
-            "button:has-text('Easy Apply')",
-        ]
+        button = await self.page.query_selector(EASY_APPLY_BUTTON)
+        if not button:
+            raise Exception("Easy Apply button not found")
         
-        for selector in selectors:
-            button = self.page.query_selector(selector)
-            if button:
-                button.click()
-                logger.info("Clicked Easy Apply button")
-                return
-        
-        raise Exception("Easy Apply button not found")
+        await button.click()
+        logger.info("Clicked Easy Apply button")
     
-    async def _click_easy_apply(self):
-        """Async wrapper"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._click_easy_apply_sync)
+    @staticmethod
+    def _lowercase_qa_pairs(user_profile: Dict) -> List[Tuple[str, str]]:
+        """The profile's Q&A pairs with questions lowercased once for label matching"""
+        qa_pairs = user_profile.get('qa_pairs') or {}
+        return [(question.lower(), answer) for question, answer in qa_pairs.items()]
     
     async def _fill_application_form(
         self,
         user_profile: Dict,
-        job_details: Dict
+        job_details: Dict,
+        qa_pairs: List[Tuple[str, str]]
     ) -> Dict:
         """
         Fill out multi-step application form
@@ -148,12 +195,13 @@ class LinkedInFormFiller(PlaywrightService):
         while step <= max_steps:
             logger.info(f"Processing form step {step}")
             
-            time.sleep(2)  # Wait for form to load
+            await self.smart_wait(EASY_APPLY_FORM)  # Wait for form to load
             
             # Detect and fill form fields
             step_responses = await self._fill_current_form_step(
                 user_profile,
-                job_details
+                job_details,
+                qa_pairs
             )
             
             form_responses[f"step_{step}"] = step_responses
@@ -165,6 +213,8 @@ class LinkedInFormFiller(PlaywrightService):
                 logger.info("Reached final step")
                 break
             
+            # Let the next step's fields load before detecting them
+            await self.wait_for_network_idle()
             step += 1
         
         return form_responses
@@ -172,7 +222,8 @@ class LinkedInFormFiller(PlaywrightService):
     async def _fill_current_form_step(
         self,
         user_profile: Dict,
-        job_details: Dict
+        job_details: Dict,
+        qa_pairs: List[Tuple[str, str]]
     ) -> Dict:
         """Fill fields on current form step"""
         responses = {}
@@ -180,233 +231,132 @@ class LinkedInFormFiller(PlaywrightService):
         # Detect all input fields
         fields = await self._detect_form_fields()
         
+        # Fill from the profile where possible; custom questions are collected
+        # and answered by AI together
+        values = []
+        custom_questions = []
         for field in fields:
             field_type = field.get('type')
             field_label = field.get('label', '')
-            field_selector = field.get('selector')
             
             logger.info(f"  Field: {field_label} ({field_type})")
             
             # Determine what to fill based on field label
-            value = await self._determine_field_value(
+            value, needs_ai = self._determine_field_value(
                 field_label,
                 field_type,
                 user_profile,
+                qa_pairs
+            )
+            if needs_ai:
+                custom_questions.append(len(values))
+            values.append(value)
+        
+        if custom_questions:
+            answers = await self._answer_custom_questions(
+                [fields[i].get('label', '') for i in custom_questions],
+                user_profile,
                 job_details
             )
-            
+            for i, answer in zip(custom_questions, answers):
+                values[i] = answer
+        
+        for field, value in zip(fields, values):
             if value:
-                await self._fill_field(field_selector, value, field_type)
-                responses[field_label] = value
+                await self._fill_field(field.get('selector'), value, field.get('type'))
+                responses[field.get('label', '')] = value
         
         return responses
     
-    def _detect_form_fields_sync(self) -> List[Dict]:
-        """Detect all form fields on current page"""
+    async def _detect_form_fields(self) -> List[Dict]:
+        """
+        Detect all form fields on current page in one DOM pass. Each field is
+        tagged with data-nocker-idx so its selector targets exactly that element.
+        """
         if not self.page:
             return []
         
-        fields = []
-        
-        # Text inputs
-        text_inputs = self.page.query_selector_all('input[type="text"], input[type="email"], input[type="tel"]')
-        for input_el in text_inputs:
-            label_el = self.page.evaluate('(el) => el.previousElementSibling?.textContent || el.placeholder || ""', input_el)
-            fields.append({
-                'type': 'text',
-                'label': label_el,
-                'selector': f'input[type="{input_el.get_attribute("type")}"]',
-                'element': input_el
-            })
-        
-        # Textareas
-        textareas = self.page.query_selector_all('textarea')
-        for textarea in textareas:
-            label_el = self.page.evaluate('(el) => el.previousElementSibling?.textContent || el.placeholder || ""', textarea)
-            fields.append({
-                'type': 'textarea',
-                'label': label_el,
-                'selector': 'textarea',
-                'element': textarea
-            })
-        
-        # Select dropdowns
-        selects = self.page.query_selector_all('select')
-        for select in selects:
-            label_el = self.page.evaluate('(el) => el.previousElementSibling?.textContent || ""', select)
-            fields.append({
-                'type': 'select',
-                'label': label_el,
-                'selector': 'select',
-                'element': select
-            })
-        
-        return fields
+        return await self.page.evaluate(DETECT_FORM_FIELDS_JS)
     
-    async def _detect_form_fields(self) -> List[Dict]:
-        """Async wrapper"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self._detect_form_fields_sync)
-    
-    async def _determine_field_value(
+    def _determine_field_value(
         self,
         field_label: str,
         field_type: str,
         user_profile: Dict,
-        job_details: Dict
-    ) -> Optional[str]:
-        """Determine what value to put in a field"""
-        label_lower = field_label.lower()
-        
-        # Name fields
-        if 'first name' in label_lower:
-            name_parts = user_profile.get('full_name', '').split()
-            return name_parts[0] if name_parts else None
-        
-        if 'last name' in label_lower:
-            name_parts = user_profile.get('full_name', '').split()
-            return ' '.join(name_parts[1:]) if len(name_parts) > 1 else None
-        
-        if 'full name' in label_lower or 'your name' in label_lower:
-            return user_profile.get('full_name')
-        
-        # Contact info
-        if 'email' in label_lower:
-            return user_profile.get('email')
-        
-        if 'phone' in label_lower:
-            return user_profile.get('phone')
-        
-        if 'location' in label_lower or 'city' in label_lower:
-            return user_profile.get('location')
+        qa_pairs: List[Tuple[str, str]]
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Determine what value to put in a field
         
-        # LinkedIn URL
-        if 'linkedin' in label_lower:
-            return user_profile.get('linkedin_url')
+        Returns:
+            (value, needs_ai) - custom questions come back as (None, True)
+            and are answered by AI for the whole step at once
+        """
+        label_lower = field_label.lower()
         
-        # Portfolio/Website
-        if 'website' in label_lower or 'portfolio' in label_lower:
-            return user_profile.get('portfolio_url')
+        # Profile fields (name, contact info, links)
+        for keywords, profile_value in FIELD_RULES:
+            if any(keyword in label_lower for keyword in keywords):
+                return profile_value(user_profile), False
         
         # Check if it's a custom question (requires AI)
-        if field_type == 'textarea' or 'why' in label_lower or 'describe' in label_lower:
-            # Use AI to answer
-            answer = await self._answer_custom_question(
-                field_label,
-                user_profile,
-                job_details
-            )
-            return answer
+        if field_type == 'textarea' or any(keyword in label_lower for keyword in AI_QUESTION_KEYWORDS):
+            return None, True
         
         # Check Q&A pairs
-        qa_pairs = user_profile.get('qa_pairs', {})
-        for question, answer in qa_pairs.items():
-            if question.lower() in label_lower or label_lower in question.lower():
-                return answer
+        for question, answer in qa_pairs:
+            if question in label_lower or label_lower in question:
+                return answer, False
         
-        return None
+        return None, False
     
-    async def _answer_custom_question(
+    async def _answer_custom_questions(
         self,
-        question: str,
+        questions: List[str],
         user_profile: Dict,
         job_details: Dict
-    ) -> str:
-        """Use AI to answer a custom application question"""
-        logger.info(f"Using AI to answer: {question}")
+    ) -> List[str]:
+        """Use AI to answer a step's custom application questions in one call"""
+        logger.info(f"Using AI to answer {len(questions)} question(s): {questions}")
         
         try:
-            answer = await self.ollama.answer_job_question(
-                question=question,
+            return await self.ollama.answer_job_questions(
+                questions=questions,
                 user_profile=user_profile,
                 job_details=job_details
             )
-            return answer
         except Exception as e:
             logger.error(f"AI answer error: {e}")
-            return ""
+            return [""] * len(questions)
     
     async def _fill_field(self, selector: str, value: str, field_type: str):
         """Fill a form field"""
         await self.fill(selector, value)
         logger.info(f"  Filled: {value[:50]}...")
     
-    def _click_next_button_sync(self) -> bool:
+    async def _click_next_button(self) -> bool:
         """Click Next/Continue button if exists"""
         if not self.page:
             return False
         
-        selectors = [
-            "button:has-text('Next')",
-            "button:has-text('Continue')",
-            "button[aria-label='Continue to next step']",
-            ".artdeco-button--primary:has-text('Next')",
-        ]
-        
-        for selector in selectors:
-            button = self.page.query_selector(selector)
-            if button:
-                button.click()
-                logger.info("Clicked Next button")
-                return True
+        button = await self.page.query_selector(NEXT_BUTTON)
+        if not button:
+            return False
         
-        return False
+        await button.click()
+        logger.info("Clicked Next button")
+        return True
     
-    async def _click_next_button(self) -> bool:
-        """Async wrapper"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self._click_next_button_sync)
-    
-    def _submit_application_sync(self):
+    async def _submit_application(self):
         """Submit the application"""
         if not self.page:
             raise Exception("Page not initialized")
         
-        selectors = [
-            "button:has-text('Submit application')",
-            "button:has-text('Submit')",
-            ".artdeco-button--primary:has-text('Submit')",
-        ]
-        
-        for selector in selectors:
-            button = self.page.query_selector(selector)
-            if button:
-                # COMMENTED OUT FOR SAFETY - uncomment when ready to actually submit
-                # button.click()
-                logger.info("Would submit application here (currently disabled for safety)")
-                return
-        
-        logger.warning("Submit button not found")
-    
-    async def _submit_application(self):
-        """Async wrapper"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._submit_application_sync)
-    
-    def _load_cookies_sync(self):
-        """Load LinkedIn cookies"""
-        import os
-        import json
-        
-        cookies_file = "linkedin_cookies.json"
-        if not os.path.exists(cookies_file):
-            logger.warning("No cookies file found")
+        button = await self.page.query_selector(SUBMIT_BUTTON)
+        if not button:
+            logger.warning("Submit button not found")
             return
         
-        if not self.context:
-            return
-        
-        with open(cookies_file, 'r') as f:
-            cookies = json.load(f)
-        
-        self.context.add_cookies(cookies)
-        logger.info("Cookies loaded")
-    
-    async def _load_cookies(self):
-        """Async wrapper"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._load_cookies_sync)
\ No newline at end of file
+        # COMMENTED OUT FOR SAFETY - uncomment when ready to actually submit
+        # await button.click()
+        logger.info("Would submit application here (currently disabled for safety)")
\ No newline at end of file
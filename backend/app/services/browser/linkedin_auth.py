@@ -1,15 +1,11 @@
 from typing import Optional
 from loguru import logger
-import time
-import os
 from app.services.browser.playwright_service import PlaywrightService
 
 
 class LinkedInAuth(PlaywrightService):
     """Handle LinkedIn authentication"""
     
-    COOKIES_FILE = "linkedin_cookies.json"
-    
     async def login(self, email: str, password: str) -> bool:
         """
         Login to LinkedIn
@@ -36,8 +32,10 @@ class LinkedInAuth(PlaywrightService):
             # Click login button
             await self.click('button[type="submit"]')
             
-            # Wait for redirect
-            time.sleep(5)
+            # Wait for the redirect to the feed (or to a verification checkpoint)
+            await self.wait_for_url(
+                lambda url: any(part in url for part in ("feed", "mynetwork", "checkpoint"))
+            )
             
             # Check if login successful
             current_url = self.page.url
@@ -46,7 +44,7 @@ class LinkedInAuth(PlaywrightService):
                 logger.info("Login successful!")
                 
                 # Save cookies for future use
-                await self._save_cookies()
+                await self.save_cookies()
                 
                 return True
             else:
@@ -59,45 +57,6 @@ class LinkedInAuth(PlaywrightService):
         finally:
             await self.close()
     
-    def _save_cookies_sync(self):
-        """Save cookies to file (sync)"""
-        if not self.context:
-            return
-        
-        cookies = self.context.cookies()
-        import json
-        with open(self.COOKIES_FILE, 'w') as f:
-            json.dump(cookies, f)
-        logger.info(f"Cookies saved to {self.COOKIES_FILE}")
-    
-    async def _save_cookies(self):
-        """Save cookies to file"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._save_cookies_sync)
-    
-    def _load_cookies_sync(self):
-        """Load cookies from file (sync)"""
-        if not os.path.exists(self.COOKIES_FILE):
-            return False
-        
-        if not self.context:
-            return False
-        
-        import json
-        with open(self.COOKIES_FILE, 'r') as f:
-            cookies = json.load(f)
-        
-        self.context.add_cookies(cookies)
-        logger.info(f"Cookies loaded from {self.COOKIES_FILE}")
-        return True
-    
-    async def load_cookies(self) -> bool:
-        """Load cookies from file"""
-        import asyncio
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self._load_cookies_sync)
-    
     async def is_logged_in(self) -> bool:
         """Check if currently logged in"""
         await self.start()
@@ -113,7 +72,8 @@ class LinkedInAuth(PlaywrightService):
             # Navigate to LinkedIn
             await self.goto("https://www.linkedin.com/feed")
             
-            time.sleep(3)
+            # Logged-in pages render the global nav; logged out ends up on the authwall
+            await self.smart_wait("#global-nav, .global-nav", timeout=3000)
             
             # Check if on feed page (means logged in)
             current_url = self.page.url
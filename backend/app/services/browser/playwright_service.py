@@ -1,154 +1,306 @@
-from playwright.sync_api import sync_playwright, Browser, Page, BrowserContext
-from typing import Optional
+from playwright.async_api import async_playwright, Browser, Page, BrowserContext, TimeoutError as PlaywrightTimeoutError
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+from contextlib import asynccontextmanager
+from pathlib import Path
 from loguru import logger
 from app.core.config import settings
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import orjson
+import os
+
+
+# LinkedIn session cookies saved by LinkedInAuth.login
+COOKIES_FILE = "linkedin_cookies.json"
+
+
+async def _launch_chromium(playwright) -> Browser:
+    """Launch Chromium with the automation flags every service uses"""
+    return await playwright.chromium.launch(
+        headless=settings.BROWSER_HEADLESS,
+        args=[
+            '--no-sandbox',
+            '--disable-setuid-sandbox',
+            '--disable-blink-features=AutomationControlled',
+        ]
+    )
+
+
+# Realistic settings for every browser context
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'locale': 'en-US',
+    'timezone_id': 'America/New_York',
+}
+
+# Stealth script run in every page before the site's own scripts
+HIDE_WEBDRIVER_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+"""
+
+
+async def _new_context(browser: Browser) -> BrowserContext:
+    """Context with CONTEXT_OPTIONS whose pages all get the stealth script"""
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.add_init_script(HIDE_WEBDRIVER_SCRIPT)
+    return context
+
+
+class _CookieCache:
+    """Parsed cookie files, re-read only when the file's mtime changes"""
+    
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, List[Dict]]] = {}
+    
+    def load(self, path: str) -> Optional[List[Dict]]:
+        """Cookies saved at path, or None if there is no file"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, orjson.loads(Path(path).read_bytes()))
+            self._entries[path] = entry
+        return entry[1]
+    
+    def save(self, path: str, cookies: List[Dict]):
+        """Write cookies to path and keep them as the cached copy"""
+        Path(path).write_bytes(orjson.dumps(cookies))
+        self._entries[path] = (os.stat(path).st_mtime, cookies)
+
+
+# Shared by every service (one file, read once per change)
+cookie_cache = _CookieCache()
 
 
 class PlaywrightService:
     """Base service for browser automation with Playwright"""
     
-    def __init__(self):
+    def __init__(self, pool: Optional["BrowserPool"] = None):
+        """
+        Args:
+            pool: Shared browser whose logged-in context to open a page in.
+                Without one, start() launches (and close() shuts down) a
+                dedicated browser.
+        """
+        self.pool = pool
         self.playwright = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
-        self.executor = ThreadPoolExecutor(max_workers=1)
-        
-    def _start_sync(self):
-        """Initialize Playwright and launch browser (sync)"""
-        logger.info("Starting Playwright browser...")
-        self.playwright = sync_playwright().start()
-        
-        # Launch browser (Chromium)
-        self.browser = self.playwright.chromium.launch(
-            headless=settings.BROWSER_HEADLESS,
-            args=[
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-blink-features=AutomationControlled',
-            ]
-        )
-        
-        # Create context with realistic settings
-        self.context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            locale='en-US',
-            timezone_id='America/New_York',
-        )
+    
+    def _require_page(self) -> Page:
+        if not self.page:
+            raise Exception("Browser not started.")
+        return self.page
+    
+    async def start(self):
+        """Initialize Playwright and launch browser"""
+        if self.pool:
+            # Only a page is opened; the pool's context (and session) persists
+            self.browser = self.pool.browser
+            self.context = self.pool.context
+        else:
+            logger.info("Starting Playwright browser...")
+            self.playwright = await async_playwright().start()
+            
+            # Launch browser (Chromium)
+            self.browser = await _launch_chromium(self.playwright)
+            self.context = await _new_context(self.browser)
         
         # Create page
-        self.page = self.context.new_page()
-        
-        # Add stealth scripts
-        self.page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
+        self.page = await self.context.new_page()
         
         logger.info("Browser started successfully")
-    
-    async def start(self):
-        """Async wrapper for start"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._start_sync)
         
-    def _close_sync(self):
-        """Close browser (sync)"""
+    async def close(self):
+        """Close browser"""
         logger.info("Closing browser...")
         if self.page:
-            self.page.close()
-        if self.context:
-            self.context.close()
-        if self.browser:
-            self.browser.close()
-        if self.playwright:
-            self.playwright.stop()
+            await self.page.close()
+        if self.pool:
+            # The shared browser and context outlive this page
+            self.page = None
+            self.context = None
+            self.browser = None
+        else:
+            if self.context:
+                await self.context.close()
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
         logger.info("Browser closed")
         
-    async def close(self):
-        """Async wrapper for close"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._close_sync)
-        
-    def _goto_sync(self, url: str, wait_until: str = "domcontentloaded"):
-        """Navigate to URL (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
-        
-        logger.info(f"Navigating to: {url}")
-        self.page.goto(url, wait_until=wait_until, timeout=30000)
-    
     async def goto(self, url: str, wait_until: str = "domcontentloaded"):
-        """Async wrapper for goto"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._goto_sync, url, wait_until)
-        
-    def _screenshot_sync(self, path: str):
-        """Take screenshot (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
+        """Navigate to URL"""
+        page = self._require_page()
+        logger.info(f"Navigating to: {url}")
+        await page.goto(url, wait_until=wait_until, timeout=30000)
         
-        self.page.screenshot(path=path, full_page=True)
+    async def screenshot(self, path: str, full_page: bool = True, quality: Optional[int] = None):
+        """Take screenshot (JPEG when quality is given); the file is written off the event loop"""
+        image = await self._require_page().screenshot(
+            type='jpeg' if quality else 'png',
+            quality=quality,
+            full_page=full_page
+        )
+        await asyncio.to_thread(Path(path).write_bytes, image)
         logger.info(f"Screenshot saved: {path}")
-    
-    async def screenshot(self, path: str):
-        """Async wrapper for screenshot"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._screenshot_sync, path)
-        
-    def _wait_for_selector_sync(self, selector: str, timeout: int = 10000):
-        """Wait for element (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
         
-        self.page.wait_for_selector(selector, timeout=timeout)
-    
     async def wait_for_selector(self, selector: str, timeout: int = 10000):
-        """Async wrapper"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._wait_for_selector_sync, selector, timeout)
-        
-    def _click_sync(self, selector: str):
-        """Click element (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
+        """Wait for element"""
+        await self._require_page().wait_for_selector(selector, timeout=timeout)
+    
+    async def smart_wait(self, selector: str, timeout: int = 5000) -> bool:
+        """
+        Wait for the page to be ready instead of sleeping a fixed time: returns as
+        soon as selector (comma-join alternatives) is visible, False after timeout
+        """
+        page = self._require_page()
+        try:
+            await page.wait_for_selector(selector, timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            logger.warning(f"Timed out after {timeout}ms waiting for: {selector}")
+            return False
+    
+    async def wait_for_url(self, predicate: Callable[[str], bool], timeout: int = 10000) -> bool:
+        """Wait until the page URL satisfies predicate; False if it never did within timeout"""
+        page = self._require_page()
+        try:
+            await page.wait_for_url(predicate, wait_until="commit", timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+    
+    async def wait_for_network_idle(self, timeout: int = 5000):
+        """Wait for in-page requests to settle, at most timeout ms"""
+        page = self._require_page()
+        try:
+            await page.wait_for_load_state("networkidle", timeout=timeout)
+        except PlaywrightTimeoutError:
+            # Pages with long-polling never go idle; carry on after timeout
+            pass
         
-        self.page.click(selector)
+    async def click(self, selector: str):
+        """Click element"""
+        await self._require_page().click(selector)
         logger.info(f"Clicked: {selector}")
+        
+    async def fill(self, selector: str, text: str):
+        """Fill input"""
+        await self._require_page().fill(selector, text)
+        logger.info(f"Filled: {selector}")
+        
+    async def get_text(self, selector: str) -> str:
+        """Get text"""
+        element = await self._require_page().query_selector(selector)
+        if element:
+            return await element.inner_text()
+        return ""
     
-    async def click(self, selector: str):
-        """Async wrapper"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._click_sync, selector)
+    async def load_cookies(self) -> bool:
+        """Load the saved LinkedIn session; False if there is none"""
+        if self.pool:
+            return await self.pool.load_cookies()
+        if not self.context:
+            return False
         
-    def _fill_sync(self, selector: str, text: str):
-        """Fill input (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
+        cookies = cookie_cache.load(COOKIES_FILE)
+        if cookies is None:
+            logger.warning("No cookies file found. Please login first.")
+            return False
         
-        self.page.fill(selector, text)
-        logger.info(f"Filled: {selector}")
+        await self.context.add_cookies(cookies)
+        logger.info(f"Cookies loaded from {COOKIES_FILE}")
+        return True
     
-    async def fill(self, selector: str, text: str):
-        """Async wrapper"""
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(self.executor, self._fill_sync, selector, text)
+    async def save_cookies(self):
+        """Save the LinkedIn session for later services"""
+        if not self.context:
+            return
         
-    def _get_text_sync(self, selector: str) -> str:
-        """Get text (sync)"""
-        if not self.page:
-            raise Exception("Browser not started.")
+        cookies = await self.context.cookies()
+        await asyncio.to_thread(cookie_cache.save, COOKIES_FILE, cookies)
+        logger.info(f"Cookies saved to {COOKIES_FILE}")
+
+
+ServiceT = TypeVar("ServiceT", bound=PlaywrightService)
+
+
+class BrowserPool:
+    """
+    One Chromium and one BrowserContext, launched once and shared across
+    requests. The context carries the saved LinkedIn session, so each service
+    acquired from the pool only opens a page in it instead of launching a
+    browser (~1-3s) and adding cookies.
+    """
+    
+    def __init__(self, max_contexts: int = settings.MAX_CONCURRENT_BROWSERS):
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        # Cookie list last added to the context (cookie_cache hands out the
+        # same list until the file changes)
+        self._session_cookies: Optional[List[Dict]] = None
+        self._contexts = asyncio.Semaphore(max_contexts)
+        self._lock = asyncio.Lock()
+    
+    async def start(self):
+        """Launch the shared browser if it isn't running"""
+        async with self._lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self.playwright:
+                    await self.stop()
+                logger.info("Starting shared Playwright browser...")
+                self.playwright = await async_playwright().start()
+                self.browser = await _launch_chromium(self.playwright)
+                self.context = await _new_context(self.browser)
+                await self.load_cookies()
+                logger.info("Shared browser started")
+    
+    async def load_cookies(self) -> bool:
+        """Add the saved LinkedIn cookies to the shared context unless it has them already"""
+        cookies = cookie_cache.load(COOKIES_FILE)
+        if cookies is None:
+            logger.warning("No cookies file found. Please login first.")
+            return False
         
-        element = self.page.query_selector(selector)
-        if element:
-            return element.inner_text()
-        return ""
+        if cookies is not self._session_cookies:
+            await self.context.add_cookies(cookies)
+            self._session_cookies = cookies
+            logger.info(f"Cookies loaded from {COOKIES_FILE} into the shared context")
+        return True
     
-    async def get_text(self, selector: str) -> str:
-        """Async wrapper"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self.executor, self._get_text_sync, selector)
\ No newline at end of file
+    async def stop(self):
+        """Close the shared browser (called on app shutdown)"""
+        if self.playwright is None:
+            return
+        if self.browser:
+            await self.browser.close()
+        await self.playwright.stop()
+        self.browser = None
+        self.context = None
+        self._session_cookies = None
+        self.playwright = None
+        logger.info("Shared browser closed")
+    
+    @asynccontextmanager
+    async def acquire(self, service_cls: Callable[..., ServiceT]) -> AsyncIterator[ServiceT]:
+        """
+        Service bound to the shared browser; its start()/close() open and close
+        a page in the shared context. At most max_contexts services are handed
+        out at once.
+        """
+        async with self._contexts:
+            await self.start()
+            yield service_cls(pool=self)
+
+
+# Global instance
+browser_pool = BrowserPool()
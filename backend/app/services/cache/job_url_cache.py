@@ -0,0 +1,72 @@
+"""
+Job URL Cache
+Redis memo of scraped LinkedIn jobs and of URLs already applied to, so repeated
+clicks on the same job skip the Chromium scrape and the duplicate application
+"""
+from typing import Dict, Optional
+from loguru import logger
+import hashlib
+import json
+import redis.asyncio as redis
+
+from app.services.cache.redis_client import get_redis_client
+
+
+class JobUrlCache:
+    """
+    Redis-backed job URL memo. Redis is an optimisation only: when it is
+    unreachable every method degrades to a miss / no-op.
+    """
+    
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+    
+    @property
+    def client(self) -> redis.Redis:
+        return get_redis_client()
+    
+    @staticmethod
+    def _url_hash(job_url: str) -> str:
+        return hashlib.sha1(job_url.encode("utf-8")).hexdigest()
+    
+    def _applied_key(self, user_id: int, job_url: str) -> str:
+        return f"applied:{user_id}:{self._url_hash(job_url)}"
+    
+    def _job_key(self, job_url: str) -> str:
+        return f"job:{self._url_hash(job_url)}"
+    
+    async def is_applied(self, user_id: int, job_url: str) -> bool:
+        """Whether this user already applied to the job URL"""
+        try:
+            return bool(await self.client.exists(self._applied_key(user_id, job_url)))
+        except Exception as e:
+            logger.warning(f"Job URL cache unavailable: {e}")
+            return False
+    
+    async def mark_applied(self, user_id: int, job_url: str):
+        """Remember an application to the job URL"""
+        try:
+            await self.client.set(self._applied_key(user_id, job_url), 1, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Job URL cache unavailable: {e}")
+    
+    async def get_job_data(self, job_url: str) -> Optional[Dict]:
+        """Previously scraped job details, or None"""
+        try:
+            raw = await self.client.get(self._job_key(job_url))
+        except Exception as e:
+            logger.warning(f"Job URL cache unavailable: {e}")
+            return None
+        
+        return json.loads(raw) if raw else None
+    
+    async def set_job_data(self, job_url: str, job_data: Dict):
+        """Cache scraped job details"""
+        try:
+            await self.client.set(self._job_key(job_url), json.dumps(job_data, default=str), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Job URL cache unavailable: {e}")
+
+
+# Global instance
+job_url_cache = JobUrlCache()
@@ -0,0 +1,69 @@
+"""
+Knowledge Base Cache
+Short-lived in-process snapshot of knowledge base rows for read-heavy endpoints
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.knowledge_base import KnowledgeBase
+
+
+class KnowledgeBaseCache:
+    """TTL cache of knowledge base snapshots keyed by user ID"""
+    
+    def __init__(self, ttl_seconds: float = 30.0, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+    
+    @staticmethod
+    def snapshot(kb: KnowledgeBase) -> Dict[str, Any]:
+        """Column values of a knowledge base row as a plain dict"""
+        return {column.name: getattr(kb, column.name) for column in KnowledgeBase.__table__.columns}
+    
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return cached snapshot (read-only) or None if missing/expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        
+        expires_at, snapshot = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        
+        return snapshot
+    
+    def set(self, user_id: int, kb: KnowledgeBase) -> Dict[str, Any]:
+        """Cache a snapshot of the given row and return it"""
+        if len(self._entries) >= self.maxsize:
+            self._entries.clear()
+        
+        snapshot = self.snapshot(kb)
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, snapshot)
+        return snapshot
+    
+    async def fetch(self, db: AsyncSession, user_id: int) -> Optional[Dict[str, Any]]:
+        """Cached snapshot, loading (and caching) the row on a miss; None if the user has no knowledge base"""
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            return snapshot
+        
+        result = await db.execute(
+            select(KnowledgeBase).where(KnowledgeBase.user_id == user_id)
+        )
+        kb = result.scalar_one_or_none()
+        if kb is None:
+            return None
+        
+        return self.set(user_id, kb)
+    
+    def invalidate(self, user_id: int):
+        """Drop cached snapshot after a write"""
+        self._entries.pop(user_id, None)
+
+
+# Global instance
+kb_cache = KnowledgeBaseCache()
\ No newline at end of file
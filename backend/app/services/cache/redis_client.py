@@ -0,0 +1,32 @@
+"""
+Redis Client
+Shared asyncio Redis connection pool for the cache services
+"""
+from typing import Optional
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+
+# Shared Redis client (one connection pool for the whole app)
+_client: Optional[redis.Redis] = None
+
+def get_redis_client() -> redis.Redis:
+    """Get or create the shared Redis client"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=1
+        )
+    return _client
+
+
+async def close_redis_client():
+    """Close the shared Redis client (called on app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
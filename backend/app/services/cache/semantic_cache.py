@@ -0,0 +1,198 @@
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    PayloadSchemaType,
+    Range
+)
+from typing import Any, Dict, List, Optional
+from loguru import logger
+import hashlib
+import json
+import time
+import uuid
+
+from app.services.embeddings.embedding_service import get_embedding_service
+from app.services.qdrant.qdrant_service import get_qdrant_service
+
+
+class SemanticCache:
+    """
+    Semantic response cache backed by Qdrant.
+    Similar questions asked against the same profile/job reuse a previous answer
+    instead of calling the LLM again. Every method blocks (embedding + Qdrant
+    client); call them via asyncio.to_thread from async code.
+    """
+    
+    COLLECTION = "answer_cache"
+    
+    # Seconds between purges of expired entries (run from put())
+    PURGE_INTERVAL = 3600
+    
+    def __init__(self, score_threshold: float = 0.92, max_age: float = 7 * 24 * 3600):
+        """
+        Args:
+            score_threshold: Minimum cosine similarity for a cache hit
+            max_age: Seconds an entry stays valid; older entries are never
+                returned and get deleted by the periodic purge
+        """
+        self.embedding_service = get_embedding_service()
+        self.qdrant_service = get_qdrant_service()
+        self.score_threshold = score_threshold
+        self.max_age = max_age
+        self._last_purge = 0.0
+        
+        try:
+            self._ensure_collection()
+        except Exception as e:
+            logger.warning(f"Semantic cache collection unavailable: {e}")
+    
+    def _ensure_collection(self):
+        """Create cache collection if it doesn't exist (kept apart from RAG collections)"""
+        client = self.qdrant_service.client
+        try:
+            client.get_collection(self.COLLECTION)
+        except Exception:
+            client.create_collection(
+                collection_name=self.COLLECTION,
+                vectors_config=VectorParams(
+                    size=self.embedding_service.dimension,
+                    distance=Distance.COSINE
+                )
+            )
+            logger.info(f"✨ Created collection '{self.COLLECTION}'")
+        
+        # Lookups and purges filter on ts (no-op if the index already exists)
+        client.create_payload_index(
+            collection_name=self.COLLECTION,
+            field_name="ts",
+            field_schema=PayloadSchemaType.FLOAT
+        )
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Stable hash of the exact-match part of a cache entry (profile, job, template...)"""
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def jaccard(a, b) -> float:
+        """Jaccard similarity of two collections of IDs (1.0 when both are empty)"""
+        a, b = set(a), set(b)
+        if not a and not b:
+            return 1.0
+        return len(a & b) / len(a | b)
+    
+    def _filter(self, kind: str, context_key: str) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(key="kind", match=MatchValue(value=kind)),
+                FieldCondition(key="context_key", match=MatchValue(value=context_key)),
+                FieldCondition(key="ts", range=Range(gte=time.time() - self.max_age))
+            ]
+        )
+    
+    def purge_expired(self):
+        """Delete entries older than max_age (old profile/job versions are never asked for again)"""
+        self._last_purge = time.time()
+        self.qdrant_service.client.delete(
+            collection_name=self.COLLECTION,
+            points_selector=Filter(
+                must=[FieldCondition(key="ts", range=Range(lt=self._last_purge - self.max_age))]
+            )
+        )
+    
+    def lookup(
+        self,
+        kind: str,
+        text: str,
+        context_key: str,
+        query_vector: Optional[List[float]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached entry
+        
+        Args:
+            kind: Cache namespace (e.g. "question_answer", "cover_letter")
+            text: Text compared semantically (the question)
+            context_key: Exact-match key from make_key()
+            query_vector: Precomputed embedding of text (skips re-encoding)
+            
+        Returns:
+            Cached payload (response, metadata, ts...) or None on miss/error
+        """
+        try:
+            if query_vector is None:
+                query_vector = self.embedding_service.encode(text)
+            results = self.qdrant_service.client.query_points(
+                collection_name=self.COLLECTION,
+                query=query_vector,
+                query_filter=self._filter(kind, context_key),
+                score_threshold=self.score_threshold,
+                limit=1
+            ).points
+            
+            if results:
+                logger.info(f"Semantic cache hit ({kind}, score={results[0].score:.3f})")
+                return results[0].payload
+            
+            return None
+            
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+    
+    def get(self, kind: str, text: str, context_key: str) -> Optional[str]:
+        """Look up a cached response (see lookup()); returns the response text or None"""
+        entry = self.lookup(kind, text, context_key)
+        return entry.get("response") if entry else None
+    
+    def put(
+        self,
+        kind: str,
+        text: str,
+        context_key: str,
+        response: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[List[float]] = None
+    ):
+        """Store a response in the cache (errors are logged, never raised)"""
+        if not response:
+            return
+        
+        try:
+            point = PointStruct(
+                id=str(uuid.uuid4()),
+                vector=query_vector if query_vector is not None else self.embedding_service.encode(text),
+                payload={
+                    "kind": kind,
+                    "context_key": context_key,
+                    "text": text,
+                    "response": response,
+                    "metadata": metadata or {},
+                    "ts": time.time()
+                }
+            )
+            self.qdrant_service.client.upsert(
+                collection_name=self.COLLECTION,
+                points=[point]
+            )
+            
+            if time.time() - self._last_purge > self.PURGE_INTERVAL:
+                self.purge_expired()
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+
+
+# Global instance
+_semantic_cache = None
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create semantic cache instance"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
\ No newline at end of file
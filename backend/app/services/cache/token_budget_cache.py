@@ -0,0 +1,147 @@
+"""
+Token Budget Cache
+Running per-user token totals for the current UTC day and month in Redis, so
+budget checks are a single MGET instead of summing token_usage.
+
+Seeding a missing counter races with usage being recorded while Postgres is
+summed, so it is done in two steps: start_seeding() opens a pending key per
+counter that add_tokens() counts into while the counter is missing, and
+set_totals() sets the counter to the sum plus whatever is pending. Tokens
+recorded between the sum and the set are therefore never lost; a record
+committed just before the sum but counted just after it is counted twice, so
+the totals can run slightly high but never low.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from loguru import logger
+
+from app.services.cache.redis_client import get_redis_client
+
+
+# Pending keys outlive a seed that never finishes by this long
+SEED_PENDING_SECONDS = 300
+
+# KEYS are (counter, pending) pairs. Add to a seeded counter, or to its pending
+# key while it is being seeded; a counter nobody is seeding is summed on its
+# next miss anyway
+INCRBY_EXISTING = """
+for i = 1, #KEYS, 2 do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[1])
+    elseif redis.call('EXISTS', KEYS[i + 1]) == 1 then
+        redis.call('INCRBY', KEYS[i + 1], ARGV[1])
+    end
+end
+"""
+
+# KEYS are (counter, pending) pairs, ARGV (total, expire-at) pairs. Set each
+# missing counter to its summed total plus the tokens recorded meanwhile; a
+# counter another seed already set is left alone
+SEED_COUNTERS = """
+for i = 1, #KEYS, 2 do
+    if redis.call('EXISTS', KEYS[i]) == 0 then
+        local pending = tonumber(redis.call('GET', KEYS[i + 1]) or '0')
+        redis.call('SET', KEYS[i], tonumber(ARGV[i]) + pending, 'EXAT', ARGV[i + 1])
+    end
+    redis.call('DEL', KEYS[i + 1])
+end
+"""
+
+
+class TokenBudgetCache:
+    """
+    Redis-backed day / month token totals, seeded from Postgres on a miss and
+    incremented whenever usage is recorded. Redis is an optimisation only: when
+    it is unreachable every method degrades to a miss / no-op.
+    """
+    
+    @staticmethod
+    def day_key(user_id: int, day: datetime) -> str:
+        return f"token_sum:{user_id}:{day.strftime('%Y%m%d')}"
+    
+    @staticmethod
+    def month_key(user_id: int, month: datetime) -> str:
+        return f"token_sum:{user_id}:{month.strftime('%Y%m')}"
+    
+    @staticmethod
+    def pending_key(counter_key: str) -> str:
+        return f"{counter_key}:pending"
+    
+    def _counter_keys(self, user_id: int, now: datetime) -> List[str]:
+        """(day, day pending, month, month pending) keys"""
+        day_key = self.day_key(user_id, now)
+        month_key = self.month_key(user_id, now)
+        return [day_key, self.pending_key(day_key), month_key, self.pending_key(month_key)]
+    
+    @staticmethod
+    def period_ends(now: datetime) -> Tuple[datetime, datetime]:
+        """Next UTC midnight and first of next month (when the counters expire)"""
+        day_end = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        month_end = (now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + timedelta(days=32)).replace(day=1)
+        return day_end, month_end
+    
+    async def get_totals(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """(today, this month) token totals, or None unless both are cached"""
+        now = datetime.utcnow()
+        try:
+            day_total, month_total = await get_redis_client().mget(
+                self.day_key(user_id, now),
+                self.month_key(user_id, now)
+            )
+        except Exception as e:
+            logger.warning(f"Token budget cache unavailable: {e}")
+            return None
+        
+        if day_total is None or month_total is None:
+            return None
+        return int(day_total), int(month_total)
+    
+    async def start_seeding(self, user_id: int):
+        """Start collecting recorded usage for the counters; call before summing Postgres"""
+        _, day_pending, _, month_pending = self._counter_keys(user_id, datetime.utcnow())
+        try:
+            async with get_redis_client().pipeline(transaction=False) as pipe:
+                pipe.set(day_pending, 0, nx=True, ex=SEED_PENDING_SECONDS)
+                pipe.set(month_pending, 0, nx=True, ex=SEED_PENDING_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Token budget cache unavailable: {e}")
+    
+    async def set_totals(self, user_id: int, day_total: int, month_total: int):
+        """Seed the counters from totals summed after start_seeding()"""
+        now = datetime.utcnow()
+        day_end, month_end = self.period_ends(now)
+        try:
+            await get_redis_client().eval(
+                SEED_COUNTERS,
+                4,
+                *self._counter_keys(user_id, now),
+                day_total,
+                self._utc_timestamp(day_end),
+                month_total,
+                self._utc_timestamp(month_end)
+            )
+        except Exception as e:
+            logger.warning(f"Token budget cache unavailable: {e}")
+    
+    async def add_tokens(self, user_id: int, tokens: int):
+        """Count newly recorded usage towards today's and this month's totals"""
+        now = datetime.utcnow()
+        try:
+            await get_redis_client().eval(
+                INCRBY_EXISTING,
+                4,
+                *self._counter_keys(user_id, now),
+                tokens
+            )
+        except Exception as e:
+            logger.warning(f"Token budget cache unavailable: {e}")
+    
+    @staticmethod
+    def _utc_timestamp(moment: datetime) -> int:
+        return int((moment - datetime(1970, 1, 1)).total_seconds())
+
+
+# Global instance
+token_budget_cache = TokenBudgetCache()
+
@@ -0,0 +1,59 @@
+"""
+Usage Stats Cache
+Short-lived Redis copy of today's / month-to-date token usage stats, so
+dashboards polling those endpoints don't re-aggregate on every request
+"""
+from datetime import datetime
+from typing import Optional
+from loguru import logger
+
+from app.services.cache.redis_client import get_redis_client
+
+
+class UsageStatsCache:
+    """
+    Redis-backed stats cache, invalidated whenever usage is recorded.
+    Redis is an optimisation only: when it is unreachable every method
+    degrades to a miss / no-op.
+    """
+    
+    def __init__(self, ttl_seconds: int = 30):
+        self.ttl_seconds = ttl_seconds
+    
+    @staticmethod
+    def daily_key(user_id: int, day: datetime) -> str:
+        return f"tstats:{user_id}:day:{day.date().isoformat()}"
+    
+    @staticmethod
+    def monthly_key(user_id: int, month: datetime) -> str:
+        return f"tstats:{user_id}:month:{month.strftime('%Y-%m')}"
+    
+    async def get_json(self, key: str) -> Optional[str]:
+        """Cached stats as TokenUsageStats JSON (served as is), or None"""
+        try:
+            return await get_redis_client().get(key)
+        except Exception as e:
+            logger.warning(f"Usage stats cache unavailable: {e}")
+            return None
+    
+    async def set_json(self, key: str, stats_json: str):
+        """Cache TokenUsageStats JSON for ttl_seconds"""
+        try:
+            await get_redis_client().set(key, stats_json, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Usage stats cache unavailable: {e}")
+    
+    async def invalidate(self, user_id: int):
+        """Drop the user's current day and month stats after a write"""
+        now = datetime.utcnow()
+        try:
+            await get_redis_client().delete(
+                self.daily_key(user_id, now),
+                self.monthly_key(user_id, now)
+            )
+        except Exception as e:
+            logger.warning(f"Usage stats cache unavailable: {e}")
+
+
+# Global instance
+usage_stats_cache = UsageStatsCache()
@@ -7,6 +7,9 @@ import numpy as np
 class EmbeddingService:
     """Generate embeddings using sentence-transformers"""
     
+    # Texts per forward pass when encoding a list (whole knowledge base at index time)
+    BATCH_SIZE = 64
+    
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         """
         Initialize embedding model
@@ -38,16 +41,16 @@ class EmbeddingService:
                 return embedding.tolist()
             else:
                 # Batch of texts
-                embeddings = self.model.encode(text, convert_to_numpy=True)
+                embeddings = self.model.encode(text, batch_size=self.BATCH_SIZE, convert_to_numpy=True)
                 return embeddings.tolist()
                 
         except Exception as e:
             logger.error(f"Embedding error: {e}")
             raise
     
-    def encode_work_experience(self, experience: dict) -> List[float]:
+    def work_experience_text(self, experience: dict) -> str:
         """
-        Generate embedding for work experience
+        Text used to embed a work experience
         Combines title, company, and description
         """
         text_parts = []
@@ -65,11 +68,10 @@ class EmbeddingService:
             tech_list = ', '.join(experience['technologies'])
             text_parts.append(f"Technologies: {tech_list}")
         
-        text = ' | '.join(text_parts)
-        return self.encode(text)
+        return ' | '.join(text_parts)
     
-    def encode_project(self, project: dict) -> List[float]:
-        """Generate embedding for project"""
+    def project_text(self, project: dict) -> str:
+        """Text used to embed a project"""
         text_parts = []
         
         if project.get('name'):
@@ -82,11 +84,10 @@ class EmbeddingService:
             tech_list = ', '.join(project['technologies'])
             text_parts.append(f"Technologies: {tech_list}")
         
-        text = ' | '.join(text_parts)
-        return self.encode(text)
+        return ' | '.join(text_parts)
     
-    def encode_skill(self, skill: Union[str, dict]) -> List[float]:
-        """Generate embedding for skill"""
+    def skill_text(self, skill: Union[str, dict]) -> str:
+        """Text used to embed a skill"""
         if isinstance(skill, str):
             text = f"Skill: {skill}"
         else:
@@ -94,16 +95,29 @@ class EmbeddingService:
             if skill.get('proficiency'):
                 text += f" | Proficiency: {skill['proficiency']}"
         
-        return self.encode(text)
+        return text
+    
+    def qa_pair_text(self, question: str, answer: str = None) -> str:
+        """Text used to embed a Q&A pair"""
+        if answer:
+            return f"Question: {question} | Answer: {answer}"
+        return f"Question: {question}"
+    
+    def encode_work_experience(self, experience: dict) -> List[float]:
+        """Generate embedding for work experience"""
+        return self.encode(self.work_experience_text(experience))
+    
+    def encode_project(self, project: dict) -> List[float]:
+        """Generate embedding for project"""
+        return self.encode(self.project_text(project))
+    
+    def encode_skill(self, skill: Union[str, dict]) -> List[float]:
+        """Generate embedding for skill"""
+        return self.encode(self.skill_text(skill))
     
     def encode_qa_pair(self, question: str, answer: str = None) -> List[float]:
         """Generate embedding for Q&A pair"""
-        if answer:
-            text = f"Question: {question} | Answer: {answer}"
-        else:
-            text = f"Question: {question}"
-        
-        return self.encode(text)
+        return self.encode(self.qa_pair_text(question, answer))
     
     def similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
@@ -4,11 +4,11 @@ Evaluates quality of AI-generated responses
 """
 from typing import Optional, Dict, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, insert, func, case, literal, tuple_
 from loguru import logger
 
 from app.models.response_evaluation import ResponseEvaluation
-from app.models.token_usage import TokenUsage
+from app.models.token_usage import TokenUsage, TokenUsageText
 from app.schemas.evaluation import (
     ResponseEvaluationCreate,
     EvaluationStats,
@@ -24,12 +24,15 @@ class ResponseEvaluator:
         db: AsyncSession,
         evaluation: ResponseEvaluationCreate
     ) -> ResponseEvaluation:
-        """Create a manual evaluation"""
+        """Create a manual evaluation (single INSERT ... RETURNING, no refresh SELECT)"""
         try:
-            db_evaluation = ResponseEvaluation(**evaluation.dict())
-            db.add(db_evaluation)
+            result = await db.execute(
+                insert(ResponseEvaluation)
+                .values(**evaluation.dict())
+                .returning(ResponseEvaluation)
+            )
+            db_evaluation = result.scalar_one()
             await db.commit()
-            await db.refresh(db_evaluation)
             
             logger.info(f"Evaluation created: {db_evaluation.id} - Score: {db_evaluation.overall_score}")
             return db_evaluation
@@ -43,36 +46,73 @@ class ResponseEvaluator:
     async def auto_evaluate_keyword_match(
         db: AsyncSession,
         token_usage_id: int,
-        user_id: int,
-        expected_keywords: List[str],
-        response_text: str
-    ) -> ResponseEvaluation:
+        expected_keywords: List[str]
+    ) -> Optional[ResponseEvaluation]:
         """
         Auto-evaluate based on keyword matching.
         Checks if response contains expected keywords.
+        
+        Matching runs inside one INSERT ... SELECT FROM token_usage (joined to its
+        token_usage_text) ... RETURNING,
+        so the response text never leaves the database.
+        Returns None if the token usage record does not exist.
         """
         try:
-            response_lower = response_text.lower()
-            matched_keywords = [kw for kw in expected_keywords if kw.lower() in response_lower]
-            match_percentage = len(matched_keywords) / len(expected_keywords) if expected_keywords else 0
+            total = len(expected_keywords)
+            response_lower = func.lower(func.coalesce(TokenUsageText.completion_text, ""))
             
-            # Calculate scores
-            completeness_score = 1 + (match_percentage * 4)  # 1-5 scale
-            overall_score = completeness_score
+            # WITH tu AS (token usage row + number of keywords found, case-insensitive)
+            tu = select(
+                TokenUsage.id,
+                TokenUsage.user_id,
+                sum(
+                    (case((func.strpos(response_lower, kw.lower()) > 0, 1), else_=0) for kw in expected_keywords),
+                    literal(0)
+                ).label("matched")
+            ).select_from(TokenUsage).outerjoin(TokenUsageText).where(TokenUsage.id == token_usage_id).cte("tu")
             
-            evaluation = ResponseEvaluationCreate(
-                token_usage_id=token_usage_id,
-                user_id=user_id,
-                completeness_score=completeness_score,
-                overall_score=overall_score,
-                evaluation_method=EvaluationMethod.AUTO_KEYWORD,
-                evaluator_notes=f"Matched {len(matched_keywords)}/{len(expected_keywords)} keywords",
-                needs_improvement=(match_percentage < 0.5)
+            # Calculate scores: completeness on a 1-5 scale, < 50% matched needs improvement
+            if total:
+                completeness_score = literal(1.0) + tu.c.matched * (4.0 / total)
+                needs_improvement = tu.c.matched * 2 < total
+            else:
+                completeness_score = literal(1.0)
+                needs_improvement = literal(True)
+            
+            evaluation_row = select(
+                tu.c.id,
+                tu.c.user_id,
+                completeness_score,
+                completeness_score,
+                literal(EvaluationMethod.AUTO_KEYWORD.value),
+                func.concat("Matched ", tu.c.matched, f"/{total} keywords"),
+                needs_improvement,
+                literal(False),
+                literal(False),
+                func.timezone("utc", func.now()),
             )
             
-            return await ResponseEvaluator.create_evaluation(db, evaluation)
+            result = await db.execute(
+                insert(ResponseEvaluation)
+                .from_select(
+                    [
+                        "token_usage_id", "user_id", "completeness_score", "overall_score",
+                        "evaluation_method", "evaluator_notes", "needs_improvement",
+                        "is_hallucination", "is_inappropriate", "created_at",
+                    ],
+                    evaluation_row
+                )
+                .returning(ResponseEvaluation)
+            )
+            db_evaluation = result.scalar_one_or_none()
+            await db.commit()
+            
+            if db_evaluation:
+                logger.info(f"Evaluation created: {db_evaluation.id} - Score: {db_evaluation.overall_score}")
+            return db_evaluation
             
         except Exception as e:
+            await db.rollback()
             logger.error(f"Error in keyword evaluation: {e}")
             raise
     
@@ -122,7 +162,6 @@ Respond ONLY with JSON in this exact format:
             # Get evaluation from LLM
             eval_response = await ollama_tracker.generate_with_tracking(
                 prompt=eval_prompt,
-                db=db,
                 user_id=user_id,
                 operation_type="response_evaluation",
                 system_prompt="You are an AI response evaluator. Be critical but fair.",
@@ -165,20 +204,70 @@ Respond ONLY with JSON in this exact format:
         user_id: Optional[int] = None,
         operation_type: Optional[str] = None
     ) -> EvaluationStats:
-        """Get aggregated evaluation statistics"""
+        """Get aggregated evaluation statistics (averages and counts are computed in SQL)"""
         try:
-            query = select(ResponseEvaluation)
+            def apply_filters(query):
+                if user_id:
+                    query = query.where(ResponseEvaluation.user_id == user_id)
+                if operation_type:
+                    query = query.where(TokenUsage.operation_type == operation_type)
+                return query
+            
+            # Always join token_usage so operation_type can be filtered and grouped on
+            base_from = ResponseEvaluation.__table__.join(
+                TokenUsage.__table__, ResponseEvaluation.token_usage_id == TokenUsage.id
+            )
+            
+            method = ResponseEvaluation.evaluation_method
+            op_type = TokenUsage.operation_type
             
-            if user_id:
-                query = query.where(ResponseEvaluation.user_id == user_id)
+            # Totals, per-method and per-operation rows in one scan and one round-trip:
+            # GROUPING SETS ((method), (operation_type), ()), told apart by grouping()
+            stats_query = apply_filters(
+                select(
+                    method,
+                    op_type,
+                    func.grouping(method),
+                    func.grouping(op_type),
+                    func.count(ResponseEvaluation.id),
+                    func.avg(ResponseEvaluation.overall_score),
+                    func.avg(ResponseEvaluation.relevance_score),
+                    func.avg(ResponseEvaluation.accuracy_score),
+                    func.avg(ResponseEvaluation.completeness_score),
+                    func.avg(ResponseEvaluation.conciseness_score),
+                    func.avg(ResponseEvaluation.professionalism_score),
+                    func.count(ResponseEvaluation.id).filter(ResponseEvaluation.needs_improvement.is_(True)),
+                    func.count(ResponseEvaluation.id).filter(ResponseEvaluation.is_hallucination.is_(True)),
+                    func.count(ResponseEvaluation.id).filter(ResponseEvaluation.is_inappropriate.is_(True)),
+                ).select_from(base_from)
+            ).group_by(func.grouping_sets(tuple_(method), tuple_(op_type), tuple_()))
             
-            if operation_type:
-                query = query.join(TokenUsage).where(TokenUsage.operation_type == operation_type)
+            totals = None
+            by_method = {}
+            by_op_type = {}
+            for row in await db.execute(stats_query):
+                row_method, row_op_type, method_rolled_up, op_type_rolled_up, count, avg_score = row[:6]
+                if method_rolled_up and op_type_rolled_up:
+                    totals = row[4:]
+                elif op_type_rolled_up:
+                    by_method[row_method] = {"count": count, "avg_score": float(avg_score or 0)}
+                else:
+                    by_op_type[row_op_type] = {"count": count, "avg_score": float(avg_score or 0)}
             
-            result = await db.execute(query)
-            evaluations = result.scalars().all()
+            (
+                total,
+                avg_overall,
+                avg_relevance,
+                avg_accuracy,
+                avg_completeness,
+                avg_conciseness,
+                avg_professionalism,
+                needs_improvement_count,
+                hallucination_count,
+                inappropriate_count,
+            ) = totals
             
-            if not evaluations:
+            if not total:
                 return EvaluationStats(
                     total_evaluations=0,
                     avg_overall_score=0.0,
@@ -194,44 +283,20 @@ Respond ONLY with JSON in this exact format:
                     by_evaluation_method={}
                 )
             
-            # Calculate averages
-            total = len(evaluations)
-            
-            def safe_avg(scores):
-                valid = [s for s in scores if s is not None]
-                return sum(valid) / len(valid) if valid else None
-            
-            # Group by operation type and method
-            by_op_type = {}
-            by_method = {}
-            
-            for eval in evaluations:
-                # By operation type (need to join with token_usage)
-                # Simplified here - you'd fetch the operation_type from token_usage
-                
-                # By evaluation method
-                method = eval.evaluation_method
-                if method not in by_method:
-                    by_method[method] = {"count": 0, "avg_score": 0}
-                by_method[method]["count"] += 1
-                by_method[method]["avg_score"] += eval.overall_score
-            
-            # Finalize averages
-            for method in by_method:
-                count = by_method[method]["count"]
-                by_method[method]["avg_score"] = by_method[method]["avg_score"] / count if count > 0 else 0
+            def as_float(value):
+                return float(value) if value is not None else None
             
             return EvaluationStats(
                 total_evaluations=total,
-                avg_overall_score=sum(e.overall_score for e in evaluations) / total,
-                avg_relevance_score=safe_avg([e.relevance_score for e in evaluations]),
-                avg_accuracy_score=safe_avg([e.accuracy_score for e in evaluations]),
-                avg_completeness_score=safe_avg([e.completeness_score for e in evaluations]),
-                avg_conciseness_score=safe_avg([e.conciseness_score for e in evaluations]),
-                avg_professionalism_score=safe_avg([e.professionalism_score for e in evaluations]),
-                needs_improvement_count=sum(1 for e in evaluations if e.needs_improvement),
-                hallucination_count=sum(1 for e in evaluations if e.is_hallucination),
-                inappropriate_count=sum(1 for e in evaluations if e.is_inappropriate),
+                avg_overall_score=float(avg_overall or 0),
+                avg_relevance_score=as_float(avg_relevance),
+                avg_accuracy_score=as_float(avg_accuracy),
+                avg_completeness_score=as_float(avg_completeness),
+                avg_conciseness_score=as_float(avg_conciseness),
+                avg_professionalism_score=as_float(avg_professionalism),
+                needs_improvement_count=needs_improvement_count,
+                hallucination_count=hallucination_count,
+                inappropriate_count=inappropriate_count,
                 by_operation_type=by_op_type,
                 by_evaluation_method=by_method
             )
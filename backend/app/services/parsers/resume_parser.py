@@ -1,4 +1,4 @@
-from typing import Dict, Optional, List
+from typing import BinaryIO, Dict, Optional, List, Union
 import re
 import json
 from loguru import logger
@@ -11,10 +11,10 @@ class ResumeParser:
     def __init__(self):
         pass
     
-    def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
-        """Extract text from PDF bytes"""
+    def extract_text_from_pdf(self, pdf_source: Union[bytes, BinaryIO]) -> str:
+        """Extract text from PDF bytes or a seekable binary file object"""
         try:
-            pdf_file = BytesIO(pdf_bytes)
+            pdf_file = BytesIO(pdf_source) if isinstance(pdf_source, (bytes, bytearray)) else pdf_source
             pdf_reader = PyPDF2.PdfReader(pdf_file)
             
             text = ""
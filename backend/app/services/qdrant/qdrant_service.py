@@ -5,7 +5,16 @@ from qdrant_client.models import (
     PointStruct,
     Filter,
     FieldCondition,
-    MatchValue
+    MatchValue,
+    PointIdsList,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    QuantizationConfig,
+    QuantizationSearchParams,
+    SearchParams
 )
 from typing import List, Dict, Optional
 from loguru import logger
@@ -22,6 +31,19 @@ class QdrantService:
     COLLECTION_SKILLS = "skills"
     COLLECTION_QA = "qa_pairs"
     
+    # Binary quantization only keeps enough recall for wide embeddings
+    BINARY_QUANTIZATION_MIN_DIM = 1024
+    
+    # Search the in-RAM quantized index, then rescore the oversampled top hits
+    # against the original vectors
+    SEARCH_PARAMS = SearchParams(
+        quantization=QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=2.0
+        )
+    )
+    
     def __init__(self):
         """Initialize Qdrant client"""
         self.client = QdrantClient(
@@ -30,6 +52,20 @@ class QdrantService:
         )
         logger.info(f"Connected to Qdrant at {settings.QDRANT_HOST}:{settings.QDRANT_PORT}")
     
+    def quantization_config(self, vector_size: int) -> QuantizationConfig:
+        """Binary quantization for >= 1024-d embeddings, int8 scalar otherwise"""
+        if vector_size >= self.BINARY_QUANTIZATION_MIN_DIM:
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=True)
+            )
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    
     def create_collections(self, vector_size: int = 384):
         """
         Create all collections if they don't exist
@@ -44,11 +80,12 @@ class QdrantService:
             self.COLLECTION_QA
         ]
         
+        quantization_config = self.quantization_config(vector_size)
+        
         for collection_name in collections:
             try:
                 # Check if collection exists
-                self.client.get_collection(collection_name)
-                logger.info(f"Collection '{collection_name}' already exists")
+                info = self.client.get_collection(collection_name)
             except Exception:
                 # Create collection
                 self.client.create_collection(
@@ -56,9 +93,21 @@ class QdrantService:
                     vectors_config=VectorParams(
                         size=vector_size,
                         distance=Distance.COSINE
-                    )
+                    ),
+                    quantization_config=quantization_config
                 )
                 logger.info(f"✨ Created collection '{collection_name}'")
+                continue
+            
+            logger.info(f"Collection '{collection_name}' already exists")
+            
+            # Collections created before quantization was enabled
+            if info.config.quantization_config is None:
+                self.client.update_collection(
+                    collection_name=collection_name,
+                    quantization_config=quantization_config
+                )
+                logger.info(f"Enabled quantization on '{collection_name}'")
     
     def delete_collection(self, collection_name: str):
         """Delete a collection"""
@@ -168,6 +217,78 @@ class QdrantService:
         )
         logger.info(f"Stored Q&A: {payload.get('question', 'Unknown')[:50]}...")
     
+    def upsert_many(
+        self,
+        collection_name: str,
+        vectors: List[List[float]],
+        payloads: List[Dict],
+        ids: Optional[List[str]] = None
+    ):
+        """Store many embeddings in a single request (random IDs unless given)"""
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in vectors]
+        
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vector,
+                payload=payload
+            )
+            for point_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        
+        if not points:
+            return
+        
+        self.client.upsert(
+            collection_name=collection_name,
+            points=points
+        )
+        logger.info(f"Stored {len(points)} points in '{collection_name}'")
+    
+    def get_content_hashes(self, collection_name: str, kb_id: int) -> Dict[Optional[str], List[str]]:
+        """
+        Map content_hash -> point IDs stored for a knowledge base
+        (points indexed before content hashing are grouped under None)
+        """
+        hashes: Dict[Optional[str], List[str]] = {}
+        offset = None
+        
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="kb_id",
+                            match=MatchValue(value=kb_id)
+                        )
+                    ]
+                ),
+                with_payload=["content_hash"],
+                with_vectors=False,
+                limit=256,
+                offset=offset
+            )
+            
+            for point in points:
+                content_hash = (point.payload or {}).get("content_hash")
+                hashes.setdefault(content_hash, []).append(str(point.id))
+            
+            if offset is None:
+                return hashes
+    
+    def delete_points(self, collection_name: str, point_ids: List[str]):
+        """Delete points by ID"""
+        if not point_ids:
+            return
+        
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=point_ids)
+        )
+        logger.info(f"Deleted {len(point_ids)} points from '{collection_name}'")
+    
     def search_experiences(
         self,
         query_vector: List[float],
@@ -196,11 +317,13 @@ class QdrantService:
                     )
                 ]
             ),
+            search_params=self.SEARCH_PARAMS,
             limit=limit
         ).points
         
         return [
             {
+                "id": str(result.id),
                 "score": result.score,
                 "payload": result.payload
             }
@@ -225,11 +348,13 @@ class QdrantService:
                     )
                 ]
             ),
+            search_params=self.SEARCH_PARAMS,
             limit=limit
         ).points
         
         return [
             {
+                "id": str(result.id),
                 "score": result.score,
                 "payload": result.payload
             }
@@ -254,11 +379,13 @@ class QdrantService:
                     )
                 ]
             ),
+            search_params=self.SEARCH_PARAMS,
             limit=limit
         ).points
         
         return [
             {
+                "id": str(result.id),
                 "score": result.score,
                 "payload": result.payload
             }
@@ -283,11 +410,13 @@ class QdrantService:
                     )
                 ]
             ),
+            search_params=self.SEARCH_PARAMS,
             limit=limit
         ).points
         
         return [
             {
+                "id": str(result.id),
                 "score": result.score,
                 "payload": result.payload
             }
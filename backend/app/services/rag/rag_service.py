@@ -1,85 +1,204 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
 from app.services.embeddings.embedding_service import get_embedding_service
-from app.services.qdrant.qdrant_service import get_qdrant_service
+from app.services.qdrant.qdrant_service import QdrantService, get_qdrant_service
+
+
+# Questions mentioning these benefit from retrieved profile context
+RETRIEVAL_KEYWORDS = re.compile(
+    r"experience|project|skill|tell me about|describe|what.*did you",
+    re.IGNORECASE
+)
+
+# Questions shorter than this (in words) without a keyword are answered without retrieval
+MIN_RETRIEVAL_WORDS = 5
 
 
 class RAGService:
     """Retrieval Augmented Generation Service"""
     
+    # One worker per collection written during indexing
+    MAX_CONCURRENT_UPSERTS = 4
+    
+    # Collection searches in flight across concurrent retrievals (4 per retrieval)
+    MAX_CONCURRENT_SEARCHES = 16
+    
     def __init__(self):
         self.embedding_service = get_embedding_service()
         self.qdrant_service = get_qdrant_service()
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_UPSERTS)
+        self.search_executor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_SEARCHES)
     
-    def index_knowledge_base(self, kb_id: int, knowledge_base: Dict):
+    def index_knowledge_base(self, kb_id: int, knowledge_base: Dict) -> Dict[str, int]:
         """
-        Index entire knowledge base into Qdrant
+        Index knowledge base into Qdrant, embedding only what changed
+        Every item is stored with a hash of its content. Items whose hash is already
+        indexed are skipped, new ones are embedded in one batched call, and points
+        whose content no longer exists are deleted.
         
         Args:
             kb_id: Knowledge base ID
             knowledge_base: Dict with work_experience, projects, skills, qa_pairs
+            
+        Returns:
+            Dict with number of embedded and deleted points
+            
+        Raises:
+            RuntimeError: if any collection failed to upsert or delete (after
+            every write has finished, so the index is never left half-written
+            without the caller knowing)
         """
         logger.info(f"Indexing knowledge base {kb_id}...")
         
-        # 1. Index work experiences
         work_experiences = knowledge_base.get('work_experience', [])
+        projects = knowledge_base.get('projects', [])
+        skills = knowledge_base.get('skills', [])
+        qa_pairs = knowledge_base.get('qa_pairs', {})
+        
+        # (collection, content, extra payload, text) for every item in the knowledge base
+        items: List[Tuple[str, Dict, Dict, str]] = []
+        
+        # 1. Work experiences
         for idx, exp in enumerate(work_experiences):
-            try:
-                vector = self.embedding_service.encode_work_experience(exp)
-                self.qdrant_service.upsert_work_experience(
-                    kb_id=kb_id,
-                    experience_id=f"exp_{idx}",
-                    vector=vector,
-                    payload=exp
-                )
-            except Exception as e:
-                logger.error(f"Error indexing experience {idx}: {e}")
+            items.append((
+                QdrantService.COLLECTION_EXPERIENCES,
+                exp,
+                {"experience_id": f"exp_{idx}", "type": "work_experience"},
+                self.embedding_service.work_experience_text(exp)
+            ))
         
-        # 2. Index projects
-        projects = knowledge_base.get('projects', [])
+        # 2. Projects
         for idx, proj in enumerate(projects):
-            try:
-                vector = self.embedding_service.encode_project(proj)
-                self.qdrant_service.upsert_project(
-                    kb_id=kb_id,
-                    project_id=f"proj_{idx}",
-                    vector=vector,
-                    payload=proj
-                )
-            except Exception as e:
-                logger.error(f"Error indexing project {idx}: {e}")
+            items.append((
+                QdrantService.COLLECTION_PROJECTS,
+                proj,
+                {"project_id": f"proj_{idx}", "type": "project"},
+                self.embedding_service.project_text(proj)
+            ))
         
-        # 3. Index skills
-        skills = knowledge_base.get('skills', [])
+        # 3. Skills
         for idx, skill in enumerate(skills):
-            try:
-                vector = self.embedding_service.encode_skill(skill)
-                skill_payload = {"skill": skill} if isinstance(skill, str) else skill
-                self.qdrant_service.upsert_skill(
-                    kb_id=kb_id,
-                    skill_id=f"skill_{idx}",
-                    vector=vector,
-                    payload=skill_payload
-                )
-            except Exception as e:
-                logger.error(f"Error indexing skill {idx}: {e}")
+            skill_payload = {"skill": skill} if isinstance(skill, str) else skill
+            items.append((
+                QdrantService.COLLECTION_SKILLS,
+                skill_payload,
+                {"skill_id": f"skill_{idx}", "type": "skill"},
+                self.embedding_service.skill_text(skill)
+            ))
         
-        # 4. Index Q&A pairs
-        qa_pairs = knowledge_base.get('qa_pairs', {})
+        # 4. Q&A pairs
         for idx, (question, answer) in enumerate(qa_pairs.items()):
+            items.append((
+                QdrantService.COLLECTION_QA,
+                {"question": question, "answer": answer},
+                {"qa_id": f"qa_{idx}", "type": "qa"},
+                self.embedding_service.qa_pair_text(question, answer)
+            ))
+        
+        # Content hashes already stored, per collection (fetched concurrently)
+        collections = [
+            QdrantService.COLLECTION_EXPERIENCES,
+            QdrantService.COLLECTION_PROJECTS,
+            QdrantService.COLLECTION_SKILLS,
+            QdrantService.COLLECTION_QA
+        ]
+        hash_futures = {
+            collection: self.executor.submit(self.qdrant_service.get_content_hashes, collection, kb_id)
+            for collection in collections
+        }
+        existing = {collection: future.result() for collection, future in hash_futures.items()}
+        
+        # Keep unchanged items, collect new ones (identical items are indexed once)
+        wanted: Dict[str, set] = {collection: set() for collection in collections}
+        new_items: List[Tuple[str, str, Dict, str]] = []
+        for collection, content, extra, text in items:
+            content_hash = self.content_hash(content)
+            if content_hash in wanted[collection]:
+                continue
+            wanted[collection].add(content_hash)
+            
+            if content_hash not in existing[collection]:
+                payload = {**content, "kb_id": kb_id, **extra, "content_hash": content_hash}
+                new_items.append((collection, content_hash, payload, text))
+        
+        # Points whose content is gone, duplicates, and points indexed before hashing
+        stale: Dict[str, List[str]] = {}
+        for collection, hashes in existing.items():
+            for content_hash, point_ids in hashes.items():
+                keep = 1 if content_hash in wanted[collection] else 0
+                if len(point_ids) > keep:
+                    stale.setdefault(collection, []).extend(point_ids[keep:])
+        
+        # Single batched embedding call for every new item
+        grouped: Dict[str, Tuple[List, List, List]] = {}
+        if new_items:
+            vectors = self.embedding_service.encode([text for _, _, _, text in new_items])
+            
+            # Group by collection so each collection gets one upsert
+            for (collection, content_hash, payload, _), vector in zip(new_items, vectors):
+                collection_ids, collection_vectors, collection_payloads = grouped.setdefault(collection, ([], [], []))
+                collection_ids.append(self.point_id(collection, kb_id, content_hash))
+                collection_vectors.append(vector)
+                collection_payloads.append(payload)
+        
+        # Write collections concurrently instead of paying one Qdrant round-trip after another
+        futures = {
+            f"upsert:{collection}": self.executor.submit(
+                self.qdrant_service.upsert_many,
+                collection,
+                collection_vectors,
+                collection_payloads,
+                collection_ids
+            )
+            for collection, (collection_ids, collection_vectors, collection_payloads) in grouped.items()
+        }
+        futures.update({
+            f"delete:{collection}": self.executor.submit(
+                self.qdrant_service.delete_points,
+                collection,
+                point_ids
+            )
+            for collection, point_ids in stale.items()
+        })
+        
+        failed = []
+        for operation, future in futures.items():
             try:
-                vector = self.embedding_service.encode_qa_pair(question, answer)
-                self.qdrant_service.upsert_qa_pair(
-                    kb_id=kb_id,
-                    qa_id=f"qa_{idx}",
-                    vector=vector,
-                    payload={"question": question, "answer": answer}
-                )
+                future.result()
             except Exception as e:
-                logger.error(f"Error indexing Q&A {idx}: {e}")
+                logger.error(f"Error indexing ({operation}): {e}")
+                failed.append(operation)
         
-        logger.info(f"Indexed {len(work_experiences)} experiences, {len(projects)} projects, {len(skills)} skills, {len(qa_pairs)} Q&As")
+        if failed:
+            raise RuntimeError(f"Indexing knowledge base {kb_id} failed: {', '.join(failed)}")
+        
+        changes = {
+            "embedded": len(new_items),
+            "deleted": sum(len(point_ids) for point_ids in stale.values())
+        }
+        logger.info(
+            f"Indexed knowledge base {kb_id} ({len(work_experiences)} experiences, {len(projects)} projects, "
+            f"{len(skills)} skills, {len(qa_pairs)} Q&As): "
+            f"{changes['embedded']} embedded, {changes['deleted']} deleted"
+        )
+        return changes
+    
+    @staticmethod
+    def content_hash(content: Dict) -> str:
+        """Stable hash of an item's indexed content"""
+        raw = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def point_id(collection: str, kb_id: int, content_hash: str) -> str:
+        """Deterministic point ID, so re-upserting the same content never duplicates it"""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{collection}/{kb_id}/{content_hash}"))
     
     def retrieve_relevant_context(
         self,
@@ -87,7 +206,8 @@ class RAGService:
         kb_id: int,
         max_experiences: int = 3,
         max_projects: int = 2,
-        max_skills: int = 5
+        max_skills: int = 5,
+        query_vector: Optional[List[float]] = None
     ) -> Dict:
         """
         Retrieve relevant context for answering a question
@@ -98,6 +218,7 @@ class RAGService:
             max_experiences: Max work experiences to retrieve
             max_projects: Max projects to retrieve
             max_skills: Max skills to retrieve
+            query_vector: Precomputed embedding of the question (skips re-encoding)
             
         Returns:
             Dict with relevant experiences, projects, skills
@@ -105,32 +226,26 @@ class RAGService:
         logger.info(f"Retrieving context for: {question[:50]}...")
         
         # Generate query embedding
-        query_vector = self.embedding_service.encode(question)
+        if query_vector is None:
+            query_vector = self.embedding_service.encode(question)
         
-        # Search across collections
-        experiences = self.qdrant_service.search_experiences(
-            query_vector=query_vector,
-            kb_id=kb_id,
-            limit=max_experiences
-        )
-        
-        projects = self.qdrant_service.search_projects(
-            query_vector=query_vector,
-            kb_id=kb_id,
-            limit=max_projects
-        )
-        
-        skills = self.qdrant_service.search_skills(
-            query_vector=query_vector,
-            kb_id=kb_id,
-            limit=max_skills
-        )
+        # Search across collections concurrently (one Qdrant round-trip of latency
+        # instead of four; the collections are separate so search_batch can't span them)
+        searches = {
+            "experiences": (self.qdrant_service.search_experiences, max_experiences),
+            "projects": (self.qdrant_service.search_projects, max_projects),
+            "skills": (self.qdrant_service.search_skills, max_skills),
+            "qa_pairs": (self.qdrant_service.search_qa_pairs, 2),
+        }
+        futures = {
+            section: self.search_executor.submit(search, query_vector=query_vector, kb_id=kb_id, limit=limit)
+            for section, (search, limit) in searches.items()
+        }
         
-        qa_pairs = self.qdrant_service.search_qa_pairs(
-            query_vector=query_vector,
-            kb_id=kb_id,
-            limit=2
-        )
+        experiences = futures["experiences"].result()
+        projects = futures["projects"].result()
+        skills = futures["skills"].result()
+        qa_pairs = futures["qa_pairs"].result()
         
         logger.info(f"Retrieved {len(experiences)} experiences, {len(projects)} projects, {len(skills)} skills, {len(qa_pairs)} Q&As")
         
@@ -141,6 +256,31 @@ class RAGService:
             "qa_pairs": qa_pairs
         }
     
+    @staticmethod
+    def should_retrieve(question: str) -> bool:
+        """
+        Cheap router: whether retrieval is worth its latency for this question.
+        Greetings and short factual questions ("what's your name?") skip it.
+        """
+        if RETRIEVAL_KEYWORDS.search(question):
+            return True
+        return len(question.split()) >= MIN_RETRIEVAL_WORDS
+    
+    @staticmethod
+    def new_embedding_version(kb_id: int) -> str:
+        """Fresh embedding_id for a (re-)index; anything stamped with the old one is stale"""
+        return f"indexed_{kb_id}_{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def chunk_ids(retrieved_context: Dict) -> List[str]:
+        """Qdrant point IDs of everything returned by retrieve_relevant_context"""
+        return [
+            item["id"]
+            for section in ("experiences", "projects", "skills", "qa_pairs")
+            for item in retrieved_context.get(section, [])
+            if "id" in item
+        ]
+    
     def build_context_string(self, retrieved_context: Dict) -> str:
         """
         Build a context string from retrieved items for LLM
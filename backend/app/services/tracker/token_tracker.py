@@ -2,25 +2,55 @@
 Token Tracking Service
 Handles token counting and usage tracking for all AI operations
 """
+import asyncio
 import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, text, union_all, literal_column, lambda_stmt, Subquery
 from loguru import logger
 
-from app.models.token_usage import TokenUsage
+from app.db.session import async_session
+from app.models.token_usage import TokenUsage, TokenUsageText, token_usage_daily
+from app.services.cache.usage_stats_cache import usage_stats_cache
+from app.services.cache.token_budget_cache import token_budget_cache
 from app.schemas.token_usage import (
     TokenUsageCreate,
+    TokenUsageResponse,
     TokenUsageStats,
     TokenUsageFilter,
-    TokenUsageAlert
+    TokenUsageAlert,
+    utc_now
 )
 
 
+# Columns served by /recent (never the prompt/completion text)
+RECENT_USAGE_COLUMNS = [getattr(TokenUsage, name) for name in TokenUsageResponse.model_fields]
+
+# Records queued by queue_usage_record and written by write_usage_records
+USAGE_QUEUE_SIZE = 10_000
+USAGE_BATCH_SIZE = 100
+# Queued as (record, times requeued after failed writes)
+_usage_queue: "asyncio.Queue[Tuple[TokenUsage, int]]" = asyncio.Queue(maxsize=USAGE_QUEUE_SIZE)
+
+# Seconds to wait before each retry of a failed batch write
+USAGE_WRITE_RETRY_DELAYS = (1, 5)
+
+# A record that still can't be written on its own is requeued at most this
+# often before it is dropped
+USAGE_MAX_REQUEUES = 3
+
+# Batch write the writer is in the middle of (awaited on shutdown)
+_usage_batch_task: Optional["asyncio.Task[None]"] = None
+
+
 class TokenTracker:
     """Service for tracking token usage"""
     
+    # Set once token_usage_daily has been refreshed by this process; until then
+    # (or if the view was never created) every aggregate reads token_usage only
+    daily_view_ready = False
+    
     @staticmethod
     def estimate_tokens(text: str) -> int:
         """
@@ -38,8 +68,7 @@ class TokenTracker:
         return len(text) // 4
     
     @staticmethod
-    async def create_usage_record(
-        db: AsyncSession,
+    def build_usage_record(
         user_id: int,
         operation_type: str,
         prompt: str,
@@ -53,13 +82,13 @@ class TokenTracker:
         response_time_ms: Optional[float] = None,
         success: bool = True,
         error_message: Optional[str] = None,
-        extra_metadata: Optional[Dict[str, Any]] = None
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        completion_tokens: Optional[int] = None
     ) -> TokenUsage:
         """
-        Create a token usage record.
+        Build a token usage record (not yet added to any session).
         
         Args:
-            db: Database session
             user_id: User ID
             operation_type: Type of operation (chat, rag_answer, cover_letter, etc.)
             prompt: The prompt text sent to AI
@@ -74,60 +103,100 @@ class TokenTracker:
             success: Whether operation succeeded
             error_message: Error message if failed
             metadata: Additional metadata
+            completion_tokens: Generated token count reported by the model
+                (estimated from completion when not given)
             
         Returns:
             TokenUsage object
         """
-        try:
-            # Estimate token counts
-            prompt_tokens = TokenTracker.estimate_tokens(prompt)
+        # Estimate token counts. The prompt is always estimated: Ollama only
+        # reports the prompt tokens it didn't serve from its prompt cache
+        prompt_tokens = TokenTracker.estimate_tokens(prompt)
+        if completion_tokens is None:
             completion_tokens = TokenTracker.estimate_tokens(completion)
-            total_tokens = prompt_tokens + completion_tokens
-            
-            # Calculate cost (example rates - adjust based on your model)
-            # Ollama is free, but tracking for future paid APIs
-            cost_per_1k_tokens = 0.0  # $0 for Ollama
-            estimated_cost = (total_tokens / 1000) * cost_per_1k_tokens
-            
-            # Create record
-            usage = TokenUsage(
-                user_id=user_id,
-                job_id=job_id,
-                application_id=application_id,
-                operation_type=operation_type,
-                endpoint=endpoint,
-                model_name=model_name,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
+        total_tokens = prompt_tokens + completion_tokens
+        
+        # Calculate cost (example rates - adjust based on your model)
+        # Ollama is free, but tracking for future paid APIs
+        cost_per_1k_tokens = 0.0  # $0 for Ollama
+        estimated_cost = (total_tokens / 1000) * cost_per_1k_tokens
+        
+        return TokenUsage(
+            user_id=user_id,
+            job_id=job_id,
+            application_id=application_id,
+            operation_type=operation_type,
+            endpoint=endpoint,
+            model_name=model_name,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            rag_used=rag_used,
+            rag_chunks_retrieved=rag_chunks,
+            context_length=len(prompt),
+            response_time_ms=response_time_ms,
+            success=success,
+            error_message=error_message,
+            estimated_cost=estimated_cost,
+            extra_metadata=extra_metadata,
+            # The time of the call, not of the (possibly queued) insert
+            created_at=datetime.utcnow(),
+            # Inserted alongside, in the same transaction
+            usage_text=TokenUsageText(
                 prompt_text=prompt[:5000],  # Store first 5000 chars
-                completion_text=completion[:5000], 
-                rag_used='true' if rag_used else 'false',
-                rag_chunks_retrieved=rag_chunks,
-                context_length=len(prompt),
-                response_time_ms=response_time_ms,
-                success='true' if success else 'false',
-                error_message=error_message,
-                estimated_cost=estimated_cost,
-                extra_metadata=extra_metadata
+                completion_text=completion[:5000]
             )
+        )
+    
+    @staticmethod
+    async def create_usage_record(db: AsyncSession, **usage) -> TokenUsage:
+        """
+        Create a token usage record right away (fields as for build_usage_record).
+        
+        Returns:
+            TokenUsage object
+        """
+        try:
+            record = TokenTracker.build_usage_record(**usage)
             
-            db.add(usage)
+            db.add(record)
             await db.commit()
-            await db.refresh(usage)
+            await db.refresh(record)
+            
+            # Today's / this month's cached stats no longer include this record
+            await usage_stats_cache.invalidate(record.user_id)
+            await token_budget_cache.add_tokens(record.user_id, record.total_tokens)
             
             logger.info(
-                f"Token usage tracked: {operation_type} - "
-                f"{total_tokens} tokens ({prompt_tokens} prompt + {completion_tokens} completion)"
+                f"Token usage tracked: {record.operation_type} - "
+                f"{record.total_tokens} tokens ({record.prompt_tokens} prompt + {record.completion_tokens} completion)"
             )
             
-            return usage
+            return record
             
         except Exception as e:
             logger.error(f"Error creating token usage record: {e}")
             await db.rollback()
             raise
     
+    @staticmethod
+    def queue_usage_record(**usage):
+        """
+        Queue a token usage record for the background writer (fields as for
+        build_usage_record). Never waits or raises: when the queue is full (the
+        database has been unreachable for USAGE_QUEUE_SIZE records) the record
+        is dropped rather than letting memory grow without bound.
+        """
+        try:
+            _usage_queue.put_nowait((TokenTracker.build_usage_record(**usage), 0))
+        except asyncio.QueueFull:
+            logger.error(
+                f"Token usage queue full, dropping {usage.get('operation_type')} record "
+                f"of user {usage.get('user_id')}"
+            )
+        except Exception as e:
+            logger.error(f"Error queueing token usage record: {e}")
+    
     @staticmethod
     async def get_usage_stats(
         db: AsyncSession,
@@ -162,11 +231,9 @@ class TokenTracker:
             if filters.end_date:
                 conditions.append(TokenUsage.created_at <= filters.end_date)
             if filters.success is not None:
-                success_str = 'true' if filters.success else 'false'
-                conditions.append(TokenUsage.success == success_str)
+                conditions.append(TokenUsage.success.is_(filters.success))
             if filters.rag_used is not None:
-                rag_str = 'true' if filters.rag_used else 'false'
-                conditions.append(TokenUsage.rag_used == rag_str)
+                conditions.append(TokenUsage.rag_used.is_(filters.rag_used))
             
             if conditions:
                 query = query.where(and_(*conditions))
@@ -207,11 +274,11 @@ class TokenTracker:
                 tokens_by_type[op_type] = tokens_by_type.get(op_type, 0) + record.total_tokens
             
             # RAG statistics
-            rag_operations = sum(1 for r in records if r.rag_used == 'true')
+            rag_operations = sum(1 for r in records if r.rag_used)
             non_rag_operations = total_operations - rag_operations
             
             # Success rate
-            successful_operations = sum(1 for r in records if r.success == 'true')
+            successful_operations = sum(1 for r in records if r.success)
             success_rate = (successful_operations / total_operations * 100) if total_operations > 0 else 0.0
             
             # Average response time
@@ -237,6 +304,224 @@ class TokenTracker:
             logger.error(f"Error getting usage stats: {e}")
             raise
     
+    @staticmethod
+    def daily_usage_rows(user_id: int, start_day: Optional[datetime] = None) -> Subquery:
+        """
+        Per day and operation totals for a user: complete days come from the
+        token_usage_daily rollup, anything newer than the rollup from token_usage.
+        
+        Args:
+            user_id: User ID
+            start_day: First day to include (midnight UTC, optional)
+            
+        Returns:
+            Subquery with the token_usage_daily columns (minus user_id)
+        """
+        daily = token_usage_daily.c
+        
+        # First day the rollup doesn't cover yet
+        rolled_up_until = select(
+            func.coalesce(
+                func.max(daily.day) + literal_column("interval '1 day'"),
+                literal_column("'-infinity'::timestamp")
+            )
+        ).scalar_subquery()
+        
+        rolled_up = select(
+            daily.day,
+            daily.operation_type,
+            daily.operations,
+            daily.rag_operations,
+            daily.successful_operations,
+            daily.total_tokens,
+            daily.prompt_tokens,
+            daily.completion_tokens,
+            daily.total_cost,
+            daily.response_time_ms_sum,
+            daily.response_time_ms_count
+        ).where(daily.user_id == user_id)
+        
+        day = func.date_trunc(literal_column("'day'"), TokenUsage.created_at)
+        recent = select(
+            day,
+            TokenUsage.operation_type,
+            func.count(),
+            func.count().filter(TokenUsage.rag_used),
+            func.count().filter(TokenUsage.success),
+            func.sum(TokenUsage.total_tokens),
+            func.sum(TokenUsage.prompt_tokens),
+            func.sum(TokenUsage.completion_tokens),
+            func.coalesce(func.sum(TokenUsage.estimated_cost), 0.0),
+            func.sum(TokenUsage.response_time_ms),
+            func.count(TokenUsage.response_time_ms)
+        ).where(
+            and_(
+                TokenUsage.user_id == user_id,
+                TokenUsage.created_at >= rolled_up_until
+            )
+        ).group_by(day, TokenUsage.operation_type)
+        
+        if start_day:
+            rolled_up = rolled_up.where(daily.day >= start_day)
+            recent = recent.where(TokenUsage.created_at >= start_day)
+        
+        return union_all(rolled_up, recent).subquery("daily_usage")
+    
+    @staticmethod
+    async def get_usage_stats_since(
+        db: AsyncSession,
+        user_id: int,
+        start_day: datetime
+    ) -> TokenUsageStats:
+        """
+        Same statistics as get_usage_stats for a user from start_day (midnight UTC)
+        onwards, aggregated from daily_usage_rows instead of every raw record.
+        """
+        try:
+            rows = TokenTracker.daily_usage_rows(user_id, start_day)
+            query = select(
+                rows.c.operation_type,
+                func.sum(rows.c.operations),
+                func.sum(rows.c.rag_operations),
+                func.sum(rows.c.successful_operations),
+                func.sum(rows.c.total_tokens),
+                func.sum(rows.c.prompt_tokens),
+                func.sum(rows.c.completion_tokens),
+                func.sum(rows.c.total_cost),
+                func.sum(rows.c.response_time_ms_sum),
+                func.sum(rows.c.response_time_ms_count)
+            ).group_by(rows.c.operation_type)
+            
+            result = await db.execute(query)
+            
+            # Fold the per-operation rows into overall totals (a handful of rows)
+            operations_by_type: Dict[str, int] = {}
+            tokens_by_type: Dict[str, int] = {}
+            total_operations = rag_operations = successful_operations = 0
+            total_tokens = total_prompt_tokens = total_completion_tokens = 0
+            total_cost = 0.0
+            response_time_sum = 0.0
+            response_time_count = 0
+            for (op_type, operations, rag, successful, tokens, prompt_tokens,
+                 completion_tokens, cost, rt_sum, rt_count) in result.all():
+                operations_by_type[op_type] = int(operations)
+                tokens_by_type[op_type] = int(tokens or 0)
+                total_operations += int(operations)
+                rag_operations += int(rag)
+                successful_operations += int(successful)
+                total_tokens += int(tokens or 0)
+                total_prompt_tokens += int(prompt_tokens or 0)
+                total_completion_tokens += int(completion_tokens or 0)
+                total_cost += float(cost or 0.0)
+                response_time_sum += float(rt_sum or 0.0)
+                response_time_count += int(rt_count)
+            
+            return TokenUsageStats(
+                total_tokens=total_tokens,
+                total_operations=total_operations,
+                avg_tokens_per_operation=total_tokens / total_operations if total_operations > 0 else 0.0,
+                total_prompt_tokens=total_prompt_tokens,
+                total_completion_tokens=total_completion_tokens,
+                total_cost=total_cost,
+                operations_by_type=operations_by_type,
+                tokens_by_type=tokens_by_type,
+                rag_operations=rag_operations,
+                non_rag_operations=total_operations - rag_operations,
+                success_rate=(successful_operations / total_operations * 100) if total_operations > 0 else 0.0,
+                avg_response_time_ms=response_time_sum / response_time_count if response_time_count else None
+            )
+            
+        except Exception as e:
+            logger.error(f"Error getting usage stats: {e}")
+            raise
+    
+    @staticmethod
+    async def get_rag_split_stats(
+        db: AsyncSession,
+        user_id: int,
+        operation_type: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        RAG vs non-RAG usage in a single query (conditional aggregation).
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            operation_type: Filter by operation type (optional)
+            
+        Returns:
+            Dict with "rag" and "non_rag" buckets of count, total_tokens,
+            avg_tokens and avg_response_time_ms
+        """
+        try:
+            buckets = {
+                "rag": TokenUsage.rag_used.is_(True),
+                "non_rag": TokenUsage.rag_used.is_(False)
+            }
+            
+            columns = []
+            for condition in buckets.values():
+                columns.extend([
+                    func.count().filter(condition),
+                    func.coalesce(func.sum(TokenUsage.total_tokens).filter(condition), 0),
+                    func.avg(TokenUsage.response_time_ms).filter(condition)
+                ])
+            
+            conditions = [TokenUsage.user_id == user_id]
+            if operation_type:
+                conditions.append(TokenUsage.operation_type == operation_type)
+            
+            result = await db.execute(select(*columns).where(and_(*conditions)))
+            row = result.one()
+            
+            split = {}
+            for idx, bucket in enumerate(buckets):
+                count, total_tokens, avg_response_time_ms = row[idx * 3:idx * 3 + 3]
+                split[bucket] = {
+                    "count": count,
+                    "total_tokens": int(total_tokens),
+                    "avg_tokens": total_tokens / count if count > 0 else 0.0,
+                    "avg_response_time_ms": avg_response_time_ms
+                }
+            
+            return split
+            
+        except Exception as e:
+            logger.error(f"Error getting RAG split stats: {e}")
+            raise
+    
+    @staticmethod
+    async def get_day_and_month_totals(
+        db: AsyncSession,
+        user_id: int
+    ) -> Tuple[int, int]:
+        """
+        Tokens used today and this month (UTC) in a single query.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            
+        Returns:
+            Tuple of (today's tokens, this month's tokens)
+        """
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        month_start = today_start.replace(day=1)
+        
+        # lambda_stmt: built and compiled once, later calls only rebind the values
+        query = lambda_stmt(lambda: select(
+            func.coalesce(func.sum(TokenUsage.total_tokens).filter(TokenUsage.created_at >= today_start), 0),
+            func.coalesce(func.sum(TokenUsage.total_tokens), 0)
+        ).where(
+            and_(
+                TokenUsage.user_id == user_id,
+                TokenUsage.created_at >= month_start
+            )
+        ))
+        result = await db.execute(query)
+        daily_usage, monthly_usage = result.one()
+        return int(daily_usage), int(monthly_usage)
+    
     @staticmethod
     async def check_budget_limits(
         db: AsyncSession,
@@ -258,26 +543,31 @@ class TokenTracker:
         """
         alerts = []
         
+        if not daily_limit and not monthly_limit:
+            return alerts
+        
         try:
+            # Running totals from Redis; summed in Postgres (and cached) on a miss
+            totals = await token_budget_cache.get_totals(user_id)
+            if totals is None:
+                await token_budget_cache.start_seeding(user_id)
+                totals = await TokenTracker.get_day_and_month_totals(db, user_id)
+                await token_budget_cache.set_totals(user_id, *totals)
+            daily_usage, monthly_usage = totals
+            
+            # One timestamp for every alert of this check
+            now = utc_now()
+            
             # Check daily limit
             if daily_limit:
-                today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-                daily_query = select(func.sum(TokenUsage.total_tokens)).where(
-                    and_(
-                        TokenUsage.user_id == user_id,
-                        TokenUsage.created_at >= today_start
-                    )
-                )
-                result = await db.execute(daily_query)
-                daily_usage = result.scalar() or 0
-                
                 if daily_usage >= daily_limit:
                     alerts.append(TokenUsageAlert(
                         alert_type="daily_limit_exceeded",
                         current_usage=daily_usage,
                         limit=daily_limit,
                         percentage=(daily_usage / daily_limit) * 100,
-                        message=f"Daily token limit exceeded: {daily_usage}/{daily_limit} tokens used"
+                        message=f"Daily token limit exceeded: {daily_usage}/{daily_limit} tokens used",
+                        timestamp=now
                     ))
                 elif daily_usage >= daily_limit * 0.8:
                     alerts.append(TokenUsageAlert(
@@ -285,28 +575,20 @@ class TokenTracker:
                         current_usage=daily_usage,
                         limit=daily_limit,
                         percentage=(daily_usage / daily_limit) * 100,
-                        message=f"Approaching daily limit: {daily_usage}/{daily_limit} tokens used"
+                        message=f"Approaching daily limit: {daily_usage}/{daily_limit} tokens used",
+                        timestamp=now
                     ))
             
             # Check monthly limit
             if monthly_limit:
-                month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                monthly_query = select(func.sum(TokenUsage.total_tokens)).where(
-                    and_(
-                        TokenUsage.user_id == user_id,
-                        TokenUsage.created_at >= month_start
-                    )
-                )
-                result = await db.execute(monthly_query)
-                monthly_usage = result.scalar() or 0
-                
                 if monthly_usage >= monthly_limit:
                     alerts.append(TokenUsageAlert(
                         alert_type="monthly_limit_exceeded",
                         current_usage=monthly_usage,
                         limit=monthly_limit,
                         percentage=(monthly_usage / monthly_limit) * 100,
-                        message=f"Monthly token limit exceeded: {monthly_usage}/{monthly_limit} tokens used"
+                        message=f"Monthly token limit exceeded: {monthly_usage}/{monthly_limit} tokens used",
+                        timestamp=now
                     ))
                 elif monthly_usage >= monthly_limit * 0.8:
                     alerts.append(TokenUsageAlert(
@@ -314,7 +596,8 @@ class TokenTracker:
                         current_usage=monthly_usage,
                         limit=monthly_limit,
                         percentage=(monthly_usage / monthly_limit) * 100,
-                        message=f"Approaching monthly limit: {monthly_usage}/{monthly_limit} tokens used"
+                        message=f"Approaching monthly limit: {monthly_usage}/{monthly_limit} tokens used",
+                        timestamp=now
                     ))
             
             return alerts
@@ -328,9 +611,12 @@ class TokenTracker:
         db: AsyncSession,
         user_id: int,
         limit: int = 10
-    ) -> List[TokenUsage]:
+    ) -> List[Dict[str, Any]]:
         """
         Get recent token usage records for a user.
+        Selects only the TokenUsageResponse columns (never the prompt/completion
+        text) and skips ORM instances and pydantic entirely: every column is
+        already JSON-native, so rows go straight to the encoder.
         
         Args:
             db: Database session
@@ -338,22 +624,159 @@ class TokenTracker:
             limit: Number of records to return
             
         Returns:
-            List of TokenUsage objects
+            List of dicts shaped like TokenUsageResponse
         """
         try:
-            query = (
-                select(TokenUsage)
+            query = lambda_stmt(lambda: (
+                select(*RECENT_USAGE_COLUMNS)
                 .where(TokenUsage.user_id == user_id)
                 .order_by(TokenUsage.created_at.desc())
                 .limit(limit)
-            )
+            ))
             result = await db.execute(query)
-            return result.scalars().all()
+            return [dict(row) for row in result.mappings()]
         except Exception as e:
             logger.error(f"Error getting recent usage: {e}")
             raise
 
 
+async def refresh_daily_usage_view(delay_seconds: int):
+    """
+    Keep token_usage_daily current. The view only holds complete UTC days, so it
+    changes once a day: refresh it now unless it already includes yesterday, then
+    once per day delay_seconds after UTC midnight. CONCURRENTLY keeps the view
+    readable while it is rebuilt. Runs for the app's lifetime; a failed refresh
+    (e.g. the migration was never applied) switches the dashboards back to
+    token_usage and is retried after delay_seconds.
+    """
+    while True:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            async with async_session() as db:
+                latest_day = (await db.execute(text("SELECT max(day) FROM token_usage_daily"))).scalar()
+                if latest_day is None or latest_day < today - timedelta(days=1):
+                    # Rebuilding the rollup may legitimately outlast DB_STATEMENT_TIMEOUT_MS
+                    await db.execute(text("SET LOCAL statement_timeout = 0"))
+                    await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY token_usage_daily"))
+                    await db.commit()
+                    logger.info("Refreshed token_usage_daily")
+            TokenTracker.daily_view_ready = True
+        except Exception as e:
+            TokenTracker.daily_view_ready = False
+            logger.warning(f"Could not refresh token_usage_daily: {e}")
+            await asyncio.sleep(delay_seconds)
+            continue
+        
+        next_refresh = today + timedelta(days=1, seconds=delay_seconds)
+        await asyncio.sleep(max((next_refresh - datetime.utcnow()).total_seconds(), 0))
+
+
+async def write_usage_records():
+    """
+    Write queued token usage records for the app's lifetime, up to
+    USAGE_BATCH_SIZE per transaction
+    """
+    global _usage_batch_task
+    
+    while True:
+        batch = [await _usage_queue.get()]
+        while len(batch) < USAGE_BATCH_SIZE and not _usage_queue.empty():
+            batch.append(_usage_queue.get_nowait())
+        
+        # A batch already taken off the queue is finished even if shutdown
+        # cancels us; flush_usage_records waits for it
+        _usage_batch_task = asyncio.ensure_future(_write_usage_batch(batch, requeue=True))
+        await asyncio.shield(_usage_batch_task)
+
+
+async def flush_usage_records():
+    """Finish the batch being written, then write whatever is still queued (called on app shutdown)"""
+    if _usage_batch_task is not None and not _usage_batch_task.done():
+        await _usage_batch_task
+    
+    while not _usage_queue.empty():
+        batch = []
+        while len(batch) < USAGE_BATCH_SIZE and not _usage_queue.empty():
+            batch.append(_usage_queue.get_nowait())
+        await _write_usage_batch(batch)
+
+
+async def _write_usage_batch(batch: List[Tuple[TokenUsage, int]], requeue: bool = False):
+    """
+    Insert a batch in one transaction, retrying after each of
+    USAGE_WRITE_RETRY_DELAYS. If every attempt fails the records are written one
+    by one, so a record that can never be written (FK violation, missing
+    partition...) only takes itself down. Records failing on their own go back
+    on the queue if requeue is set (at most USAGE_MAX_REQUEUES times), otherwise
+    they are dropped and logged.
+    """
+    # Read before the commit expires the instances
+    usage = [(record.user_id, record.total_tokens) for record, _ in batch]
+    
+    for retry_delay in (*USAGE_WRITE_RETRY_DELAYS, None):
+        if await _insert_usage_records([record for record, _ in batch]):
+            written = usage
+            break
+        if retry_delay is None:
+            written = await _write_usage_records_one_by_one(batch, usage, requeue)
+            break
+        await asyncio.sleep(retry_delay)
+    
+    tokens_by_user: Dict[int, int] = {}
+    for user_id, tokens in written:
+        tokens_by_user[user_id] = tokens_by_user.get(user_id, 0) + tokens
+    
+    # Today's / this month's cached stats no longer include these records
+    for user_id, tokens in tokens_by_user.items():
+        await usage_stats_cache.invalidate(user_id)
+        await token_budget_cache.add_tokens(user_id, tokens)
+    
+    if written:
+        logger.info(f"Token usage tracked: {len(written)} records, {sum(tokens_by_user.values())} tokens")
+
+
+async def _insert_usage_records(records: List[TokenUsage]) -> bool:
+    """Insert records in one transaction; False (logged) if it failed"""
+    try:
+        async with async_session() as db:
+            db.add_all(records)
+            await db.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error writing {len(records)} token usage records: {e}")
+        return False
+
+
+async def _write_usage_records_one_by_one(
+    batch: List[Tuple[TokenUsage, int]],
+    usage: List[Tuple[int, int]],
+    requeue: bool
+) -> List[Tuple[int, int]]:
+    """Write each record of a failed batch on its own; returns the written records' (user_id, tokens)"""
+    written = []
+    dropped = 0
+    requeued = 0
+    for (record, requeues), record_usage in zip(batch, usage):
+        if await _insert_usage_records([record]):
+            written.append(record_usage)
+            continue
+        
+        if requeue and requeues < USAGE_MAX_REQUEUES:
+            try:
+                _usage_queue.put_nowait((record, requeues + 1))
+                requeued += 1
+                continue
+            except asyncio.QueueFull:
+                pass
+        dropped += 1
+    
+    if requeued:
+        logger.warning(f"Requeued {requeued} token usage records that could not be written")
+    if dropped:
+        logger.error(f"Dropped {dropped} token usage records that could not be written")
+    return written
+
+
 # Decorator for automatic token tracking
 def track_tokens(operation_type: str):
     """
@@ -234,6 +234,26 @@ ALTER SEQUENCE public.response_evaluations_id_seq OWNER TO postgres;
 ALTER SEQUENCE public.response_evaluations_id_seq OWNED BY public.response_evaluations.id;
 
 
+--
+-- Name: resume_cache; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.resume_cache (
+    hash bytea NOT NULL,
+    parsed_data jsonb NOT NULL,
+    created_at timestamp with time zone DEFAULT now()
+);
+
+
+ALTER TABLE public.resume_cache OWNER TO postgres;
+
+--
+-- Name: TABLE resume_cache; Type: COMMENT; Schema: public; Owner: postgres
+--
+
+COMMENT ON TABLE public.resume_cache IS 'AI resume parses keyed by PDF content hash; re-uploads of the same file skip the LLM';
+
+
 --
 -- Name: token_usage; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -249,18 +269,17 @@ CREATE TABLE public.token_usage (
     prompt_tokens integer DEFAULT 0 NOT NULL,
     completion_tokens integer DEFAULT 0 NOT NULL,
     total_tokens integer DEFAULT 0 NOT NULL,
-    rag_used character varying(10) DEFAULT 'false'::character varying,
+    rag_used boolean DEFAULT false,
     rag_chunks_retrieved integer,
     context_length integer,
     response_time_ms double precision,
-    success character varying(10) DEFAULT 'true'::character varying NOT NULL,
+    success boolean DEFAULT true NOT NULL,
     error_message text,
     estimated_cost double precision DEFAULT 0.0,
     extra_metadata jsonb,
-    created_at timestamp without time zone DEFAULT now() NOT NULL,
-    prompt_text text,
-    completion_text text
-);
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+)
+PARTITION BY RANGE (created_at);
 
 
 ALTER TABLE public.token_usage OWNER TO postgres;
@@ -283,14 +302,14 @@ COMMENT ON COLUMN public.token_usage.operation_type IS 'Type of operation: chat,
 -- Name: COLUMN token_usage.rag_used; Type: COMMENT; Schema: public; Owner: postgres
 --
 
-COMMENT ON COLUMN public.token_usage.rag_used IS 'Whether RAG was used: true/false';
+COMMENT ON COLUMN public.token_usage.rag_used IS 'Whether RAG was used';
 
 
 --
 -- Name: COLUMN token_usage.success; Type: COMMENT; Schema: public; Owner: postgres
 --
 
-COMMENT ON COLUMN public.token_usage.success IS 'Whether operation succeeded: true/false';
+COMMENT ON COLUMN public.token_usage.success IS 'Whether operation succeeded';
 
 
 --
@@ -322,6 +341,54 @@ ALTER SEQUENCE public.token_usage_id_seq OWNER TO postgres;
 ALTER SEQUENCE public.token_usage_id_seq OWNED BY public.token_usage.id;
 
 
+--
+-- Name: token_usage_text; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.token_usage_text (
+    token_usage_id integer NOT NULL,
+    created_at timestamp without time zone NOT NULL,
+    prompt_text text COMPRESSION lz4,
+    completion_text text COMPRESSION lz4
+)
+PARTITION BY RANGE (created_at);
+
+
+ALTER TABLE public.token_usage_text OWNER TO postgres;
+
+--
+-- Name: TABLE token_usage_text; Type: COMMENT; Schema: public; Owner: postgres
+--
+
+COMMENT ON TABLE public.token_usage_text IS 'Prompt/completion text of token_usage records (first 5000 chars), kept apart from the hot telemetry row';
+
+
+--
+-- Name: token_usage_daily; Type: MATERIALIZED VIEW; Schema: public; Owner: postgres
+--
+
+CREATE MATERIALIZED VIEW public.token_usage_daily AS
+ SELECT token_usage.user_id,
+    date_trunc('day'::text, token_usage.created_at) AS day,
+    token_usage.operation_type,
+    count(*) AS operations,
+    count(*) FILTER (WHERE token_usage.rag_used) AS rag_operations,
+    count(*) FILTER (WHERE token_usage.success) AS successful_operations,
+    sum(token_usage.total_tokens) AS total_tokens,
+    sum(token_usage.prompt_tokens) AS prompt_tokens,
+    sum(token_usage.completion_tokens) AS completion_tokens,
+    COALESCE(sum(token_usage.estimated_cost), (0)::double precision) AS total_cost,
+    sum(token_usage.response_time_ms) AS response_time_ms_sum,
+    count(token_usage.response_time_ms) AS response_time_ms_count
+   FROM public.token_usage
+  WHERE (token_usage.created_at < date_trunc('day'::text, (now() AT TIME ZONE 'UTC'::text)))
+  GROUP BY token_usage.user_id, (date_trunc('day'::text, token_usage.created_at)), token_usage.operation_type
+  WITH NO DATA;
+
+
+ALTER MATERIALIZED VIEW public.token_usage_daily OWNER TO postgres;
+
+
 --
 -- Name: users; Type: TABLE; Schema: public; Owner: postgres
 --
@@ -436,12 +503,28 @@ ALTER TABLE ONLY public.response_evaluations
     ADD CONSTRAINT response_evaluations_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: resume_cache resume_cache_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.resume_cache
+    ADD CONSTRAINT resume_cache_pkey PRIMARY KEY (hash);
+
+
 --
 -- Name: token_usage token_usage_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
 
 ALTER TABLE ONLY public.token_usage
-    ADD CONSTRAINT token_usage_pkey PRIMARY KEY (id);
+    ADD CONSTRAINT token_usage_pkey PRIMARY KEY (id, created_at);
+
+
+--
+-- Name: token_usage_text token_usage_text_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.token_usage_text
+    ADD CONSTRAINT token_usage_text_pkey PRIMARY KEY (token_usage_id, created_at);
 
 
 --
@@ -538,10 +621,17 @@ CREATE INDEX idx_token_usage_user_created ON public.token_usage USING btree (use
 
 
 --
--- Name: idx_token_usage_user_id; Type: INDEX; Schema: public; Owner: postgres
+-- Name: idx_token_usage_user_operation_created; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX idx_token_usage_user_operation_created ON public.token_usage USING btree (user_id, operation_type, created_at);
+
+
+--
+-- Name: idx_token_usage_daily_user_day_operation; Type: INDEX; Schema: public; Owner: postgres
 --
 
-CREATE INDEX idx_token_usage_user_id ON public.token_usage USING btree (user_id);
+CREATE UNIQUE INDEX idx_token_usage_daily_user_day_operation ON public.token_usage_daily USING btree (user_id, day, operation_type);
 
 
 --
@@ -576,14 +666,6 @@ ALTER TABLE ONLY public.knowledge_base
     ADD CONSTRAINT knowledge_base_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.users(id);
 
 
---
--- Name: response_evaluations response_evaluations_token_usage_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
---
-
-ALTER TABLE ONLY public.response_evaluations
-    ADD CONSTRAINT response_evaluations_token_usage_id_fkey FOREIGN KEY (token_usage_id) REFERENCES public.token_usage(id) ON DELETE CASCADE;
-
-
 --
 -- Name: response_evaluations response_evaluations_user_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
@@ -616,6 +698,21 @@ ALTER TABLE ONLY public.token_usage
     ADD CONSTRAINT token_usage_user_id_fkey FOREIGN KEY (user_id) REFERENCES public.users(id) ON DELETE CASCADE;
 
 
+--
+-- Name: token_usage_text token_usage_text_token_usage_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.token_usage_text
+    ADD CONSTRAINT token_usage_text_token_usage_id_fkey FOREIGN KEY (token_usage_id, created_at) REFERENCES public.token_usage(id, created_at) ON DELETE CASCADE;
+
+
+--
+-- Name: token_usage_daily; Type: MATERIALIZED VIEW DATA; Schema: public; Owner: postgres
+--
+
+REFRESH MATERIALIZED VIEW public.token_usage_daily;
+
+
 --
 -- PostgreSQL database dump complete
 --
@@ -0,0 +1,10 @@
+-- Resume Parse Cache Table Migration
+
+CREATE TABLE IF NOT EXISTS resume_cache (
+    hash BYTEA PRIMARY KEY,  -- sha256 digest of the uploaded PDF
+    parsed_data JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Comments
+COMMENT ON TABLE resume_cache IS 'AI resume parses keyed by PDF content hash; re-uploads of the same file skip the LLM';
\ No newline at end of file
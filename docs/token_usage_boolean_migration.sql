@@ -0,0 +1,16 @@
+-- Token Usage Boolean Flags Migration
+-- rag_used / success were VARCHAR(10) holding 'true'/'false'
+
+ALTER TABLE token_usage
+    ALTER COLUMN rag_used DROP DEFAULT,
+    ALTER COLUMN rag_used TYPE BOOLEAN USING rag_used::boolean,
+    ALTER COLUMN rag_used SET DEFAULT false;
+
+ALTER TABLE token_usage
+    ALTER COLUMN success DROP DEFAULT,
+    ALTER COLUMN success TYPE BOOLEAN USING success::boolean,
+    ALTER COLUMN success SET DEFAULT true;
+
+-- Comments
+COMMENT ON COLUMN token_usage.rag_used IS 'Whether RAG was used';
+COMMENT ON COLUMN token_usage.success IS 'Whether operation succeeded';
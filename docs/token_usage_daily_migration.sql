@@ -0,0 +1,30 @@
+-- Token Usage Daily Rollup Migration
+-- One row per user, day and operation type for every complete (UTC) day.
+-- The dashboard endpoints read past days from here and only aggregate today's
+-- raw token_usage rows. The API refreshes it in the background once a day, shortly
+-- after UTC midnight (TOKEN_USAGE_DAILY_REFRESH_DELAY_SECONDS), so nothing has to be
+-- scheduled here.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS token_usage_daily AS
+SELECT
+    user_id,
+    date_trunc('day', created_at) AS day,
+    operation_type,
+    count(*) AS operations,
+    count(*) FILTER (WHERE rag_used) AS rag_operations,
+    count(*) FILTER (WHERE success) AS successful_operations,
+    sum(total_tokens) AS total_tokens,
+    sum(prompt_tokens) AS prompt_tokens,
+    sum(completion_tokens) AS completion_tokens,
+    coalesce(sum(estimated_cost), 0) AS total_cost,
+    sum(response_time_ms) AS response_time_ms_sum,
+    count(response_time_ms) AS response_time_ms_count
+FROM token_usage
+-- Today is still being written to; created_at is stored as naive UTC
+WHERE created_at < date_trunc('day', now() AT TIME ZONE 'UTC')
+GROUP BY user_id, date_trunc('day', created_at), operation_type
+WITH DATA;
+
+-- Required by REFRESH MATERIALIZED VIEW CONCURRENTLY (reads are not blocked while it runs)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_token_usage_daily_user_day_operation
+    ON token_usage_daily(user_id, day, operation_type);
@@ -0,0 +1,11 @@
+-- Token Usage Composite Indexes Migration
+-- Run outside a transaction block (CREATE/DROP INDEX CONCURRENTLY)
+
+-- Per-user time windows (recent, daily/monthly stats, timeline, budget checks)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_token_usage_user_created ON token_usage(user_id, created_at DESC);
+
+-- Per-user, per-operation stats (stats/by-operation/rag-comparison filtered by operation_type)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_token_usage_user_operation_created ON token_usage(user_id, operation_type, created_at);
+
+-- user_id alone is the leading column of both composites; the standalone index only costs writes
+DROP INDEX CONCURRENTLY IF EXISTS idx_token_usage_user_id;
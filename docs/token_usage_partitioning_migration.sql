@@ -0,0 +1,95 @@
+-- Token Usage Monthly Partitioning Migration
+-- token_usage and token_usage_text become range-partitioned by month on created_at
+-- (partitions named <table>_yYYYYmMM). Retention (/token-usage/clear-old) then drops
+-- whole months instead of deleting rows, and time-window queries only touch the
+-- partitions they need. The API creates upcoming partitions itself (app/db/partitions.py).
+--
+-- Run after token_usage_text_migration.sql, then re-run token_usage_daily_migration.sql
+-- (the rollup view has to be recreated on the new table).
+-- Copies every row; run in a quiet window.
+
+BEGIN;
+
+DROP MATERIALIZED VIEW IF EXISTS token_usage_daily;
+
+-- A foreign key can't reference the partitioned table's id alone (the primary key has
+-- to include created_at); clear-old removes evaluations of dropped records instead
+ALTER TABLE response_evaluations DROP CONSTRAINT IF EXISTS response_evaluations_token_usage_id_fkey;
+
+ALTER TABLE token_usage RENAME TO token_usage_unpartitioned;
+ALTER TABLE token_usage_text RENAME TO token_usage_text_unpartitioned;
+
+CREATE TABLE token_usage (LIKE token_usage_unpartitioned INCLUDING DEFAULTS INCLUDING COMMENTS)
+    PARTITION BY RANGE (created_at);
+
+CREATE TABLE token_usage_text (
+    token_usage_id INTEGER NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,  -- token_usage's partition key
+    prompt_text TEXT,
+    completion_text TEXT
+) PARTITION BY RANGE (created_at);
+
+-- Monthly partitions from the oldest record up to three months ahead
+DO $$
+DECLARE
+    month_start DATE;
+    last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months')::date;
+BEGIN
+    SELECT date_trunc('month', coalesce(min(created_at), now() AT TIME ZONE 'UTC'))::date
+    INTO month_start
+    FROM token_usage_unpartitioned;
+
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF token_usage FOR VALUES FROM (%L) TO (%L)',
+            'token_usage_' || to_char(month_start, '"y"YYYY"m"MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF token_usage_text FOR VALUES FROM (%L) TO (%L)',
+            'token_usage_text_' || to_char(month_start, '"y"YYYY"m"MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+END $$;
+
+-- Copy the data
+INSERT INTO token_usage SELECT * FROM token_usage_unpartitioned;
+
+INSERT INTO token_usage_text (token_usage_id, created_at, prompt_text, completion_text)
+SELECT t.token_usage_id, u.created_at, t.prompt_text, t.completion_text
+FROM token_usage_text_unpartitioned t
+JOIN token_usage_unpartitioned u ON u.id = t.token_usage_id;
+
+-- Keep the id sequence when the old table goes
+ALTER SEQUENCE token_usage_id_seq OWNED BY token_usage.id;
+
+DROP TABLE token_usage_text_unpartitioned;
+DROP TABLE token_usage_unpartitioned;
+
+-- Keys and indexes (created on the parent, so every partition gets its own copy)
+ALTER TABLE token_usage ADD CONSTRAINT token_usage_pkey PRIMARY KEY (id, created_at);
+ALTER TABLE token_usage ADD CONSTRAINT token_usage_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+ALTER TABLE token_usage ADD CONSTRAINT token_usage_job_id_fkey FOREIGN KEY (job_id) REFERENCES jobs(id) ON DELETE SET NULL;
+ALTER TABLE token_usage ADD CONSTRAINT token_usage_application_id_fkey FOREIGN KEY (application_id) REFERENCES applications(id) ON DELETE SET NULL;
+
+CREATE INDEX idx_token_usage_user_created ON token_usage(user_id, created_at DESC);
+CREATE INDEX idx_token_usage_user_operation_created ON token_usage(user_id, operation_type, created_at);
+CREATE INDEX idx_token_usage_created_at ON token_usage(created_at DESC);
+CREATE INDEX idx_token_usage_operation_type ON token_usage(operation_type);
+CREATE INDEX idx_token_usage_job_id ON token_usage(job_id);
+CREATE INDEX idx_token_usage_application_id ON token_usage(application_id);
+CREATE INDEX idx_token_usage_extra_metadata ON token_usage USING gin(extra_metadata);
+
+ALTER TABLE token_usage_text ADD CONSTRAINT token_usage_text_pkey PRIMARY KEY (token_usage_id, created_at);
+ALTER TABLE token_usage_text ADD CONSTRAINT token_usage_text_token_usage_id_fkey
+    FOREIGN KEY (token_usage_id, created_at) REFERENCES token_usage(id, created_at) ON DELETE CASCADE;
+
+-- Comments
+COMMENT ON TABLE token_usage IS 'Tracks token usage for all AI operations';
+COMMENT ON TABLE token_usage_text IS 'Prompt/completion text of token_usage records (first 5000 chars), kept apart from the hot telemetry row';
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- Token Usage Text Compression Migration
+-- Compress prompt_text / completion_text with lz4 instead of the default pglz
+-- (PostgreSQL 14+). Postgres already compresses these values out of line once
+-- a row passes ~2 KB; lz4 compresses and decompresses several times faster at
+-- a similar ratio, and the text stays queryable (the keyword evaluator matches
+-- on completion_text in SQL).
+--
+-- Run after token_usage_partitioning_migration.sql. Setting it on the
+-- partitioned parent applies to the existing partitions, and partitions created
+-- later (app/db/partitions.py) inherit it. Only newly written values use lz4;
+-- existing ones stay pglz until rewritten.
+
+ALTER TABLE token_usage_text
+    ALTER COLUMN prompt_text SET COMPRESSION lz4,
+    ALTER COLUMN completion_text SET COMPRESSION lz4;
@@ -0,0 +1,26 @@
+-- Token Usage Text Side Table Migration
+-- prompt_text / completion_text move out of token_usage so the stats queries
+-- scan a narrow row; only evaluation reads them (by token_usage_id)
+
+CREATE TABLE IF NOT EXISTS token_usage_text (
+    token_usage_id INTEGER PRIMARY KEY REFERENCES token_usage(id) ON DELETE CASCADE,
+    prompt_text TEXT,
+    completion_text TEXT
+);
+
+INSERT INTO token_usage_text (token_usage_id, prompt_text, completion_text)
+SELECT id, prompt_text, completion_text
+FROM token_usage
+WHERE prompt_text IS NOT NULL OR completion_text IS NOT NULL
+ON CONFLICT (token_usage_id) DO NOTHING;
+
+ALTER TABLE token_usage
+    DROP COLUMN IF EXISTS prompt_text,
+    DROP COLUMN IF EXISTS completion_text;
+
+-- DROP COLUMN only hides the data; rewrite the table to actually shrink it
+-- (takes an exclusive lock, run in a quiet window)
+VACUUM FULL token_usage;
+
+-- Comments
+COMMENT ON TABLE token_usage_text IS 'Prompt/completion text of token_usage records (first 5000 chars), kept apart from the hot telemetry row';